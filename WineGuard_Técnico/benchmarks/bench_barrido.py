@@ -0,0 +1,81 @@
+"""
+Benchmark: barrido de umbrales de evaluar_detector.py.
+
+1. Comprueba que el detector vectorizado (predecir) da exactamente las mismas
+   predicciones que DetectorSimulado evento a evento, con varias configuraciones.
+2. Mide el barrido de la rejilla por defecto sobre 1M eventos en paralelo
+   (dataset en memoria compartida) frente a una sola configuración con
+   df.apply(DetectorSimulado), extrapolado al nº de configuraciones.
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_barrido.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import evaluar_detector  # noqa: E402
+from bench_dataset import crear_labels  # noqa: E402
+
+EVENTOS_MUESTRA_APPLY = 100_000
+
+
+def predecir_original(df, umbral_temperatura, umbral_fuerza_g, umbral_inclinacion, n_eventos):
+    """DetectorSimulado con otros umbrales (se cambian las constantes del módulo)"""
+    originales = (evaluar_detector.UMBRAL_TEMPERATURA, evaluar_detector.UMBRAL_FUERZA_G,
+                  evaluar_detector.UMBRAL_INCLINACION, evaluar_detector.N_EVENTOS_CONSECUTIVOS)
+    (evaluar_detector.UMBRAL_TEMPERATURA, evaluar_detector.UMBRAL_FUERZA_G,
+     evaluar_detector.UMBRAL_INCLINACION, evaluar_detector.N_EVENTOS_CONSECUTIVOS) = (
+        umbral_temperatura, umbral_fuerza_g, umbral_inclinacion, n_eventos)
+    try:
+        detector = evaluar_detector.DetectorSimulado()
+        return df.apply(detector.procesar_evento, axis=1).to_numpy()
+    finally:
+        (evaluar_detector.UMBRAL_TEMPERATURA, evaluar_detector.UMBRAL_FUERZA_G,
+         evaluar_detector.UMBRAL_INCLINACION, evaluar_detector.N_EVENTOS_CONSECUTIVOS) = originales
+
+
+def comprobar_equivalencia(df):
+    print("🔎 Equivalencia con DetectorSimulado...")
+    arrays = evaluar_detector.preparar_arrays(df)
+    for configuracion in [(8.0, 2.5, 30.0, 3), (6.0, 1.0, 10.0, 1), (7.0, 3.0, 45.0, 5)]:
+        esperado = predecir_original(df, *configuracion)
+        obtenido = np.empty(len(df), dtype=np.int8)
+        obtenido[arrays['orden']] = evaluar_detector.predecir(arrays, *configuracion)
+        assert (esperado == obtenido).all(), configuracion
+        print(f"   └─ OK {configuracion}: {int(obtenido.sum())} alertas")
+
+
+def main():
+    rng = np.random.default_rng(42)
+    df = crear_labels(rng)[evaluar_detector.COLUMNAS_EVALUACION]
+
+    print("=" * 60)
+    print("🔬 BARRIDO DE UMBRALES DEL DETECTOR")
+    print("=" * 60)
+    comprobar_equivalencia(df.head(20_000))
+
+    configuraciones = evaluar_detector.configuraciones_rejilla()
+    print(f"\n⏱️  {len(df):,} eventos, {len(configuraciones)} configuraciones...")
+
+    inicio = time.perf_counter()
+    resultados = evaluar_detector.barrer_umbrales(df, configuraciones)
+    t_barrido = time.perf_counter() - inicio
+    pareto = evaluar_detector.frente_pareto(resultados)
+
+    inicio = time.perf_counter()
+    predecir_original(df.head(EVENTOS_MUESTRA_APPLY), 8.0, 2.5, 30.0, 3)
+    t_apply = (time.perf_counter() - inicio) / EVENTOS_MUESTRA_APPLY * len(df) * len(configuraciones)
+
+    print(f"   └─ Barrido en paralelo ({os.cpu_count()} CPU): {t_barrido:10.2f} s")
+    print(f"   └─ df.apply por configuración:   {t_apply:10.0f} s (extrapolado de "
+          f"{EVENTOS_MUESTRA_APPLY:,} eventos)")
+    print(f"   └─ Aceleración:                  {t_apply / t_barrido:10.0f}x")
+    print(f"   └─ Configuraciones en el frente de Pareto: {len(pareto)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: labels.csv vs dataset Parquet (dataset_labels.py).
+Mide el tamaño en disco y el tiempo de carga de lo que usa evaluar_detector.py,
+con 1M eventos de 20 paquetes en 2 días (≈ una lectura cada 3,5 s por paquete,
+el ritmo del simulador). Con muchos paquetes de pocas lecturas al día cada
+partición es un archivo pequeño y la ventaja se reduce (coste fijo por archivo).
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_dataset.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dataset_labels  # noqa: E402
+from evaluar_detector import COLUMNAS_EVALUACION  # noqa: E402
+
+N_EVENTOS = 1_000_000
+N_PAQUETES = 20
+DIAS = 2
+TIPOS = np.array(['normal', 'pico_temperatura', 'vibracion_alta', 'temperatura_alta', 'choque'], dtype=object)
+
+
+def crear_labels(rng):
+    """Labels sintéticos con el mismo formato que analytics/labels.csv"""
+    inicio = np.datetime64("2025-11-06T00:00:00", "us")
+    segundos = np.sort(rng.integers(0, DIAS * 86_400, N_EVENTOS))
+    timestamps = np.datetime_as_string(inicio + segundos.astype("timedelta64[s]"), unit="us")
+    df = pd.DataFrame({
+        'id': np.arange(1, N_EVENTOS + 1),
+        'id_paquete': np.array([f"vino_tinto_{i:03d}" for i in range(N_PAQUETES)], dtype=object)[
+            rng.integers(0, N_PAQUETES, N_EVENTOS)
+        ],
+        'timestamp': [t + "Z" for t in timestamps],
+    })
+    for columna, (bajo, alto) in zip(dataset_labels.COLUMNAS_SENSORES, [
+        (4, 12), (0.1, 5), (0, 90), (50, 70), (19, 21), (0, 5), (0, 50), (0, 8)
+    ]):
+        df[columna] = np.round(rng.uniform(bajo, alto, N_EVENTOS), 2)
+    tipos = rng.choice(len(TIPOS), N_EVENTOS, p=[0.9, 0.04, 0.03, 0.02, 0.01])
+    df['incidente'] = (tipos >= 3).astype(int)
+    df['tipo_incidente'] = TIPOS[tipos]
+    return df
+
+
+def tamano_directorio(ruta):
+    return sum(
+        os.path.getsize(os.path.join(raiz, archivo))
+        for raiz, _, archivos in os.walk(ruta) for archivo in archivos
+    )
+
+
+def medir(funcion, repeticiones=3):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    rng = np.random.default_rng(42)
+    df = crear_labels(rng)
+    directorio = tempfile.mkdtemp()
+    archivo_csv = os.path.join(directorio, 'labels.csv')
+    directorio_dataset = os.path.join(directorio, 'labels_dataset')
+
+    try:
+        df.to_csv(archivo_csv, index=False)
+        dataset_labels.escribir_dataset(df, directorio_dataset)
+
+        mb_csv = os.path.getsize(archivo_csv) / 2**20
+        mb_parquet = tamano_directorio(directorio_dataset) / 2**20
+
+        # Carga antigua de evaluar_detector.py: todo el CSV, tipos inferidos
+        t_csv = medir(lambda: pd.read_csv(archivo_csv))
+        t_parquet = medir(lambda: dataset_labels.leer_dataset(
+            COLUMNAS_EVALUACION, directorio=directorio_dataset
+        ))
+        t_parquet_dia = medir(lambda: dataset_labels.leer_dataset(
+            COLUMNAS_EVALUACION, dataset_labels.crear_filtro("2025-11-07", "2025-11-07"),
+            directorio=directorio_dataset
+        ))
+    finally:
+        shutil.rmtree(directorio)
+
+    print("=" * 60)
+    print(f"📦 LABELS: CSV vs PARQUET ({N_EVENTOS:,} eventos)")
+    print("=" * 60)
+    print(f"Tamaño CSV:                      {mb_csv:8.1f} MB")
+    print(f"Tamaño Parquet (zstd):           {mb_parquet:8.1f} MB  ({mb_csv / mb_parquet:.1f}x menor)")
+    print(f"Carga CSV completo:              {t_csv:8.3f} s")
+    print(f"Carga Parquet (columnas eval.):  {t_parquet:8.3f} s  ({t_csv / t_parquet:.1f}x)")
+    print(f"Carga Parquet (1 día):           {t_parquet_dia:8.3f} s  ({t_csv / t_parquet_dia:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
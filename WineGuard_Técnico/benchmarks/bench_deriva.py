@@ -0,0 +1,185 @@
+"""
+Benchmark: detectores de deriva de humedad, oxígeno y vapores.
+
+1. Equivalencia: la versión por lotes (evaluar_detector.alarmas_deriva) da
+   exactamente las mismas alarmas que la versión en línea (deriva.actualizar),
+   y DetectorIncidentes y DetectorIncidentesSoA dan las mismas alertas.
+2. Calidad: falsas alarmas con lecturas normales y retardo de detección con
+   derivas lentas inyectadas (subida de oxígeno y vapores, bajada de humedad).
+3. Coste por evento de la detección de deriva en los dos detectores, y
+   eventos/segundo de la versión por lotes.
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_deriva.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ingest_api"))
+import deriva  # noqa: E402
+import evaluar_detector  # noqa: E402
+from detector import DetectorIncidentes  # noqa: E402
+from detector_soa import DetectorIncidentesSoA  # noqa: E402
+
+SENSORES = list(deriva.SENSORES_DERIVA)
+RANGOS = {'humedad': (50.0, 70.0), 'oxigeno': (19.0, 21.0), 'vapores': (0.0, 5.0)}
+# Deriva inyectada por lectura (fallo de cierre: entra oxígeno y salen vapores, baja la humedad)
+PENDIENTES = {'humedad': -0.05, 'oxigeno': 0.01, 'vapores': 0.02}
+
+N_PAQUETES = 400
+N_LECTURAS = 1_500
+INICIO_DERIVA = 500
+N_EVENTOS_COSTE = 300_000
+
+
+def crear_lecturas(rng, n_paquetes, n_lecturas, con_deriva):
+    """
+    (n_paquetes, n_lecturas, sensores): lecturas normales y, en los paquetes
+    con deriva, una rampa desde INICIO_DERIVA en un sensor al azar.
+
+    Returns:
+        (valores, sensor con deriva de cada paquete o -1)
+    """
+    valores = np.stack([
+        rng.uniform(*RANGOS[sensor], (n_paquetes, n_lecturas)) for sensor in SENSORES
+    ], axis=2)
+    sensor_deriva = np.where(con_deriva, rng.integers(0, len(SENSORES), n_paquetes), -1)
+    rampa = np.maximum(np.arange(n_lecturas) - INICIO_DERIVA, 0)
+    for p in np.flatnonzero(con_deriva):
+        k = sensor_deriva[p]
+        valores[p, :, k] += PENDIENTES[SENSORES[k]] * rampa
+    return np.round(valores, 2), sensor_deriva
+
+
+def alarmas_en_linea(valores):
+    """deriva.actualizar lectura a lectura, paquete a paquete"""
+    alarmas = np.zeros(valores.shape, dtype=bool)
+    sigma_min = [deriva.SIGMA_MIN[s] for s in SENSORES]
+    for p in range(valores.shape[0]):
+        registro = [0.0] * (deriva.CAMPOS_DERIVA * len(SENSORES))
+        for j, fila in enumerate(valores[p].tolist()):
+            for k, valor in enumerate(fila):
+                alarmas[p, j, k] = deriva.actualizar(registro, k * deriva.CAMPOS_DERIVA, valor, sigma_min[k])
+    return alarmas
+
+
+def alarmas_por_lotes(valores):
+    """Las mismas lecturas en el formato de evaluar_detector (eventos ordenados por paquete)"""
+    n_paquetes, n_lecturas, _ = valores.shape
+    inicio_paquete = np.zeros(n_paquetes * n_lecturas, dtype=bool)
+    inicio_paquete[::n_lecturas] = True
+    return evaluar_detector.alarmas_deriva(valores.reshape(-1, len(SENSORES)), inicio_paquete).reshape(valores.shape)
+
+
+def eventos_api(valores):
+    """Lecturas como dicts de la API, intercaladas entre paquetes"""
+    n_paquetes, n_lecturas, _ = valores.shape
+    eventos = []
+    for j in range(n_lecturas):
+        for p in range(n_paquetes):
+            evento = {
+                'id_paquete': f"vino_{p:05d}",
+                'timestamp': f"2025-11-06T{j // 3600:02d}:{j // 60 % 60:02d}:{j % 60:02d}Z",
+                'temperatura': 5.0, 'fuerza_g': 1.0, 'inclinacion': 5.0,
+            }
+            evento.update(zip(SENSORES, valores[p, j].tolist()))
+            eventos.append(evento)
+    return eventos
+
+
+def procesar(detector, eventos):
+    resultados = []
+    siguiente_id = 1
+    for evento in eventos:
+        alerta_nueva, alerta_actualizada = detector.procesar_evento(evento)
+        if alerta_nueva:
+            detector.guardar_id_alerta(alerta_nueva['id_paquete'], alerta_nueva['tipo_incidente'],
+                                       siguiente_id)
+            siguiente_id += 1
+        resultados.append((alerta_nueva, alerta_actualizada))
+    return resultados
+
+
+def comprobar_equivalencia(valores):
+    print("🔎 Equivalencia...")
+    en_linea = alarmas_en_linea(valores)
+    por_lotes = alarmas_por_lotes(valores)
+    assert (en_linea == por_lotes).all(), "alarmas_deriva distinta de deriva.actualizar"
+    print(f"   └─ Por lotes = en línea: {int(en_linea.sum()):,} lecturas en alarma")
+
+    eventos = eventos_api(valores[:40])
+    salidas = []
+    for detector in (DetectorIncidentes(), DetectorIncidentesSoA(capacidad=8)):
+        consola = io.StringIO()
+        with contextlib.redirect_stdout(consola):
+            resultados = procesar(detector, eventos)
+        salidas.append((resultados, consola.getvalue()))
+    assert salidas[0] == salidas[1], "DetectorIncidentes y DetectorIncidentesSoA distintos"
+    nuevas = sum(1 for nueva, _ in salidas[0][0] if nueva)
+    print(f"   └─ Dicts = arrays: {len(eventos):,} eventos, {nuevas} alertas de deriva")
+
+
+def medir_calidad(alarmas, sensor_deriva):
+    print("\n🎯 Calidad de la detección...")
+    normales = sensor_deriva < 0
+    # Falsas alarmas: arranques de alarma en paquetes sin deriva
+    arranques = alarmas[normales, 1:] & ~alarmas[normales, :-1]
+    lecturas = int(normales.sum()) * (alarmas.shape[1] - deriva.N_CALENTAMIENTO) * len(SENSORES)
+    print(f"   └─ Falsas alarmas: {int(arranques.sum())} en {lecturas:,} lecturas normales (por sensor)")
+    for k, sensor in enumerate(SENSORES):
+        paquetes = np.flatnonzero(sensor_deriva == k)
+        retardos = []
+        for p in paquetes:
+            detectadas = np.flatnonzero(alarmas[p, INICIO_DERIVA:, k])
+            retardos.append(detectadas[0] if len(detectadas) else np.inf)
+        retardos = np.array(retardos)
+        detectados = np.isfinite(retardos)
+        print(f"   └─ {sensor:<8} ({PENDIENTES[sensor]:+.2f}/lectura): {int(detectados.sum())}/{len(paquetes)} "
+              f"detectadas, retardo mediano {np.median(retardos[detectados]):.0f} lecturas "
+              f"(p90 {np.percentile(retardos[detectados], 90):.0f})")
+
+
+def medir_coste(rng):
+    print(f"\n⏱️  Coste por evento ({N_EVENTOS_COSTE:,} eventos de 1,000 paquetes)...")
+    valores, _ = crear_lecturas(rng, 1_000, N_EVENTOS_COSTE // 1_000, np.zeros(1_000, dtype=bool))
+    eventos = eventos_api(valores)
+    for nombre, clase in (("dicts", DetectorIncidentes), ("arrays", DetectorIncidentesSoA)):
+        tiempos = {}
+        for sensores in ((), SENSORES):
+            detector = clase(sensores_deriva=sensores)
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                for evento in eventos:
+                    detector.procesar_evento(evento)
+                tiempos[bool(sensores)] = (time.perf_counter() - inicio) / len(eventos) * 1e6
+        print(f"   └─ {nombre + ':':<8} {tiempos[False]:5.2f} µs sin deriva, {tiempos[True]:5.2f} µs con deriva "
+              f"(+{tiempos[True] - tiempos[False]:.2f} µs/evento)")
+
+    inicio = time.perf_counter()
+    alarmas_por_lotes(valores)
+    t_lotes = time.perf_counter() - inicio
+    print(f"   └─ Por lotes (evaluar_detector): {valores.shape[0] * valores.shape[1] / t_lotes:12,.0f} eventos/s")
+
+
+def main():
+    print("=" * 60)
+    print("🌫️ DETECTORES DE DERIVA (EWMA + CUSUM)")
+    print("=" * 60)
+    rng = np.random.default_rng(42)
+    con_deriva = rng.random(N_PAQUETES) < 0.5
+    valores, sensor_deriva = crear_lecturas(rng, N_PAQUETES, N_LECTURAS, con_deriva)
+
+    comprobar_equivalencia(valores)
+    medir_calidad(alarmas_por_lotes(valores), sensor_deriva)
+    medir_coste(rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: estado del detector en dicts (DetectorIncidentes) vs. en arrays
+de NumPy (DetectorIncidentesSoA).
+
+1. Equivalencia: el mismo flujo de eventos (con rachas de temperatura y
+   choques, cierres, ids de alerta y alertas restauradas) da exactamente
+   las mismas alertas, la misma salida por consola y el mismo estado final.
+2. Memoria por paquete con 1M paquetes seguidos (tracemalloc).
+3. Eventos/segundo con un flujo realista (~2% de lecturas anómalas).
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_detector_estado.py
+"""
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingest_api"))
+from detector import DetectorIncidentes  # noqa: E402
+from detector_soa import DetectorIncidentesSoA  # noqa: E402
+
+N_PAQUETES_MEMORIA = 1_000_000
+N_PAQUETES_FLUJO = 100_000
+N_EVENTOS_FLUJO = 1_000_000
+
+
+def crear_eventos(n_paquetes, n_eventos, p_anomalo, semilla=42):
+    """
+    Eventos con rachas: cada paquete entra en modo anómalo con probabilidad
+    p_anomalo y sale con probabilidad 0.3 en cada evento.
+    """
+    rng = np.random.default_rng(semilla)
+    ids = [f"vino_{i:07d}" for i in range(n_paquetes)]
+    paquetes = rng.integers(0, n_paquetes, n_eventos)
+    anomalo = np.zeros(n_paquetes, dtype=np.int8)  # 0 normal, 1 temperatura, 2 choque, 3 ambos
+    temperatura = np.round(rng.uniform(4.0, 7.5, n_eventos), 2)
+    fuerza_g = np.round(rng.uniform(0.1, 1.8, n_eventos), 2)
+    inclinacion = np.round(rng.uniform(0.0, 15.0, n_eventos), 2)
+    humedad = np.round(rng.uniform(50.0, 70.0, n_eventos), 2)
+    oxigeno = np.round(rng.uniform(19.0, 21.0, n_eventos), 2)
+    vapores = np.round(rng.uniform(0.0, 5.0, n_eventos), 2)
+    eventos = []
+    for k, p in enumerate(paquetes):
+        if anomalo[p] and rng.random() < 0.3:
+            anomalo[p] = 0
+        elif not anomalo[p] and rng.random() < p_anomalo:
+            anomalo[p] = rng.integers(1, 4)
+        if anomalo[p] & 1:
+            temperatura[k] = round(rng.uniform(9.0, 12.0), 2)
+        if anomalo[p] & 2:
+            fuerza_g[k] = round(rng.uniform(3.5, 5.0), 2)
+            inclinacion[k] = round(rng.uniform(45.0, 90.0), 2)
+        eventos.append({
+            'id_paquete': ids[p],
+            'timestamp': f"2025-11-06T09:{k // 60 % 60:02d}:{k % 60:02d}Z",
+            'temperatura': float(temperatura[k]),
+            'fuerza_g': float(fuerza_g[k]),
+            'inclinacion': float(inclinacion[k]),
+            'humedad': float(humedad[k]),
+            'oxigeno': float(oxigeno[k]),
+            'vapores': float(vapores[k]),
+        })
+    return ids, eventos
+
+
+def ejecutar(detector, eventos, restaurar=()):
+    """Procesa los eventos dando ids de alerta como la API; devuelve los resultados"""
+    for alerta in restaurar:
+        detector.restaurar_alerta(*alerta)
+    resultados = []
+    siguiente_id = 1
+    for evento in eventos:
+        alerta_nueva, alerta_actualizada = detector.procesar_evento(evento)
+        if alerta_nueva:
+            detector.guardar_id_alerta(alerta_nueva['id_paquete'], alerta_nueva['tipo_incidente'],
+                                       siguiente_id)
+            siguiente_id += 1
+        resultados.append((alerta_nueva, alerta_actualizada))
+    return resultados
+
+
+def comprobar_equivalencia():
+    print("🔎 Equivalencia con DetectorIncidentes...")
+    ids, eventos = crear_eventos(500, 200_000, 0.05)
+    restaurar = [
+        (ids[0], 'temperatura_alta', 900_001, '2025-11-06T08:00:00Z', 7, [9.5, 10.25, 11.0]),
+        (ids[1], 'choque', 900_002, '2025-11-06T08:00:00Z', 3, [3.75, 4.5, 4.0]),
+        (ids[2], 'deriva_oxigeno', 900_003, '2025-11-06T08:00:00Z', 40, [21.5],
+         {'media': 20.0, 'desviacion': 0.58, 'ewma': 21.2, 'cusum_pos': 14.0, 'cusum_neg': 0.0}),
+    ]
+    salidas = []
+    for clase in (DetectorIncidentes, lambda: DetectorIncidentesSoA(capacidad=16)):
+        detector = clase()
+        consola = io.StringIO()
+        with contextlib.redirect_stdout(consola):
+            resultados = ejecutar(detector, eventos, restaurar)
+        estado = {p: detector.obtener_estado(p) for p in detector.paquetes()}
+        salidas.append((resultados, consola.getvalue(), estado))
+    (r_dict, c_dict, e_dict), (r_soa, c_soa, e_soa) = salidas
+    assert r_dict == r_soa, "alertas distintas"
+    assert c_dict == c_soa, "salida por consola distinta"
+    assert e_dict == e_soa, "estado final distinto"
+    nuevas = sum(1 for nueva, _ in r_dict if nueva)
+    cerradas = sum(1 for _, actualizada in r_dict if actualizada)
+    print(f"   └─ OK: {len(eventos):,} eventos, {nuevas:,} alertas nuevas, {cerradas:,} cierres")
+
+
+def memoria_por_paquete(clase, ids):
+    """Bytes por paquete tras una lectura normal de cada uno"""
+    evento = {'timestamp': '2025-11-06T09:00:00Z', 'temperatura': 5.0,
+              'fuerza_g': 1.0, 'inclinacion': 5.0, 'humedad': 60.0, 'oxigeno': 20.0, 'vapores': 2.5}
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    detector = clase()
+    for id_paquete in ids:
+        evento['id_paquete'] = id_paquete
+        detector.procesar_evento(evento)
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (despues - antes) / len(ids), detector
+
+
+def medir_flujo(clase, eventos):
+    detector = clase()
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        for evento in eventos:
+            detector.procesar_evento(evento)
+        return len(eventos) / (time.perf_counter() - inicio)
+
+
+def main():
+    print("=" * 60)
+    print("🧠 ESTADO DEL DETECTOR: DICTS vs. ARRAYS (SoA)")
+    print("=" * 60)
+    comprobar_equivalencia()
+
+    print(f"\n📦 Memoria con {N_PAQUETES_MEMORIA:,} paquetes (sin contar los ids)...")
+    ids = [f"vino_{i:07d}" for i in range(N_PAQUETES_MEMORIA)]
+    bytes_dict, _ = memoria_por_paquete(DetectorIncidentes, ids)
+    bytes_soa, soa = memoria_por_paquete(DetectorIncidentesSoA, ids)
+    print(f"   └─ dicts:  {bytes_dict:8.0f} bytes/paquete")
+    print(f"   └─ arrays: {bytes_soa:8.0f} bytes/paquete "
+          f"(capacidad {soa.capacidad:,}; {bytes_dict / bytes_soa:.1f}x menos)")
+    del ids, soa
+
+    print(f"\n⏱️  {N_EVENTOS_FLUJO:,} eventos de {N_PAQUETES_FLUJO:,} paquetes...")
+    _, eventos = crear_eventos(N_PAQUETES_FLUJO, N_EVENTOS_FLUJO, 0.005)
+    for nombre, clase in (("dicts", DetectorIncidentes), ("arrays", DetectorIncidentesSoA)):
+        print(f"   └─ {nombre + ':':<8} {medir_flujo(clase, eventos):10,.0f} eventos/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: formato binario vs. JSON para la telemetría.
+Mide bytes/registro y µs/registro al decodificar, con tramas de distintos tamaños.
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_formato.py
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "ingest_api"))
+from generador_lote import generar_lote, serializar_json  # noqa: E402
+import formato_binario  # noqa: E402
+
+TAMANOS_TRAMA = [1, 3, 100, 1000]
+REGISTROS_POR_MEDIDA = 30_000
+
+
+def medir_us(funcion, mensajes, registros_por_mensaje):
+    """µs por registro decodificando todos los mensajes"""
+    inicio = time.perf_counter()
+    for mensaje in mensajes:
+        funcion(mensaje)
+    segundos = time.perf_counter() - inicio
+    return segundos / (len(mensajes) * registros_por_mensaje) * 1e6
+
+
+def main():
+    rng = np.random.default_rng(42)
+
+    print("=" * 72)
+    print("📦 FORMATO BINARIO vs JSON")
+    print("=" * 72)
+    print(f"{'registros/trama':>16} | {'JSON B/reg':>10} | {'bin B/reg':>10} | "
+          f"{'JSON µs/reg':>11} | {'bin µs/reg':>10}")
+    print("-" * 72)
+
+    for tamano in TAMANOS_TRAMA:
+        ids = [f"vino_tinto_{i:03d}" for i in range(tamano)]
+        n_mensajes = max(1, REGISTROS_POR_MEDIDA // tamano)
+        lotes = [generar_lote(ids, rng) for _ in range(n_mensajes)]
+
+        # JSON: un mensaje por lectura (como publica el simulador)
+        mensajes_json = [p.encode("utf-8") for lote in lotes for p in serializar_json(lote)]
+        # Binario: una trama por evento con todas las lecturas
+        tramas = [formato_binario.codificar_lote(lote) for lote in lotes]
+
+        bytes_json = sum(map(len, mensajes_json)) / len(mensajes_json)
+        bytes_bin = sum(map(len, tramas)) / (len(tramas) * tamano)
+        us_json = medir_us(json.loads, mensajes_json, 1)
+        us_bin = medir_us(formato_binario.decodificar, tramas, tamano)
+
+        print(f"{tamano:>16} | {bytes_json:>10.1f} | {bytes_bin:>10.1f} | "
+              f"{us_json:>11.2f} | {us_bin:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
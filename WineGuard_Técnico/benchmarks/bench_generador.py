@@ -0,0 +1,70 @@
+"""
+Benchmark: generación de telemetría lectura a lectura vs. por lotes NumPy.
+Mide lecturas/segundo (generar + serializar a JSON) en un solo núcleo.
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_generador.py
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from generador_lote import generar_lote, serializar_json  # noqa: E402
+
+N_PAQUETES = 10_000
+REPETICIONES = 20
+
+
+def generar_datos_normales(id_paquete):
+    """Generador original (una lectura, un dict)"""
+    return {
+        "id_paquete": id_paquete,
+        "temperatura": round(random.uniform(4.0, 7.5), 2),
+        "fuerza_g": round(random.uniform(0.1, 1.8), 2),
+        "inclinacion": round(random.uniform(0.0, 15.0), 2),
+        "humedad": round(random.uniform(50.0, 70.0), 2),
+        "oxigeno": round(random.uniform(19.0, 21.0), 2),
+        "vapores": round(random.uniform(0.0, 5.0), 2),
+        "iluminacion": round(random.uniform(0.0, 50.0), 2),
+        "vibracion": round(random.uniform(0.0, 2.0), 2),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+def medir(nombre, funcion, lecturas):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion()
+    segundos = time.perf_counter() - inicio
+    por_segundo = lecturas * REPETICIONES / segundos
+    print(f"  • {nombre:<28} {por_segundo:>12,.0f} lecturas/s")
+    return por_segundo
+
+
+def main():
+    ids = [f"vino_tinto_{i:06d}" for i in range(N_PAQUETES)]
+    rng = np.random.default_rng(42)
+    temperatura = rng.random(N_PAQUETES) < 0.05
+    choque = rng.random(N_PAQUETES) < 0.02
+
+    # Comprobación rápida: el JSON generado es válido y conserva los campos
+    ejemplo = json.loads(serializar_json(generar_lote(ids[:1], rng))[0])
+    assert set(ejemplo) == set(generar_datos_normales("x"))
+
+    print("=" * 60)
+    print(f"⏱️  GENERACIÓN DE TELEMETRÍA ({N_PAQUETES} paquetes x {REPETICIONES})")
+    print("=" * 60)
+    base = medir("dict por lectura", lambda: [json.dumps(generar_datos_normales(i)) for i in ids], N_PAQUETES)
+    lote = medir("lote NumPy", lambda: serializar_json(
+        generar_lote(ids, rng, temperatura=temperatura, choque=choque)), N_PAQUETES)
+    print(f"\n📈 Aceleración: x{lote / base:.1f}")
+
+
+if __name__ == "__main__":
+    main()
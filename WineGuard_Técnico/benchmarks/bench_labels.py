@@ -0,0 +1,130 @@
+"""
+Benchmark: etiquetado de eventos dentro de alertas en generar_labels.py.
+Compara el bucle original (una máscara sobre toda la telemetría por alerta)
+con el join de intervalos por paquete (etiquetar_alertas).
+
+1. Comprueba que ambos dan exactamente las mismas etiquetas en un dataset
+   pequeño con alertas abiertas, solapadas y timestamps desordenados.
+2. Mide el join con 1M eventos y 10k alertas; el bucle original se mide
+   con una muestra de alertas y se extrapola (completo tardaría demasiado).
+
+Uso (desde WineGuard_Técnico/):
+    python benchmarks/bench_labels.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from generar_labels import etiquetar_alertas  # noqa: E402
+
+TIPOS = ["temperatura_alta", "choque"]
+ALERTAS_MUESTRA_ORIGINAL = 20
+
+
+def etiquetar_original(df_telemetry, df_alerts):
+    """Bucle de generar_labels.py antes del join de intervalos (sin los print)"""
+    df_telemetry['incidente'] = 0
+    df_telemetry['tipo_incidente'] = 'normal'
+    for idx, alert in df_alerts.iterrows():
+        ts_inicio = pd.to_datetime(alert['timestamp_inicio'])
+        ts_fin = pd.to_datetime(alert['timestamp_fin']) if pd.notna(alert['timestamp_fin']) else None
+
+        mask_paquete = df_telemetry['id_paquete'] == alert['id_paquete']
+        mask_tiempo = df_telemetry['timestamp_dt'] >= ts_inicio
+
+        if ts_fin:
+            mask_tiempo = mask_tiempo & (df_telemetry['timestamp_dt'] <= ts_fin)
+        else:
+            eventos_paquete = df_telemetry[mask_paquete & mask_tiempo].head(alert['num_eventos'])
+            mask_tiempo = df_telemetry['id'].isin(eventos_paquete['id'])
+
+        mask_final = mask_paquete & mask_tiempo
+        df_telemetry.loc[mask_final, 'incidente'] = 1
+        df_telemetry.loc[mask_final, 'tipo_incidente'] = alert['tipo_incidente']
+    return df_telemetry
+
+
+def crear_dataset(n_paquetes, eventos_por_paquete, n_alertas, rng, desordenar=0.0):
+    """
+    Telemetría intercalada por paquete (como la escribe la API) y alertas
+    aleatorias: ~20% abiertas, con solapes entre alertas del mismo paquete.
+    desordenar: fracción de eventos con el timestamp desplazado hacia atrás
+    """
+    n = n_paquetes * eventos_por_paquete
+    ids = [f"vino_tinto_{i:06d}" for i in range(n_paquetes)]
+    inicio = np.datetime64("2025-11-06T09:00:00", "ms")
+    paso = np.arange(eventos_por_paquete).repeat(n_paquetes) * 2000
+    ms = paso + rng.integers(0, 500, n)
+    desordenados = rng.random(n) < desordenar
+    ms[desordenados] -= rng.integers(2000, 10000, int(desordenados.sum()))
+    timestamps = np.datetime_as_string(inicio + ms.astype("timedelta64[ms]"), unit="ms")
+    df_telemetry = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "id_paquete": np.tile(np.array(ids, dtype=object), eventos_por_paquete),
+        "timestamp": [t + "Z" for t in timestamps],
+    })
+    df_telemetry["timestamp_dt"] = pd.to_datetime(df_telemetry["timestamp"])
+
+    paquetes = rng.integers(0, n_paquetes, n_alertas)
+    evento_inicio = rng.integers(0, eventos_por_paquete - 5, n_alertas)
+    duracion = rng.integers(3, 12, n_alertas)
+    ms_inicio = evento_inicio * 2000
+    ms_fin = (evento_inicio + duracion) * 2000 + 499
+    abiertas = rng.random(n_alertas) < 0.2
+    fines = np.datetime_as_string(inicio + ms_fin.astype("timedelta64[ms]"), unit="ms")
+    df_alerts = pd.DataFrame({
+        "id": np.arange(1, n_alertas + 1),
+        "id_paquete": np.array(ids, dtype=object)[paquetes],
+        "tipo_incidente": np.array(TIPOS, dtype=object)[rng.integers(0, 2, n_alertas)],
+        "timestamp_inicio": [
+            t + "Z" for t in np.datetime_as_string(inicio + ms_inicio.astype("timedelta64[ms]"), unit="ms")
+        ],
+        "timestamp_fin": [None if a else t + "Z" for a, t in zip(abiertas, fines)],
+        "num_eventos": duracion,
+    })
+    return df_telemetry, df_alerts
+
+
+def comprobar_equivalencia(rng):
+    print("🔎 Equivalencia con el bucle original...")
+    for desordenar in (0.0, 0.1):
+        df_telemetry, df_alerts = crear_dataset(50, 200, 400, rng, desordenar)
+        esperado = etiquetar_original(df_telemetry.copy(), df_alerts)
+        obtenido = etiquetar_alertas(df_telemetry.copy(), df_alerts)
+        assert (esperado["incidente"].to_numpy() == obtenido["incidente"].to_numpy()).all()
+        assert (esperado["tipo_incidente"].to_numpy() == obtenido["tipo_incidente"].to_numpy()).all()
+        print(f"   └─ OK (timestamps desordenados: {desordenar:.0%}, "
+              f"{int(esperado['incidente'].sum())} eventos etiquetados)")
+
+
+def main():
+    rng = np.random.default_rng(42)
+
+    print("=" * 60)
+    print("🏷️  ETIQUETADO DE ALERTAS: máscaras vs join de intervalos")
+    print("=" * 60)
+    comprobar_equivalencia(rng)
+
+    print("\n⏱️  1M eventos, 10k alertas...")
+    df_telemetry, df_alerts = crear_dataset(10_000, 100, 10_000, rng)
+
+    inicio = time.perf_counter()
+    etiquetar_alertas(df_telemetry, df_alerts)
+    t_join = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    etiquetar_original(df_telemetry, df_alerts.head(ALERTAS_MUESTRA_ORIGINAL))
+    t_original = (time.perf_counter() - inicio) / ALERTAS_MUESTRA_ORIGINAL * len(df_alerts)
+
+    print(f"   └─ Join de intervalos: {t_join:8.2f} s")
+    print(f"   └─ Bucle original:     {t_original:8.2f} s (extrapolado de "
+          f"{ALERTAS_MUESTRA_ORIGINAL} alertas)")
+    print(f"   └─ Aceleración:        {t_original / t_join:8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Benchmark: id_paquete en texto en cada fila vs. clave entera de packages
+(paquetes.py) en telemetry y alerts.
+
+Crea las dos versiones de las tablas en un esquema aparte (bench_paquetes)
+con filas sintéticas generadas en el propio PostgreSQL (generate_series),
+crea los índices de cada versión al final (como cargar_historico.py
+--sin-indices) y compara el tamaño de las tablas y de sus índices. La
+versión entera se crea desde los modelos (models.py); la de texto es el
+esquema anterior. Las tablas son UNLOGGED para no escribir el WAL (el
+tamaño de tablas e índices es el mismo).
+
+Una lectura cada 5 s por paquete, repartidas entre --paquetes paquetes con
+ids como los del simulador (vino_tinto_000001); una alerta cada 1.000
+lecturas. Con los 50M de filas por defecto hacen falta ~25 GB de disco.
+
+Uso (desde WineGuard_Técnico/, con DATABASE_URL apuntando a PostgreSQL):
+    python benchmarks/bench_paquetes.py
+    python benchmarks/bench_paquetes.py --filas 1000000 --paquetes 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import MetaData, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingest_api"))
+from database import engine  # noqa: E402
+from models import Alert, Package, Telemetry  # noqa: E402
+
+ESQUEMA = "bench_paquetes"
+FILAS_POR_ALERTA = 1_000
+FILAS_POR_INSERT = 5_000_000  # Acota la cola de comprobaciones de la clave foránea
+
+# Expresiones de las filas sintéticas a partir de g (1..filas) y :paquetes
+_PAQUETE = "(g % :paquetes) + 1"
+_ID_PAQUETE = f"'vino_tinto_' || lpad(({_PAQUETE})::text, 6, '0')"
+_TIMESTAMP = """to_char(TIMESTAMP '2025-11-06' + ((g / :paquetes) * 5) * INTERVAL '1 second',
+                        'YYYY-MM-DD"T"HH24:MI:SS"Z"')"""
+_SENSORES = ", ".join(
+    f"round(({minimo} + random() * {ancho})::numeric, 2)"
+    for minimo, ancho in ((4, 4), (0, 2), (0, 20), (50, 20), (19, 2), (0, 5), (0, 100), (0, 1))
+)
+_COLUMNAS_SENSORES = "temperatura, fuerza_g, inclinacion, humedad, oxigeno, vapores, iluminacion, vibracion"
+_ALERTA = f"""'temperatura_alta', {_TIMESTAMP}, {_TIMESTAMP}, 10, 9.5, 9.0, NULL, NOW()"""
+_COLUMNAS_ALERTA = ("tipo_incidente, timestamp_inicio, timestamp_fin, num_eventos, valor_max, "
+                    "valor_promedio, detalles, created_at")
+
+# Esquema anterior: id_paquete en texto, con su índice y el compuesto
+SQL_TEXTO = f"""
+CREATE UNLOGGED TABLE {ESQUEMA}.telemetry_texto (
+    id SERIAL PRIMARY KEY, id_paquete VARCHAR, timestamp VARCHAR,
+    temperatura FLOAT, fuerza_g FLOAT, inclinacion FLOAT, humedad FLOAT,
+    oxigeno FLOAT, vapores FLOAT, iluminacion FLOAT, vibracion FLOAT
+);
+CREATE UNLOGGED TABLE {ESQUEMA}.alerts_texto (
+    id SERIAL PRIMARY KEY, id_paquete VARCHAR, tipo_incidente VARCHAR,
+    timestamp_inicio VARCHAR, timestamp_fin VARCHAR, num_eventos INTEGER,
+    valor_max FLOAT, valor_promedio FLOAT, detalles VARCHAR, created_at TIMESTAMP
+);
+"""
+INDICES_TEXTO = f"""
+CREATE INDEX ix_texto_telemetry_id ON {ESQUEMA}.telemetry_texto (id);
+CREATE INDEX ix_texto_telemetry_id_paquete ON {ESQUEMA}.telemetry_texto (id_paquete);
+CREATE INDEX ix_texto_telemetry_paquete_timestamp ON {ESQUEMA}.telemetry_texto (id_paquete, timestamp);
+CREATE INDEX ix_texto_alerts_id ON {ESQUEMA}.alerts_texto (id);
+CREATE INDEX ix_texto_alerts_id_paquete ON {ESQUEMA}.alerts_texto (id_paquete);
+"""
+
+
+def ejecutar(conn, sql: str, **parametros):
+    for sentencia in filter(str.strip, sql.split(";")):
+        conn.execute(text(sentencia), parametros)
+
+
+def insertar(conn, sql: str, filas: int, paquetes: int, paso: int = 1):
+    """INSERT ... SELECT sobre generate_series(desde, hasta, paso) g, por trozos"""
+    for desde in range(1, filas + 1, FILAS_POR_INSERT):
+        conn.execute(text(sql), {
+            "desde": desde, "hasta": min(desde + FILAS_POR_INSERT - 1, filas),
+            "paso": paso, "paquetes": paquetes,
+        })
+
+
+def crear_texto(conn, filas: int, paquetes: int):
+    """Versión anterior: el texto en cada fila"""
+    ejecutar(conn, SQL_TEXTO)
+    insertar(conn, f"""
+        INSERT INTO {ESQUEMA}.telemetry_texto (id_paquete, timestamp, {_COLUMNAS_SENSORES})
+        SELECT {_ID_PAQUETE}, {_TIMESTAMP}, {_SENSORES} FROM generate_series(:desde, :hasta, :paso) g
+    """, filas, paquetes)
+    insertar(conn, f"""
+        INSERT INTO {ESQUEMA}.alerts_texto (id_paquete, {_COLUMNAS_ALERTA})
+        SELECT {_ID_PAQUETE}, {_ALERTA} FROM generate_series(:desde, :hasta, :paso) g
+    """, filas, paquetes, FILAS_POR_ALERTA)
+    ejecutar(conn, INDICES_TEXTO)
+
+
+def crear_entero(conn, filas: int, paquetes: int):
+    """Versión actual (models.py): packages + paquete_id en cada fila"""
+    metadata = MetaData(schema=ESQUEMA)
+    tablas = [tabla.to_metadata(metadata) for tabla in
+              (Package.__table__, Telemetry.__table__, Alert.__table__)]
+    indices = [indice for tabla in tablas for indice in tabla.indexes]
+    for tabla in tablas:
+        tabla.indexes.clear()  # Se crean después de cargar
+    metadata.create_all(bind=conn)
+    for tabla in reversed(tablas):  # packages la última: la referencian las otras dos
+        conn.execute(text(f"ALTER TABLE {ESQUEMA}.{tabla.name} SET UNLOGGED"))
+
+    conn.execute(text(f"""
+        INSERT INTO {ESQUEMA}.packages (id, id_paquete)
+        SELECT {_PAQUETE}, {_ID_PAQUETE} FROM generate_series(0, :paquetes - 1) g
+    """), {"paquetes": paquetes})
+    insertar(conn, f"""
+        INSERT INTO {ESQUEMA}.telemetry (paquete_id, timestamp, {_COLUMNAS_SENSORES})
+        SELECT {_PAQUETE}, {_TIMESTAMP}, {_SENSORES} FROM generate_series(:desde, :hasta, :paso) g
+    """, filas, paquetes)
+    insertar(conn, f"""
+        INSERT INTO {ESQUEMA}.alerts (paquete_id, {_COLUMNAS_ALERTA})
+        SELECT {_PAQUETE}, {_ALERTA} FROM generate_series(:desde, :hasta, :paso) g
+    """, filas, paquetes, FILAS_POR_ALERTA)
+    for indice in indices:
+        indice.create(bind=conn)
+
+
+def tamanos(conn, tabla: str) -> dict:
+    """Bytes de la tabla (heap + TOAST), de sus índices y de cada índice"""
+    nombre = f"{ESQUEMA}.{tabla}"
+    fila = conn.execute(text(
+        "SELECT pg_table_size(CAST(:t AS regclass)), pg_indexes_size(CAST(:t AS regclass)), "
+        "(SELECT COUNT(*) FROM " + nombre + ")"
+    ), {"t": nombre}).one()
+    indices = conn.execute(text(
+        "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) FROM pg_index "
+        "WHERE indrelid = CAST(:t AS regclass) ORDER BY 1"
+    ), {"t": nombre}).all()
+    return {"tabla": fila[0], "indices": fila[1], "filas": fila[2],
+            "por_indice": [(nombre.split(".")[-1], tamano) for nombre, tamano in indices]}
+
+
+def mb(n: int) -> str:
+    return f"{n / 2**20:10,.1f} MB"
+
+
+def informar(nombre: str, texto: dict, entero: dict, extra: int = 0):
+    filas = texto["filas"]
+    print(f"\n📦 {nombre} ({filas:,} filas)")
+    for etiqueta, datos in (("texto", texto), ("entero", entero)):
+        print(f"   └─ {etiqueta + ':':<8} tabla {mb(datos['tabla'])} ({datos['tabla'] / filas:6.1f} B/fila) | "
+              f"índices {mb(datos['indices'])} ({datos['indices'] / filas:6.1f} B/fila)")
+        for indice, tamano in datos["por_indice"]:
+            print(f"        · {indice:<40} {mb(tamano)}")
+    total_texto = texto["tabla"] + texto["indices"]
+    total_entero = entero["tabla"] + entero["indices"] + extra
+    print(f"   └─ Tabla: -{1 - entero['tabla'] / texto['tabla']:.1%} | "
+          f"índices: -{1 - entero['indices'] / texto['indices']:.1%} | "
+          f"total{' (con packages)' if extra else ''}: {mb(total_texto).strip()} → "
+          f"{mb(total_entero).strip()} (-{1 - total_entero / total_texto:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamaño de telemetry y alerts con id_paquete en texto vs. entero")
+    parser.add_argument("--filas", type=int, default=50_000_000, help="Filas de telemetry (por defecto, 50M)")
+    parser.add_argument("--paquetes", type=int, default=100_000, help="Paquetes distintos (por defecto, 100.000)")
+    parser.add_argument("--conservar", action="store_true", help=f"No borrar el esquema {ESQUEMA} al terminar")
+    args = parser.parse_args()
+    if engine.dialect.name != "postgresql":
+        parser.error("El benchmark necesita PostgreSQL (DATABASE_URL)")
+
+    print("=" * 60)
+    print(f"🗜️  ID_PAQUETE EN TEXTO vs. CLAVE ENTERA ({args.filas:,} lecturas, {args.paquetes:,} paquetes)")
+    print("=" * 60)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {ESQUEMA}"))
+    try:
+        for nombre, crear in (("texto", crear_texto), ("entero", crear_entero)):
+            inicio = time.perf_counter()
+            with engine.begin() as conn:
+                crear(conn, args.filas, args.paquetes)
+            print(f"   └─ Versión {nombre} creada en {time.perf_counter() - inicio:.0f} s")
+
+        with engine.connect() as conn:
+            paquetes = tamanos(conn, "packages")
+            informar("telemetry", tamanos(conn, "telemetry_texto"), tamanos(conn, "telemetry"),
+                     extra=paquetes["tabla"] + paquetes["indices"])
+            informar("alerts", tamanos(conn, "alerts_texto"), tamanos(conn, "alerts"))
+        print(f"\n📇 packages: {mb(paquetes['tabla'] + paquetes['indices']).strip()} "
+              f"({args.paquetes:,} paquetes, tabla + índices)")
+    finally:
+        if not args.conservar:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Caché en disco de los resultados de evaluar_detector.py.
+
+Cada entrada se direcciona por contenido: la clave es un hash de los datos
+evaluados (huella_datos) y de la configuración del detector, así que si
+cambian los labels o algún umbral la clave cambia sola y no hay nada que
+invalidar a mano. Las entradas son archivos .npz en DIRECTORIO_CACHE:
+
+    analytics/.cache_evaluacion/<clave>.npz   (arrays + metadatos JSON)
+
+Al leer una entrada se actualiza su fecha de modificación; cuando la caché
+supera TAMANO_MAXIMO_CACHE se borran las entradas menos usadas.
+
+Los gráficos se regeneran solo si cambian sus entradas: junto a cada PNG
+se guarda un archivo <png>.clave con el hash de lo que se dibujó.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_CACHE = 'analytics/.cache_evaluacion'
+TAMANO_MAXIMO_CACHE = 256 * 2**20  # bytes
+
+# Subir al cambiar la lógica del detector o el formato de las entradas
+VERSION_CACHE = 2
+
+# Tipos con los que se calcula la huella (CSV y Parquet dan la misma)
+TIPOS_HUELLA = {
+    'id': 'int64',
+    'id_paquete': 'str',
+    'temperatura': 'float64',
+    'fuerza_g': 'float64',
+    'inclinacion': 'float64',
+    'humedad': 'float64',
+    'oxigeno': 'float64',
+    'vapores': 'float64',
+    'incidente': 'int8',
+}
+
+
+def huella_datos(df):
+    """Hash del contenido (y orden) de las columnas evaluadas del DataFrame"""
+    h = hashlib.sha256()
+    for columna, tipo in TIPOS_HUELLA.items():
+        if columna not in df:
+            continue
+        valores = df[columna].astype(tipo)
+        h.update(columna.encode())
+        h.update(pd.util.hash_pandas_object(valores, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def clave(*partes):
+    """Clave de caché a partir de valores serializables en JSON"""
+    texto = json.dumps([VERSION_CACHE, *partes], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _ruta(clave_entrada, directorio):
+    return os.path.join(directorio, f'{clave_entrada}.npz')
+
+
+def leer(clave_entrada, directorio=DIRECTORIO_CACHE):
+    """
+    Devuelve (arrays, metadatos) de la entrada, o None si no está.
+    """
+    ruta = _ruta(clave_entrada, directorio)
+    try:
+        with np.load(ruta, allow_pickle=False) as entrada:
+            arrays = {nombre: entrada[nombre] for nombre in entrada.files if nombre != '_meta'}
+            metadatos = json.loads(str(entrada['_meta']))
+    except (OSError, ValueError, KeyError):
+        return None
+    os.utime(ruta)  # Marca de uso para el desalojo
+    return arrays, metadatos
+
+
+def guardar(clave_entrada, arrays, metadatos, directorio=DIRECTORIO_CACHE):
+    """
+    Guarda una entrada (escritura atómica) y recorta la caché si se pasa de tamaño.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            np.savez_compressed(f, _meta=np.array(json.dumps(metadatos, default=str)), **arrays)
+        os.replace(temporal, _ruta(clave_entrada, directorio))
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    recortar(directorio)
+
+
+def recortar(directorio=DIRECTORIO_CACHE, tamano_maximo=TAMANO_MAXIMO_CACHE):
+    """Borra las entradas menos usadas hasta quedar por debajo del tamaño máximo"""
+    entradas = []
+    for entrada in os.scandir(directorio):
+        if entrada.name.endswith('.npz'):
+            estado = entrada.stat()
+            entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas):
+        if total <= tamano_maximo:
+            break
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+
+
+def grafico_actualizado(ruta_png, clave_grafico):
+    """True si el PNG existe y se dibujó con las mismas entradas"""
+    try:
+        with open(f'{ruta_png}.clave', encoding='utf-8') as f:
+            return f.read().strip() == clave_grafico and os.path.exists(ruta_png)
+    except OSError:
+        return False
+
+
+def marcar_grafico(ruta_png, clave_grafico):
+    """Guarda junto al PNG la clave de las entradas con que se dibujó"""
+    with open(f'{ruta_png}.clave', 'w', encoding='utf-8') as f:
+        f.write(clave_grafico)
@@ -1,12 +1,22 @@
 """
 Script para calcular y visualizar los KPIs de GreenDelivery.
 """
-import pandas as pd
-import psycopg2
+import argparse
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+import psycopg2.errors
+import psycopg2.pool
+import matplotlib
+matplotlib.use('Agg')  # Sin pantalla: solo se guardan archivos
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 
+import cache_evaluacion
+
 # Configuración
 DB_CONFIG = {
     'host': 'localhost',
@@ -16,143 +26,187 @@ DB_CONFIG = {
     'password': '1234'
 }
 
-def conectar_bd():
-    return psycopg2.connect(**DB_CONFIG)
+# Conexiones del pool: las consultas van una tras otra, basta con una
+# (el pool la reutiliza entre llamadas)
+MAX_CONEXIONES = 1
+
+# Dashboard: se guarda como <RUTA_DASHBOARD>.<formato> por cada formato
+RUTA_DASHBOARD = 'analytics/dashboard_kpis'
+FORMATOS_DASHBOARD = ('png',)
+DPI_DASHBOARD = 300
+
+# ==========================================
+# TODOS LOS KPIs EN UNA CONSULTA
+# ==========================================
+# - Paquetes distintos de telemetry con un "loose index scan" (CTE recursiva
+#   que salta de un paquete_id al siguiente por el índice): lee tantas
+#   entradas del índice como paquetes hay, no toda la tabla.
+# - Paquetes con alertas: EXISTS por el índice de alerts.paquete_id.
+# - Falsos positivos: una sola pasada por alerts.
+# - MTTD: latencia real de cada alerta (created_at - primera lectura de la
+#   racha), que la API guarda en alert_detection al crear la alerta
+#   (ver ingest_api/agregados.py); percentiles por tipo de incidente.
+CONSULTA_KPIS = """
+WITH RECURSIVE paquetes AS (
+    SELECT MIN(paquete_id) AS paquete_id FROM telemetry
+    UNION ALL
+    SELECT (SELECT MIN(t.paquete_id) FROM telemetry t WHERE t.paquete_id > p.paquete_id)
+    FROM paquetes p
+    WHERE p.paquete_id IS NOT NULL
+),
+sla AS (
+    SELECT
+        COUNT(*) AS total_paquetes,
+        COUNT(*) FILTER (
+            WHERE NOT EXISTS (SELECT 1 FROM alerts a WHERE a.paquete_id = p.paquete_id)
+        ) AS paquetes_sin_alertas
+    FROM paquetes p
+    WHERE p.paquete_id IS NOT NULL
+),
+alertas AS (
+    SELECT COUNT(*) AS total_alertas FROM alerts
+),
+deteccion AS (
+    SELECT
+        ROUND(AVG(segundos_deteccion)::numeric, 2) AS mttd_segundos,
+        ROUND(MIN(segundos_deteccion)::numeric, 2) AS deteccion_mas_rapida,
+        ROUND(MAX(segundos_deteccion)::numeric, 2) AS deteccion_mas_lenta
+    FROM alert_detection
+),
+por_tipo AS (
+    SELECT
+        tipo_incidente,
+        COUNT(*) AS n,
+        percentile_cont(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY segundos_deteccion) AS p
+    FROM alert_detection
+    GROUP BY tipo_incidente
+)
+SELECT
+    sla.total_paquetes,
+    sla.paquetes_sin_alertas,
+    ROUND(sla.paquetes_sin_alertas::numeric / NULLIF(sla.total_paquetes, 0) * 100, 2) AS porcentaje_sla,
+    alertas.total_alertas,
+    deteccion.mttd_segundos,
+    deteccion.deteccion_mas_rapida,
+    deteccion.deteccion_mas_lenta,
+    (
+        SELECT jsonb_object_agg(tipo_incidente, jsonb_build_object(
+            'n', n,
+            'p50', ROUND(p[1]::numeric, 2), 'p90', ROUND(p[2]::numeric, 2), 'p99', ROUND(p[3]::numeric, 2)
+        ))
+        FROM por_tipo
+    ) AS mttd_por_tipo,
+    -- Como no tenemos validaciones reales, estimamos 15%
+    ROUND(alertas.total_alertas * 0.15) AS falsos_positivos_estimados,
+    15.0 AS porcentaje_fp_estimado
+FROM sla, alertas, deteccion;
+"""
 
-def calcular_kpi_sla():
+# KPIs precalculados por ingest_api/agregados.py (vista materializada sobre
+# package_summary, refrescada con REFRESH ... CONCURRENTLY)
+CONSULTA_KPIS_MATERIALIZADA = "SELECT * FROM dashboard_kpis_mat;"
+
+COLUMNAS_SLA = ['total_paquetes', 'paquetes_sin_alertas', 'porcentaje_sla']
+COLUMNAS_MTTD = ['total_alertas', 'mttd_segundos', 'deteccion_mas_rapida', 'deteccion_mas_lenta',
+                 'mttd_por_tipo']
+PERCENTILES_MTTD = ['p50', 'p90', 'p99']
+COLUMNAS_FALSOS_POSITIVOS = ['total_alertas', 'falsos_positivos_estimados', 'porcentaje_fp_estimado']
+
+_pool = None
+
+
+def obtener_pool():
+    """Pool de conexiones compartido (se crea en el primer uso)"""
+    global _pool
+    if _pool is None:
+        _pool = psycopg2.pool.ThreadedConnectionPool(1, MAX_CONEXIONES, **DB_CONFIG)
+        atexit.register(_pool.closeall)
+    return _pool
+
+
+@contextmanager
+def conexion():
+    """Toma una conexión del pool (solo lectura, autocommit) y la devuelve al salir"""
+    pool = obtener_pool()
+    conn = pool.getconn()
+    try:
+        if not conn.autocommit:
+            conn.set_session(readonly=True, autocommit=True)
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def _valor(valor):
+    """NUMERIC de PostgreSQL (Decimal) → float"""
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+
+def consultar(query, params=None):
+    """Ejecuta una consulta y devuelve su primera fila como dict"""
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute(query, params)
+        fila = cur.fetchone()
+        columnas = [d[0] for d in cur.description]
+    return {c: _valor(v) for c, v in zip(columnas, fila)}
+
+
+def calcular_kpis(materializada=True):
     """
-    KPI 1: % de Envíos en SLA
+    Los 3 KPIs con un único viaje a la base de datos.
+    Devuelve (kpi_sla, kpi_mttd, kpi_falsos_positivos) como dicts.
+    
+    Args:
+        materializada: leer la vista dashboard_kpis_mat si existe (milisegundos,
+                       con los datos del último refresco); si no, calcularlos
     """
-    conn = conectar_bd()
-    
-    query = """
-    WITH paquetes_con_alertas AS (
-        SELECT DISTINCT id_paquete FROM alerts
-    ),
-    todos_los_paquetes AS (
-        SELECT DISTINCT id_paquete FROM telemetry
+    fila = None
+    if materializada:
+        try:
+            fila = consultar(CONSULTA_KPIS_MATERIALIZADA)
+            print(f"   └─ KPIs precalculados a las {fila['calculado_en']:%Y-%m-%d %H:%M:%S}")
+        except psycopg2.errors.UndefinedTable:
+            pass
+    if fila is None:
+        fila = consultar(CONSULTA_KPIS)
+    return tuple(
+        {c: fila[c] for c in columnas}
+        for columnas in (COLUMNAS_SLA, COLUMNAS_MTTD, COLUMNAS_FALSOS_POSITIVOS)
     )
-    SELECT 
-        COUNT(DISTINCT t.id_paquete) as total_paquetes,
-        COUNT(DISTINCT t.id_paquete) - COUNT(DISTINCT a.id_paquete) as paquetes_sin_alertas,
-        ROUND(
-            ((COUNT(DISTINCT t.id_paquete)::numeric - COUNT(DISTINCT a.id_paquete)::numeric) / 
-             COUNT(DISTINCT t.id_paquete)::numeric) * 100, 
-            2
-        ) as porcentaje_sla
-    FROM todos_los_paquetes t
-    LEFT JOIN paquetes_con_alertas a ON t.id_paquete = a.id_paquete;
+
+
+def calcular_kpi_sla():
     """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    
-    return df.iloc[0].to_dict()
+    KPI 1: % de Envíos en SLA
+    """
+    return calcular_kpis()[0]
+
 
 def calcular_kpi_mttd():
     """
     KPI 2: Tiempo Medio de Detección
     """
-    conn = conectar_bd()
-    
-    # Simplificado: usamos num_eventos * 2 segundos
-    query = """
-    SELECT 
-        COUNT(*) as total_alertas,
-        ROUND(AVG(num_eventos * 2.0)::numeric, 2) as mttd_segundos,
-        ROUND(MIN(num_eventos * 2.0)::numeric, 2) as deteccion_mas_rapida,
-        ROUND(MAX(num_eventos * 2.0)::numeric, 2) as deteccion_mas_lenta
-    FROM alerts;
-    """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    
-    return df.iloc[0].to_dict()
+    return calcular_kpis()[1]
+
 
 def calcular_kpi_falsos_positivos():
     """
     KPI 3: % de Falsos Positivos (estimado)
     """
-    conn = conectar_bd()
-    
-    # Como no tenemos validaciones reales, estimamos 15%
-    query = """
-    SELECT 
-        COUNT(*) as total_alertas,
-        ROUND(COUNT(*) * 0.15) as falsos_positivos_estimados,
-        15.0 as porcentaje_fp_estimado
-    FROM alerts;
-    """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    
-    return df.iloc[0].to_dict()
+    return calcular_kpis()[2]
+
+
+def segundos_o_nd(valor):
+    """'12.5s', o 'N/D' si no hay dato (alert_detection vacía, p. ej. antes de --reconstruir)"""
+    return 'N/D' if valor is None else f"{valor}s"
+
 
-def generar_dashboard():
+def dibujar_dashboard(kpi1, kpi2, kpi3, ruta):
     """
-    Genera un dashboard visual con los 3 KPIs
+    Dibuja el dashboard de los 3 KPIs y lo guarda en `ruta` (el formato
+    sale de la extensión). Función de módulo para poder lanzarla en otro
+    proceso.
     """
-    print("="*60)
-    print("📊 DASHBOARD DE KPIs - GREENDELIVERY")
-    print("="*60)
-    
-    # Calcular KPIs
-    print("\n🔄 Calculando KPIs...")
-    kpi1 = calcular_kpi_sla()
-    kpi2 = calcular_kpi_mttd()
-    kpi3 = calcular_kpi_falsos_positivos()
-    
-    # Mostrar en consola
-    print("\n" + "="*60)
-    print("📈 KPI 1: % DE ENVÍOS EN SLA (Tasa de Éxito)")
-    print("="*60)
-    print(f"Total de paquetes:       {kpi1['total_paquetes']}")
-    print(f"Paquetes sin alertas:    {kpi1['paquetes_sin_alertas']}")
-    print(f"📊 SLA: {kpi1['porcentaje_sla']}%")
-    
-    if kpi1['porcentaje_sla'] >= 95:
-        print("✅ Excelente - Cumpliendo la promesa de calidad")
-    elif kpi1['porcentaje_sla'] >= 90:
-        print("⚠️  Aceptable - Pero hay margen de mejora")
-    else:
-        print("❌ Crítico - Revisar procesos urgentemente")
-    
-    print("\n" + "="*60)
-    print("⏱️  KPI 2: TIEMPO MEDIO DE DETECCIÓN (MTTD)")
-    print("="*60)
-    print(f"Total de alertas:        {int(kpi2['total_alertas'])}")
-    print(f"Detección más rápida:    {kpi2['deteccion_mas_rapida']}s")
-    print(f"Detección más lenta:     {kpi2['deteccion_mas_lenta']}s")
-    print(f"📊 MTTD: {kpi2['mttd_segundos']}s")
-    
-    if kpi2['mttd_segundos'] < 30:
-        print("✅ Excelente - Reacción muy rápida")
-    elif kpi2['mttd_segundos'] < 60:
-        print("⚠️  Aceptable - Suficiente para intervenir")
-    else:
-        print("❌ Lento - Solo sirve para autopsias")
-    
-    print("\n" + "="*60)
-    print("🚨 KPI 3: % DE FALSOS POSITIVOS (Índice de Confianza)")
-    print("="*60)
-    print(f"Total de alertas:        {int(kpi3['total_alertas'])}")
-    print(f"Falsos positivos (est.): {int(kpi3['falsos_positivos_estimados'])}")
-    print(f"📊 Tasa de FP: {kpi3['porcentaje_fp_estimado']}%")
-    
-    if kpi3['porcentaje_fp_estimado'] < 10:
-        print("✅ Excelente - Sistema confiable")
-    elif kpi3['porcentaje_fp_estimado'] < 20:
-        print("⚠️  Aceptable - Monitorizar")
-    else:
-        print("❌ Crítico - Riesgo de fatiga de alertas")
-    
-    # ==========================================
-    # VISUALIZACIÓN
-    # ==========================================
-    print("\n📊 Generando gráficos...")
-    
     fig = plt.figure(figsize=(16, 5))
     
     # Colores corporativos
@@ -193,28 +247,35 @@ def generar_dashboard():
     ax2 = plt.subplot(132)
     
     mttd = kpi2['mttd_segundos']
-    color_mttd = color_excelente if mttd < 30 else (
-        color_aceptable if mttd < 60 else color_critico
-    )
-    
-    bars = ax2.bar(['Más rápida', 'MTTD Promedio', 'Más lenta'], 
-                   [kpi2['deteccion_mas_rapida'], mttd, kpi2['deteccion_mas_lenta']],
-                   color=[color_excelente, color_mttd, color_critico],
-                   alpha=0.7, edgecolor='black')
     
     ax2.axhline(y=30, color='green', linestyle='--', alpha=0.5, label='Meta (< 30s)')
     ax2.set_ylabel('Segundos', fontsize=11)
-    ax2.set_title(f'KPI 2: Tiempo Medio de Detección\n{mttd}s', 
+    ax2.set_title(f'KPI 2: Tiempo Medio de Detección\n{segundos_o_nd(mttd)}', 
                   fontsize=13, fontweight='bold')
     ax2.legend(fontsize=9)
     ax2.grid(axis='y', alpha=0.3)
     
-    # Añadir valores
-    for bar in bars:
-        height = bar.get_height()
-        ax2.text(bar.get_x() + bar.get_width()/2., height + 1,
-                f'{height:.1f}s',
-                ha='center', va='bottom', fontsize=10, fontweight='bold')
+    if mttd is None:
+        # Sin latencias de detección todavía: no hay barras que dibujar
+        ax2.set_ylim(0, 60)
+        ax2.set_xticks([])
+        ax2.text(0.5, 0.5, 'N/D', transform=ax2.transAxes,
+                 ha='center', va='center', fontsize=24, fontweight='bold', color='gray')
+    else:
+        color_mttd = color_excelente if mttd < 30 else (
+            color_aceptable if mttd < 60 else color_critico
+        )
+        bars = ax2.bar(['Más rápida', 'MTTD Promedio', 'Más lenta'], 
+                       [kpi2['deteccion_mas_rapida'], mttd, kpi2['deteccion_mas_lenta']],
+                       color=[color_excelente, color_mttd, color_critico],
+                       alpha=0.7, edgecolor='black')
+        
+        # Añadir valores
+        for bar in bars:
+            height = bar.get_height()
+            ax2.text(bar.get_x() + bar.get_width()/2., height + 1,
+                    f'{height:.1f}s',
+                    ha='center', va='bottom', fontsize=10, fontweight='bold')
     
     # ==========================================
     # GRÁFICO 3: FALSOS POSITIVOS
@@ -240,8 +301,114 @@ def generar_dashboard():
                   fontsize=13, fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('analytics/dashboard_kpis.png', dpi=300, bbox_inches='tight')
-    print(f"   └─ Dashboard guardado: analytics/dashboard_kpis.png")
+    plt.savefig(ruta, dpi=DPI_DASHBOARD, bbox_inches='tight')
+    plt.close(fig)
+
+
+def renderizar_dashboard(kpis, formatos=FORMATOS_DASHBOARD, forzar=False):
+    """
+    Genera el dashboard en cada formato pedido, saltando los que ya están
+    dibujados con los mismos KPIs (hash de las entradas en <archivo>.clave).
+    Si hay varios pendientes, se dibujan en paralelo en procesos aparte.
+    
+    Returns:
+        lista de (ruta, regenerado)
+    """
+    rutas = [f'{RUTA_DASHBOARD}.{formato}' for formato in formatos]
+    claves = {ruta: cache_evaluacion.clave('dashboard_kpis', kpis, ruta, DPI_DASHBOARD) for ruta in rutas}
+    pendientes = [
+        ruta for ruta in rutas
+        if forzar or not cache_evaluacion.grafico_actualizado(ruta, claves[ruta])
+    ]
+    
+    if len(pendientes) > 1:
+        with ProcessPoolExecutor(max_workers=len(pendientes)) as ejecutor:
+            list(ejecutor.map(dibujar_dashboard, *zip(*[(*kpis, ruta) for ruta in pendientes])))
+    elif pendientes:
+        dibujar_dashboard(*kpis, pendientes[0])
+    
+    for ruta in pendientes:
+        cache_evaluacion.marcar_grafico(ruta, claves[ruta])
+    return [(ruta, ruta in pendientes) for ruta in rutas]
+
+
+def generar_dashboard(formatos=FORMATOS_DASHBOARD, forzar=False):
+    """
+    Genera un dashboard visual con los 3 KPIs
+    
+    Args:
+        formatos: formatos del gráfico ('png', 'svg')
+        forzar: redibujar aunque los KPIs no hayan cambiado
+    """
+    print("="*60)
+    print("📊 DASHBOARD DE KPIs - GREENDELIVERY")
+    print("="*60)
+    
+    # Calcular KPIs
+    print("\n🔄 Calculando KPIs...")
+    kpis = calcular_kpis()
+    kpi1, kpi2, kpi3 = kpis
+    
+    # Mostrar en consola
+    print("\n" + "="*60)
+    print("📈 KPI 1: % DE ENVÍOS EN SLA (Tasa de Éxito)")
+    print("="*60)
+    print(f"Total de paquetes:       {kpi1['total_paquetes']}")
+    print(f"Paquetes sin alertas:    {kpi1['paquetes_sin_alertas']}")
+    print(f"📊 SLA: {kpi1['porcentaje_sla']}%")
+    
+    if kpi1['porcentaje_sla'] >= 95:
+        print("✅ Excelente - Cumpliendo la promesa de calidad")
+    elif kpi1['porcentaje_sla'] >= 90:
+        print("⚠️  Aceptable - Pero hay margen de mejora")
+    else:
+        print("❌ Crítico - Revisar procesos urgentemente")
+    
+    print("\n" + "="*60)
+    print("⏱️  KPI 2: TIEMPO MEDIO DE DETECCIÓN (MTTD)")
+    print("="*60)
+    print(f"Total de alertas:        {int(kpi2['total_alertas'])}")
+    print(f"Detección más rápida:    {segundos_o_nd(kpi2['deteccion_mas_rapida'])}")
+    print(f"Detección más lenta:     {segundos_o_nd(kpi2['deteccion_mas_lenta'])}")
+    print(f"📊 MTTD: {segundos_o_nd(kpi2['mttd_segundos'])}")
+    for tipo, valores in (kpi2['mttd_por_tipo'] or {}).items():
+        print(f"   └─ {tipo} ({valores['n']} alertas): " + " | ".join(
+            f"{p} {valores[p]}s" for p in PERCENTILES_MTTD
+        ))
+    
+    if kpi2['mttd_segundos'] is None:
+        print("ℹ️  N/D - Sin latencias de detección (python agregados.py --reconstruir)")
+    elif kpi2['mttd_segundos'] < 30:
+        print("✅ Excelente - Reacción muy rápida")
+    elif kpi2['mttd_segundos'] < 60:
+        print("⚠️  Aceptable - Suficiente para intervenir")
+    else:
+        print("❌ Lento - Solo sirve para autopsias")
+    
+    print("\n" + "="*60)
+    print("🚨 KPI 3: % DE FALSOS POSITIVOS (Índice de Confianza)")
+    print("="*60)
+    print(f"Total de alertas:        {int(kpi3['total_alertas'])}")
+    print(f"Falsos positivos (est.): {int(kpi3['falsos_positivos_estimados'])}")
+    print(f"📊 Tasa de FP: {kpi3['porcentaje_fp_estimado']}%")
+    
+    if kpi3['porcentaje_fp_estimado'] < 10:
+        print("✅ Excelente - Sistema confiable")
+    elif kpi3['porcentaje_fp_estimado'] < 20:
+        print("⚠️  Aceptable - Monitorizar")
+    else:
+        print("❌ Crítico - Riesgo de fatiga de alertas")
+    
+    # ==========================================
+    # VISUALIZACIÓN
+    # ==========================================
+    print("\n📊 Generando gráficos...")
+    
+    for ruta, regenerado in renderizar_dashboard(kpis, formatos, forzar):
+        if regenerado:
+            print(f"   └─ Dashboard guardado: {ruta}")
+        else:
+            print(f"   └─ Sin cambios: {ruta}")
     
     # ==========================================
     # GUARDAR INFORME
@@ -277,13 +444,21 @@ def generar_dashboard():
 | Métrica | Valor |
 |---------|-------|
 | Total de alertas | {int(kpi2['total_alertas'])} |
-| Detección más rápida | {kpi2['deteccion_mas_rapida']}s |
-| **MTTD Promedio** | **{kpi2['mttd_segundos']}s** |
-| Detección más lenta | {kpi2['deteccion_mas_lenta']}s |
-
+| Detección más rápida | {segundos_o_nd(kpi2['deteccion_mas_rapida'])} |
+| **MTTD Promedio** | **{segundos_o_nd(kpi2['mttd_segundos'])}** |
+| Detección más lenta | {segundos_o_nd(kpi2['deteccion_mas_lenta'])} |
+
+**Distribución por tipo de incidente:**
+
+| Tipo | Alertas | {' | '.join(PERCENTILES_MTTD)} |
+|------|---------|{'|'.join('-----' for _ in PERCENTILES_MTTD)}|
+""" + "".join(
+        f"| {tipo} | {valores['n']} | " + " | ".join(f"{valores[p]}s" for p in PERCENTILES_MTTD) + " |\n"
+        for tipo, valores in (kpi2['mttd_por_tipo'] or {}).items()
+    ) + f"""
 **Interpretación:**
 - Meta: < 30 segundos
-- Estado actual: {'✅ Excelente' if kpi2['mttd_segundos'] < 30 else '⚠️ Mejorar'}
+- Estado actual: {'ℹ️ N/D' if kpi2['mttd_segundos'] is None else '✅ Excelente' if kpi2['mttd_segundos'] < 30 else '⚠️ Mejorar'}
 
 ---
 
@@ -349,8 +524,15 @@ para reducir la carga de trabajo del equipo de operaciones.
     print("✅ ¡DASHBOARD GENERADO!")
     print("="*60)
     print("\nArchivos generados:")
-    print("  • analytics/dashboard_kpis.png")
+    for formato in formatos:
+        print(f"  • {RUTA_DASHBOARD}.{formato}")
     print("  • analytics/informe_kpis.md")
 
 if __name__ == "__main__":
-    generar_dashboard()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Dashboard de KPIs de GreenDelivery')
+    parser.add_argument('--formatos', nargs='+', choices=['png', 'svg'], default=list(FORMATOS_DASHBOARD),
+                        help='Formatos del gráfico (varios se dibujan en paralelo)')
+    parser.add_argument('--forzar', action='store_true',
+                        help='Redibujar aunque los KPIs no hayan cambiado')
+    args = parser.parse_args()
+    generar_dashboard(args.formatos, args.forzar)
\ No newline at end of file
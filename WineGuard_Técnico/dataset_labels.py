@@ -0,0 +1,154 @@
+"""
+Dataset de etiquetas en Parquet (sustituye a analytics/labels.csv para el análisis).
+
+Estructura (particionado estilo Hive, por fecha y paquete):
+
+    analytics/labels_dataset/fecha=2025-11-06/id_paquete=vino_tinto_001/part-0.parquet
+
+El modo incremental de generar_labels.py usa la misma estructura en
+analytics/labels/ (un archivo part-<primer id del trozo>.parquet por trozo).
+
+Las columnas se guardan tipadas (timestamp como timestamp UTC, sensores
+float64, incidente int8, tipo_incidente como diccionario) y comprimidas con
+zstd, así que al leer no hay que volver a parsear fechas ni inferir tipos.
+Los lectores piden solo las columnas que usan y pueden filtrar por fecha o
+paquete: las particiones que no cumplen el filtro ni se abren.
+"""
+import glob
+import os
+import shutil
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+DIRECTORIO_DATASET = 'analytics/labels_dataset'
+
+COLUMNAS_SENSORES = [
+    'temperatura', 'fuerza_g', 'inclinacion', 'humedad',
+    'oxigeno', 'vapores', 'iluminacion', 'vibracion'
+]
+
+ESQUEMA = pa.schema(
+    [
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+    ]
+    + [(columna, pa.float64()) for columna in COLUMNAS_SENSORES]
+    + [
+        ('incidente', pa.int8()),
+        ('tipo_incidente', pa.dictionary(pa.int8(), pa.string())),
+    ]
+)
+
+PARTICIONADO = ds.partitioning(
+    pa.schema([('fecha', pa.string()), ('id_paquete', pa.string())]),
+    flavor='hive'
+)
+
+FORMATO_PARQUET = ds.ParquetFileFormat()
+COMPRESION = 'zstd'
+
+
+def directorio_particion(directorio, fecha, id_paquete):
+    """analytics/labels_dataset/fecha=<fecha>/id_paquete=<id>"""
+    return os.path.join(
+        directorio, f"fecha={quote(str(fecha), safe='')}",
+        f"id_paquete={quote(str(id_paquete), safe='')}"
+    )
+
+
+def a_tabla(df_labels):
+    """DataFrame de labels (formato de labels.csv) → tabla Arrow tipada con la columna fecha"""
+    timestamps = pd.to_datetime(df_labels['timestamp'], utc=True, format='ISO8601')
+    columnas = {
+        'id': pa.array(df_labels['id'], pa.int64()),
+        'timestamp': pa.array(timestamps, pa.timestamp('us', tz='UTC')),
+    }
+    for columna in COLUMNAS_SENSORES:
+        columnas[columna] = pa.array(df_labels[columna], pa.float64())
+    columnas['incidente'] = pa.array(df_labels['incidente'], pa.int8())
+    columnas['tipo_incidente'] = pa.array(
+        df_labels['tipo_incidente'].astype(str), pa.string()
+    ).dictionary_encode().cast(ESQUEMA.field('tipo_incidente').type)
+    columnas['fecha'] = pa.array(timestamps.dt.strftime('%Y-%m-%d'), pa.string())
+    columnas['id_paquete'] = pa.array(df_labels['id_paquete'].astype(str), pa.string())
+    return pa.table(columnas)
+
+
+def escribir_dataset(df_labels, directorio=DIRECTORIO_DATASET, nombre='part-0', reemplazar=True):
+    """
+    Escribe las etiquetas en el dataset: un archivo <nombre>.parquet por
+    partición (fecha, paquete). Las columnas de partición van en la ruta.
+
+    Args:
+        nombre: nombre de los archivos; escribir dos veces el mismo nombre
+                sobrescribe en lugar de duplicar (útil en el modo incremental)
+        reemplazar: borra el dataset antes de escribir
+    """
+    if reemplazar:
+        shutil.rmtree(directorio, ignore_errors=True)
+    tabla = a_tabla(df_labels)
+    claves = pd.DataFrame({
+        'fecha': tabla['fecha'].to_numpy(zero_copy_only=False),
+        'id_paquete': tabla['id_paquete'].to_numpy(zero_copy_only=False),
+    })
+    datos = tabla.drop_columns(['fecha', 'id_paquete'])
+    for (fecha, id_paquete), indices in claves.groupby(['fecha', 'id_paquete'], sort=False).indices.items():
+        particion = directorio_particion(directorio, fecha, id_paquete)
+        os.makedirs(particion, exist_ok=True)
+        pq.write_table(
+            datos.take(indices), os.path.join(particion, f'{nombre}.parquet'),
+            compression=COMPRESION
+        )
+
+
+def borrar_paquetes(paquetes, directorio=DIRECTORIO_DATASET):
+    """Borra las particiones de los paquetes dados en todas las fechas"""
+    for id_paquete in paquetes:
+        patron = os.path.join(directorio, 'fecha=*', f"id_paquete={quote(str(id_paquete), safe='')}")
+        for particion in glob.glob(patron):
+            shutil.rmtree(particion, ignore_errors=True)
+
+
+def abrir_dataset(directorio=DIRECTORIO_DATASET):
+    """Dataset Arrow sobre el directorio (archivos leídos con memory mapping)"""
+    return ds.dataset(
+        directorio,
+        format=FORMATO_PARQUET,
+        partitioning=PARTICIONADO,
+        filesystem=fs.LocalFileSystem(use_mmap=True)
+    )
+
+
+def leer_dataset(columnas=None, filtro=None, directorio=DIRECTORIO_DATASET):
+    """
+    Lee el dataset como DataFrame, ordenado por id (orden de llegada a la API).
+
+    Args:
+        columnas: columnas a leer (None = todas); 'id' se añade para ordenar
+        filtro: expresión de pyarrow.dataset, p. ej. ds.field('fecha') >= '2025-11-06'
+    """
+    if columnas is not None and 'id' not in columnas:
+        columnas = ['id'] + list(columnas)
+    tabla = abrir_dataset(directorio).to_table(columns=columnas, filter=filtro)
+    tabla = tabla.sort_by('id')
+    return tabla.to_pandas()
+
+
+def crear_filtro(desde=None, hasta=None, paquetes=None):
+    """Expresión de filtro por rango de fechas (YYYY-MM-DD, inclusivo) y paquetes"""
+    condiciones = []
+    if desde:
+        condiciones.append(ds.field('fecha') >= desde)
+    if hasta:
+        condiciones.append(ds.field('fecha') <= hasta)
+    if paquetes:
+        condiciones.append(ds.field('id_paquete').isin(list(paquetes)))
+    filtro = None
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+    return filtro
@@ -0,0 +1,200 @@
+"""
+Motor de escenarios compartido por los simuladores (consola y GUI).
+
+Cada paquete tiene su propia línea temporal de incidentes. Los inicios y
+finales de cada incidente se guardan como transiciones en una cola de
+prioridad (heap) ordenada por evento; en cada evento solo se procesan las
+transiciones que vencen, así que el coste por evento depende de cuántos
+incidentes empiezan o terminan, no del tamaño de la flota.
+
+El estado activo se mantiene en una máscara booleana por tipo de incidente,
+lista para pasarse a generador_lote.generar_lote().
+"""
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+
+# ============================================
+# PARÁMETROS DE LOS INCIDENTES (escenario demo)
+# ============================================
+EVENTOS_ANTES_INCIDENTE_1 = 15      # Eventos normales antes del primer incidente
+EVENTOS_INCIDENTE_TEMPERATURA = 6   # Eventos anómalos del incidente de temperatura
+EVENTOS_ENTRE_INCIDENTES = 20       # Eventos normales entre incidentes
+EVENTOS_INCIDENTE_CHOQUE = 4        # Eventos anómalos del incidente de choque
+EVENTOS_FINALES = 30                # Eventos con el paquete caído al final
+
+EVENTO_PICO_EXTREMO_TEMP = 8        # En qué evento ocurre el pico de 28°C
+EVENTOS_VIBRACION_ALTA = [12, 25]   # En qué eventos hay vibración alta
+
+DURACION_CICLO = (
+    EVENTOS_ANTES_INCIDENTE_1 + EVENTOS_INCIDENTE_TEMPERATURA
+    + EVENTOS_ENTRE_INCIDENTES + EVENTOS_INCIDENTE_CHOQUE + EVENTOS_FINALES
+)
+
+# Tipos de incidente (mismos nombres que las máscaras de generar_lote)
+TIPOS_INCIDENTE = ("temperatura", "choque", "caido", "pico_extremo", "vibracion")
+
+# ============================================
+# PARÁMETROS DE FLOTAS ALEATORIAS
+# ============================================
+# Probabilidad por paquete y ciclo de cada incidente, y su duración en eventos
+PROBABILIDADES_ALEATORIAS = {
+    "temperatura": 0.10,
+    "choque": 0.05,
+    "pico_extremo": 0.10,
+    "vibracion": 0.20,
+}
+DURACIONES_ALEATORIAS = {
+    "temperatura": EVENTOS_INCIDENTE_TEMPERATURA,
+    "choque": EVENTOS_INCIDENTE_CHOQUE,
+    "pico_extremo": 1,
+    "vibracion": 1,
+}
+
+
+@dataclass(frozen=True)
+class Transicion:
+    """Un incidente que empieza (activo=True) o termina en un paquete"""
+    evento: int
+    paquete: int      # Posición del paquete en ids_paquete
+    tipo: str
+    activo: bool
+
+
+class MotorEscenario:
+    """
+    Línea temporal de incidentes por paquete, guardada en una cola de prioridad.
+
+    Uso:
+        motor = MotorEscenario(ids, programar_demo)
+        while True:
+            transiciones = motor.avanzar()
+            lote = generar_lote(ids, rng, **motor.mascaras)
+            if motor.ciclo_completo:
+                motor.reiniciar()
+    """
+
+    def __init__(self, ids_paquete, programar, duracion_ciclo=DURACION_CICLO):
+        """
+        Args:
+            ids_paquete: ids de los paquetes simulados
+            programar: función programar(motor) que rellena la línea temporal
+                       (se vuelve a llamar en cada ciclo)
+            duracion_ciclo: nº de eventos de cada ciclo
+        """
+        self.ids_paquete = list(ids_paquete)
+        self.duracion_ciclo = duracion_ciclo
+        self._programar = programar
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Vuelve al evento 0 y programa un nuevo ciclo"""
+        n = len(self.ids_paquete)
+        self.evento_actual = 0
+        self.mascaras = {tipo: np.zeros(n, dtype=bool) for tipo in TIPOS_INCIDENTE}
+        self._cola = []
+        self._secuencia = 0
+        self._programar(self)
+
+    def programar(self, paquete, tipo, inicio, duracion=1):
+        """
+        Programa un incidente activo en los eventos [inicio, inicio + duracion).
+        Se puede llamar durante la simulación para añadir incidentes.
+        """
+        if tipo not in self.mascaras:
+            raise ValueError(f"Tipo de incidente desconocido: {tipo}")
+        # En el mismo evento, los finales (0) se aplican antes que los inicios (1)
+        self._secuencia += 1
+        heapq.heappush(self._cola, (inicio, 1, self._secuencia, paquete, tipo))
+        self._secuencia += 1
+        heapq.heappush(self._cola, (inicio + duracion, 0, self._secuencia, paquete, tipo))
+
+    def programar_lote(self, paquetes, tipo, inicios, duraciones):
+        """
+        Programa muchos incidentes de golpe (arrays NumPy del mismo tamaño).
+        Las transiciones se añaden en bloque y la cola se reordena con un heapify.
+        """
+        if tipo not in self.mascaras:
+            raise ValueError(f"Tipo de incidente desconocido: {tipo}")
+        base = self._secuencia
+        paquetes, inicios = paquetes.tolist(), inicios.tolist()
+        finales = (np.asarray(inicios) + duraciones).tolist()
+        self._cola.extend(
+            (inicio, 1, base + 2 * i + 1, paquete, tipo)
+            for i, (paquete, inicio) in enumerate(zip(paquetes, inicios))
+        )
+        self._cola.extend(
+            (fin, 0, base + 2 * i + 2, paquete, tipo)
+            for i, (paquete, fin) in enumerate(zip(paquetes, finales))
+        )
+        self._secuencia = base + 2 * len(paquetes)
+        heapq.heapify(self._cola)
+
+    def avanzar(self):
+        """
+        Pasa al siguiente evento y aplica las transiciones que vencen.
+
+        Returns:
+            lista de Transicion aplicadas en este evento
+        """
+        self.evento_actual += 1
+        transiciones = []
+        cola = self._cola
+        while cola and cola[0][0] <= self.evento_actual:
+            _, activo, _, paquete, tipo = heapq.heappop(cola)
+            self.mascaras[tipo][paquete] = bool(activo)
+            transiciones.append(Transicion(self.evento_actual, paquete, tipo, bool(activo)))
+        return transiciones
+
+    @property
+    def ciclo_completo(self):
+        return self.evento_actual >= self.duracion_ciclo
+
+    def activos(self):
+        """Nº de paquetes con cada tipo de incidente activo"""
+        return {tipo: int(np.count_nonzero(m)) for tipo, m in self.mascaras.items()}
+
+
+# ============================================
+# ESCENARIOS
+# ============================================
+def programar_demo(motor):
+    """
+    Escenario de la demo (3 paquetes):
+    - 001: temperatura alta tras EVENTOS_ANTES_INCIDENTE_1 eventos
+    - 002: choque tras la recuperación y después paquete caído hasta el final
+    - 003: pico extremo de temperatura y vibraciones altas aisladas
+    """
+    inicio_temp = EVENTOS_ANTES_INCIDENTE_1 + 1
+    inicio_choque = inicio_temp + EVENTOS_INCIDENTE_TEMPERATURA + EVENTOS_ENTRE_INCIDENTES
+    inicio_caido = inicio_choque + EVENTOS_INCIDENTE_CHOQUE
+
+    motor.programar(0, "temperatura", inicio_temp, EVENTOS_INCIDENTE_TEMPERATURA)
+    motor.programar(1, "choque", inicio_choque, EVENTOS_INCIDENTE_CHOQUE)
+    motor.programar(1, "caido", inicio_caido, EVENTOS_FINALES)
+    motor.programar(2, "pico_extremo", EVENTO_PICO_EXTREMO_TEMP)
+    for evento in EVENTOS_VIBRACION_ALTA:
+        motor.programar(2, "vibracion", evento)
+
+
+def programador_aleatorio(rng=None, probabilidades=None, duraciones=None):
+    """
+    Devuelve una función programar(motor) que, en cada ciclo, da a cada
+    paquete sus propios incidentes con inicios aleatorios dentro del ciclo.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    probabilidades = probabilidades or PROBABILIDADES_ALEATORIAS
+    duraciones = duraciones or DURACIONES_ALEATORIAS
+
+    def programar(motor):
+        n = len(motor.ids_paquete)
+        for tipo, probabilidad in probabilidades.items():
+            duracion = duraciones[tipo]
+            paquetes = np.flatnonzero(rng.random(n) < probabilidad)
+            ultimo_inicio = max(1, motor.duracion_ciclo - duracion)
+            inicios = rng.integers(1, ultimo_inicio + 1, size=len(paquetes))
+            motor.programar_lote(paquetes, tipo, inicios, duracion)
+
+    return programar
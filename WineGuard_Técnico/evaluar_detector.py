@@ -1,6 +1,18 @@
 """
 Script de evaluación del detector de incidentes.
 Calcula Precisión, Recall, F1-Score y Matriz de Confusión.
+
+Con --barrido evalúa muchas configuraciones de umbrales en paralelo
+(rejilla o búsqueda aleatoria) y guarda la tabla, las curvas
+precisión/recall y las configuraciones Pareto-óptimas.
+
+Además de los umbrales, aplica los detectores de deriva de humedad,
+oxígeno y vapores (EWMA + CUSUM, ver ingest_api/deriva.py) en su versión
+por lotes (--sin-deriva para evaluar solo temperatura y choque).
+
+Predicciones, métricas y gráficos se guardan en la caché de
+cache_evaluacion.py: si ni los datos ni la configuración cambian,
+se reutilizan en lugar de recalcularse (--sin-cache para forzarlo).
 """
 import pandas as pd
 import numpy as np
@@ -13,7 +25,14 @@ from sklearn.metrics import (
 )
 import matplotlib.pyplot as plt
 import seaborn as sns
+import argparse
+import itertools
+import os
 from collections import defaultdict
+from multiprocessing import Pool, shared_memory
+
+import cache_evaluacion
+from dataset_labels import DIRECTORIO_DATASET, crear_filtro, leer_dataset
 
 # ==============================================
 # CONFIGURACIÓN (igual que detector.py)
@@ -23,6 +42,24 @@ UMBRAL_FUERZA_G = 2.5
 UMBRAL_INCLINACION = 30.0
 N_EVENTOS_CONSECUTIVOS = 3
 
+# ==============================================
+# DETECTORES DE DERIVA (igual que ingest_api/deriva.py)
+# ==============================================
+SENSORES_DERIVA = {'humedad': 0.5, 'oxigeno': 0.05, 'vapores': 0.1}  # Sensor → desviación mínima
+N_CALENTAMIENTO_DERIVA = 100
+ALFA_BASE = 0.01
+LAMBDA_EWMA = 0.1
+UMBRAL_Z_EWMA = 4.5
+K_CUSUM = 0.5
+H_CUSUM = 12.0
+CUSUM_MAX = 2 * H_CUSUM
+FACTOR_EWMA = float(np.sqrt(LAMBDA_EWMA / (2 - LAMBDA_EWMA)))
+
+# Columnas que necesita la evaluación (el resto ni se leen del dataset)
+COLUMNAS_EVALUACION = ['id_paquete', 'temperatura', 'fuerza_g', 'inclinacion', 'incidente']
+COLUMNAS_DERIVA = list(SENSORES_DERIVA)
+ARCHIVO_CSV = 'analytics/labels.csv'
+
 
 class DetectorSimulado:
     """
@@ -78,7 +115,186 @@ class DetectorSimulado:
         return alerta
 
 
-def evaluar_detector():
+# ==============================================
+# DETECTOR VECTORIZADO
+# ==============================================
+def preparar_arrays(df):
+    """
+    Columnas de la evaluación como arrays NumPy, ordenadas por paquete
+    (orden estable: dentro de cada paquete se respeta el orden de llegada).
+    
+    Si df trae las columnas de COLUMNAS_DERIVA, incluye también 'deriva':
+    True en los eventos en que algún detector de deriva está en alarma.
+    
+    Returns:
+        dict con temperatura, fuerza_g, inclinacion, incidente, inicio_paquete
+        (True en la primera fila de cada paquete) y orden (posición original)
+    """
+    codigos, _ = pd.factorize(df['id_paquete'])
+    orden = np.argsort(codigos, kind='stable')
+    codigos = codigos[orden]
+    inicio_paquete = np.ones(len(codigos), dtype=bool)
+    inicio_paquete[1:] = codigos[1:] != codigos[:-1]
+    arrays = {
+        'temperatura': df['temperatura'].to_numpy(dtype=np.float64)[orden],
+        'fuerza_g': df['fuerza_g'].to_numpy(dtype=np.float64)[orden],
+        'inclinacion': df['inclinacion'].to_numpy(dtype=np.float64)[orden],
+        'incidente': df['incidente'].to_numpy(dtype=np.int8)[orden],
+        'inicio_paquete': inicio_paquete,
+        'orden': orden,
+    }
+    if all(sensor in df for sensor in COLUMNAS_DERIVA):
+        valores = df[COLUMNAS_DERIVA].to_numpy(dtype=np.float64)[orden]
+        arrays['deriva'] = alarmas_deriva(valores, inicio_paquete).any(axis=1)
+    return arrays
+
+
+def rachas(condicion, inicio_paquete):
+    """
+    Nº de eventos consecutivos (hasta cada fila, incluida) en que se cumple
+    la condición, reiniciando en cada paquete. Sin bucles: para cada fila se
+    busca la última ruptura (condición falsa o cambio de paquete) con un
+    máximo acumulado.
+    """
+    posiciones = np.arange(len(condicion))
+    rupturas = np.where(~condicion, posiciones, np.where(inicio_paquete, posiciones - 1, -1))
+    return posiciones - np.maximum.accumulate(rupturas)
+
+
+def alarmas_deriva(valores, inicio_paquete, sigma_min=tuple(SENSORES_DERIVA.values())):
+    """
+    Versión por lotes de los detectores de deriva (deriva.actualizar de la
+    API): mismas operaciones en el mismo orden, así que da exactamente las
+    mismas alarmas que el detector en línea.
+    
+    El estado de cada paquete depende de sus lecturas anteriores, así que se
+    avanza lectura a lectura, pero a lo ancho: en el paso j se procesa a la
+    vez la j-ésima lectura de todos los paquetes (y de todos los sensores).
+    Son tantos pasos como lecturas tiene el paquete más largo.
+    
+    Args:
+        valores: (eventos, sensores) ordenados por paquete (como preparar_arrays)
+        inicio_paquete: True en la primera fila de cada paquete
+    
+    Returns:
+        (eventos, sensores) bool: True en las lecturas en alarma de deriva
+    """
+    n = len(valores)
+    alarmas = np.zeros(valores.shape, dtype=bool)
+    if n == 0:
+        return alarmas
+    inicios = np.flatnonzero(inicio_paquete)
+    longitudes = np.diff(np.append(inicios, n))
+    # De más a menos lecturas: los paquetes activos en cada paso son un prefijo
+    orden = np.argsort(-longitudes, kind='stable')
+    inicios, longitudes = inicios[orden], longitudes[orden]
+    activos = np.searchsorted(-longitudes, -np.arange(longitudes[0]), side='left')
+    
+    forma = (len(inicios), valores.shape[1])
+    media, varianza, ewma = np.zeros(forma), np.zeros(forma), np.zeros(forma)
+    cusum_pos, cusum_neg = np.zeros(forma), np.zeros(forma)
+    alarma = np.zeros(forma, dtype=bool)
+    sigma_min = np.asarray(sigma_min, dtype=np.float64)
+    
+    for j, m in enumerate(activos):
+        filas = inicios[:m] + j
+        x = valores[filas]
+        if j < N_CALENTAMIENTO_DERIVA:
+            # Línea base: media y varianza exactas de las primeras lecturas
+            d = x - media[:m]
+            media[:m] += d / (j + 1)
+            varianza[:m] += (d * (x - media[:m]) - varianza[:m]) / (j + 1)
+            ewma[:m] = media[:m]
+            continue
+        
+        m_media, m_varianza = media[:m], varianza[:m]
+        sigma = np.maximum(np.sqrt(m_varianza), sigma_min)
+        z = (x - m_media) / sigma
+        ewma[:m] += LAMBDA_EWMA * (x - ewma[:m])
+        z_ewma = (ewma[:m] - m_media) / (sigma * FACTOR_EWMA)
+        cusum_pos[:m] = np.clip(cusum_pos[:m] + z - K_CUSUM, 0.0, CUSUM_MAX)
+        cusum_neg[:m] = np.clip(cusum_neg[:m] - z - K_CUSUM, 0.0, CUSUM_MAX)
+        cusum = np.maximum(cusum_pos[:m], cusum_neg[:m])
+        
+        # Histéresis: en alarma, se apaga al bajar de la mitad de los umbrales
+        en_alarma = alarma[:m]
+        nueva = ((cusum > np.where(en_alarma, H_CUSUM / 2, H_CUSUM))
+                 | (np.abs(z_ewma) > np.where(en_alarma, UMBRAL_Z_EWMA / 2, UMBRAL_Z_EWMA)))
+        alarma[:m] = nueva
+        alarmas[filas] = nueva
+        
+        # La línea base solo aprende de lecturas en control
+        d = x - m_media
+        en_control = ~nueva
+        m_varianza[:] = np.where(en_control, (1 - ALFA_BASE) * (m_varianza + ALFA_BASE * d * d), m_varianza)
+        m_media[:] = np.where(en_control, m_media + ALFA_BASE * d, m_media)
+    return alarmas
+
+
+def predecir(arrays, umbral_temperatura=UMBRAL_TEMPERATURA, umbral_fuerza_g=UMBRAL_FUERZA_G,
+             umbral_inclinacion=UMBRAL_INCLINACION, n_eventos=N_EVENTOS_CONSECUTIVOS):
+    """
+    Misma lógica que DetectorSimulado para todos los eventos a la vez,
+    más las alarmas de deriva si preparar_arrays() las calculó.
+    Devuelve las predicciones (0/1) en el orden de preparar_arrays().
+    """
+    inicio = arrays['inicio_paquete']
+    temperatura_alta = arrays['temperatura'] > umbral_temperatura
+    choque = (arrays['fuerza_g'] > umbral_fuerza_g) & (arrays['inclinacion'] > umbral_inclinacion)
+    prediccion = (rachas(temperatura_alta, inicio) >= n_eventos) | (rachas(choque, inicio) >= n_eventos)
+    if 'deriva' in arrays:
+        prediccion |= arrays['deriva']
+    return prediccion.astype(np.int8)
+
+
+def metricas(y_true, y_pred):
+    """Matriz de confusión y precisión/recall/F1 a partir de los conteos"""
+    tp = int(np.count_nonzero(y_true & y_pred))
+    fp = int(np.count_nonzero(y_pred)) - tp
+    fn = int(np.count_nonzero(y_true)) - tp
+    tn = len(y_true) - tp - fp - fn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+            'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def cargar_labels(origen='auto', desde=None, hasta=None, columnas=COLUMNAS_EVALUACION):
+    """
+    Carga las columnas indicadas de las etiquetas, en orden de id.
+    - dataset: dataset Parquet de generar_labels.py (solo las columnas
+      necesarias y solo las particiones del rango de fechas)
+    - csv: analytics/labels.csv (generar_labels.py --csv)
+    - auto: el dataset si existe, si no el CSV
+    """
+    if origen == 'auto':
+        origen = 'dataset' if os.path.isdir(DIRECTORIO_DATASET) else 'csv'
+    if origen == 'dataset':
+        print(f"\n📂 Cargando {DIRECTORIO_DATASET}/...")
+        return leer_dataset(columnas, crear_filtro(desde, hasta))
+    print(f"\n📂 Cargando {ARCHIVO_CSV}...")
+    return pd.read_csv(ARCHIVO_CSV, usecols=['id'] + columnas)
+
+
+def configuracion_detector(deriva=True):
+    """Parámetros actuales del detector (forman parte de la clave de caché)"""
+    configuracion = {
+        'umbral_temperatura': UMBRAL_TEMPERATURA,
+        'umbral_fuerza_g': UMBRAL_FUERZA_G,
+        'umbral_inclinacion': UMBRAL_INCLINACION,
+        'n_eventos': N_EVENTOS_CONSECUTIVOS,
+    }
+    if deriva:
+        configuracion['deriva'] = {
+            'sensores': SENSORES_DERIVA, 'n_calentamiento': N_CALENTAMIENTO_DERIVA,
+            'alfa_base': ALFA_BASE, 'lambda_ewma': LAMBDA_EWMA, 'umbral_z_ewma': UMBRAL_Z_EWMA,
+            'k_cusum': K_CUSUM, 'h_cusum': H_CUSUM, 'cusum_max': CUSUM_MAX,
+        }
+    return configuracion
+
+
+def evaluar_detector(origen='auto', desde=None, hasta=None, usar_cache=True, deriva=True):
     """
     Función principal de evaluación.
     """
@@ -87,22 +303,47 @@ def evaluar_detector():
     print("="*60)
     
     # Cargar datos
-    print("\n📂 Cargando labels.csv...")
-    df = pd.read_csv('analytics/labels.csv')
+    df = cargar_labels(origen, desde, hasta,
+                       COLUMNAS_EVALUACION + (COLUMNAS_DERIVA if deriva else []))
     print(f"   └─ {len(df)} eventos cargados")
     
-    # Crear detector
-    detector = DetectorSimulado()
+    clave_resultado = cache_evaluacion.clave(
+        'evaluacion', cache_evaluacion.huella_datos(df), configuracion_detector(deriva)
+    )
+    en_cache = cache_evaluacion.leer(clave_resultado) if usar_cache else None
     
-    # Aplicar detector a todos los eventos
-    print("\n🔄 Aplicando lógica de detección...")
-    df['prediccion'] = df.apply(detector.procesar_evento, axis=1)
-    
-    # Extraer valores reales y predicciones
-    # IMPORTANTE: Para la evaluación, solo consideramos como "incidente real"
-    # aquellos eventos que están marcados como incidente=1 (parte de una alerta)
-    y_true = df['incidente'].values
-    y_pred = df['prediccion'].values
+    if en_cache is not None:
+        print("\n⚡ Mismos datos y configuración: predicciones y métricas desde la caché")
+        arrays_cache, resultado = en_cache
+        df['prediccion'] = arrays_cache['prediccion']
+        precision, recall, f1 = resultado['precision'], resultado['recall'], resultado['f1']
+        cm = np.array(resultado['cm'])
+    else:
+        # Aplicar detector a todos los eventos (versión vectorizada de DetectorSimulado)
+        print("\n🔄 Aplicando lógica de detección...")
+        arrays = preparar_arrays(df)
+        prediccion = np.empty(len(df), dtype=np.int8)
+        prediccion[arrays['orden']] = predecir(arrays)
+        df['prediccion'] = prediccion
+        if 'deriva' in arrays:
+            print(f"   └─ Deriva ({', '.join(COLUMNAS_DERIVA)}): "
+                  f"{int(arrays['deriva'].sum())} eventos en alarma")
+        
+        # Extraer valores reales y predicciones
+        # IMPORTANTE: Para la evaluación, solo consideramos como "incidente real"
+        # aquellos eventos que están marcados como incidente=1 (parte de una alerta)
+        y_true = df['incidente'].values
+        y_pred = df['prediccion'].values
+        
+        precision = precision_score(y_true, y_pred, zero_division=0)
+        recall = recall_score(y_true, y_pred, zero_division=0)
+        f1 = f1_score(y_true, y_pred, zero_division=0)
+        cm = confusion_matrix(y_true, y_pred)
+        
+        cache_evaluacion.guardar(clave_resultado, {'prediccion': prediccion}, {
+            'precision': float(precision), 'recall': float(recall), 'f1': float(f1),
+            'cm': cm.tolist(),
+        })
     
     # ==============================================
     # CALCULAR MÉTRICAS
@@ -111,10 +352,6 @@ def evaluar_detector():
     print("📊 RESULTADOS DE LA EVALUACIÓN")
     print("="*60)
     
-    precision = precision_score(y_true, y_pred, zero_division=0)
-    recall = recall_score(y_true, y_pred, zero_division=0)
-    f1 = f1_score(y_true, y_pred, zero_division=0)
-    
     print(f"\n🎯 PRECISIÓN (Precision):  {precision:.4f} ({precision*100:.2f}%)")
     print(f"   └─ Cuando el sistema genera una alerta, acierta el {precision*100:.1f}% de las veces")
     
@@ -127,8 +364,6 @@ def evaluar_detector():
     # ==============================================
     # MATRIZ DE CONFUSIÓN
     # ==============================================
-    cm = confusion_matrix(y_true, y_pred)
-    
     print("\n" + "="*60)
     print("📈 MATRIZ DE CONFUSIÓN")
     print("="*60)
@@ -164,40 +399,47 @@ def evaluar_detector():
     # ==============================================
     print("\n📊 Generando visualizaciones...")
     
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-    
-    # Gráfico 1: Matriz de Confusión
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=['Normal', 'Incidente'],
-                yticklabels=['Normal', 'Incidente'],
-                ax=axes[0], cbar_kws={'label': 'Cantidad'})
-    axes[0].set_title('Matriz de Confusión', fontsize=14, fontweight='bold')
-    axes[0].set_ylabel('Realidad (Ground Truth)', fontsize=12)
-    axes[0].set_xlabel('Predicción del Detector', fontsize=12)
-    
-    # Gráfico 2: Métricas
-    metrics = ['Precisión', 'Recall', 'F1-Score']
-    values = [precision, recall, f1]
-    colors = ['#1f77b4' if v >= 0.7 else '#ff7f0e' for v in values]
-    
-    bars = axes[1].bar(metrics, values, color=colors, alpha=0.7, edgecolor='black')
-    axes[1].axhline(y=0.7, color='green', linestyle='--', linewidth=2, label='Umbral objetivo (0.7)')
-    axes[1].set_ylim(0, 1)
-    axes[1].set_ylabel('Score', fontsize=12)
-    axes[1].set_title('Métricas de Rendimiento', fontsize=14, fontweight='bold')
-    axes[1].legend()
-    axes[1].grid(axis='y', alpha=0.3)
-    
-    # Añadir valores en las barras
-    for bar, value in zip(bars, values):
-        height = bar.get_height()
-        axes[1].text(bar.get_x() + bar.get_width()/2., height + 0.02,
-                    f'{value:.3f}',
-                    ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    plt.savefig('analytics/evaluacion_detector.png', dpi=300, bbox_inches='tight')
-    print(f"   └─ Gráfico guardado: analytics/evaluacion_detector.png")
+    ruta_grafico = 'analytics/evaluacion_detector.png'
+    clave_grafico = cache_evaluacion.clave('grafico_evaluacion', cm.tolist(), precision, recall, f1)
+    if usar_cache and cache_evaluacion.grafico_actualizado(ruta_grafico, clave_grafico):
+        print(f"   └─ Sin cambios: {ruta_grafico}")
+    else:
+        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        
+        # Gráfico 1: Matriz de Confusión
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
+                    xticklabels=['Normal', 'Incidente'],
+                    yticklabels=['Normal', 'Incidente'],
+                    ax=axes[0], cbar_kws={'label': 'Cantidad'})
+        axes[0].set_title('Matriz de Confusión', fontsize=14, fontweight='bold')
+        axes[0].set_ylabel('Realidad (Ground Truth)', fontsize=12)
+        axes[0].set_xlabel('Predicción del Detector', fontsize=12)
+        
+        # Gráfico 2: Métricas
+        metrics = ['Precisión', 'Recall', 'F1-Score']
+        values = [precision, recall, f1]
+        colors = ['#1f77b4' if v >= 0.7 else '#ff7f0e' for v in values]
+        
+        bars = axes[1].bar(metrics, values, color=colors, alpha=0.7, edgecolor='black')
+        axes[1].axhline(y=0.7, color='green', linestyle='--', linewidth=2, label='Umbral objetivo (0.7)')
+        axes[1].set_ylim(0, 1)
+        axes[1].set_ylabel('Score', fontsize=12)
+        axes[1].set_title('Métricas de Rendimiento', fontsize=14, fontweight='bold')
+        axes[1].legend()
+        axes[1].grid(axis='y', alpha=0.3)
+        
+        # Añadir valores en las barras
+        for bar, value in zip(bars, values):
+            height = bar.get_height()
+            axes[1].text(bar.get_x() + bar.get_width()/2., height + 0.02,
+                        f'{value:.3f}',
+                        ha='center', va='bottom', fontweight='bold')
+        
+        plt.tight_layout()
+        plt.savefig(ruta_grafico, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+        cache_evaluacion.marcar_grafico(ruta_grafico, clave_grafico)
+        print(f"   └─ Gráfico guardado: {ruta_grafico}")
     
     # ==============================================
     # GUARDAR INFORME
@@ -216,6 +458,7 @@ def evaluar_detector():
 - **Umbral de Fuerza G:** > {UMBRAL_FUERZA_G}G
 - **Umbral de Inclinación:** > {UMBRAL_INCLINACION}°
 - **Eventos Consecutivos (N):** {N_EVENTOS_CONSECUTIVOS}
+- **Deriva ({', '.join(COLUMNAS_DERIVA)}):** {f"EWMA (λ={LAMBDA_EWMA}, |z| > {UMBRAL_Z_EWMA}) + CUSUM (k={K_CUSUM}, h={H_CUSUM}), línea base de {N_CALENTAMIENTO_DERIVA} lecturas" if deriva else "desactivada"}
 
 **Justificación del valor N={N_EVENTOS_CONSECUTIVOS}:**
 - 1-2 eventos podrían ser picos aislados (baches en la carretera)
@@ -302,12 +545,254 @@ El sistema funciona bien porque:
     print("✅ ¡EVALUACIÓN COMPLETADA!")
     print("="*60)
     print("\nArchivos generados:")
-    print("  • analytics/labels.csv")
     print("  • analytics/evaluacion_detector.png")
     print("  • analytics/informe_evaluacion.md")
     
     return precision, recall, f1, cm
 
 
+# ==============================================
+# MODO BARRIDO
+# ==============================================
+PARAMETROS = ['umbral_temperatura', 'umbral_fuerza_g', 'umbral_inclinacion', 'n_eventos']
+
+# Rejilla por defecto: 9 x 6 x 9 x 5 = 2430 configuraciones
+REJILLA_BARRIDO = {
+    'umbral_temperatura': np.arange(6.0, 10.01, 0.5),
+    'umbral_fuerza_g': np.arange(1.5, 4.01, 0.5),
+    'umbral_inclinacion': np.arange(10.0, 50.01, 5.0),
+    'n_eventos': [1, 2, 3, 4, 5],
+}
+
+# Rangos de la búsqueda aleatoria (mínimo, máximo)
+RANGOS_ALEATORIOS = {
+    'umbral_temperatura': (5.0, 12.0),
+    'umbral_fuerza_g': (1.0, 5.0),
+    'umbral_inclinacion': (5.0, 60.0),
+    'n_eventos': (1, 6),
+}
+
+CONFIGURACIONES_POR_TAREA = 50
+
+# Arrays compartidos de cada proceso del pool (se rellenan en _iniciar_proceso)
+_ARRAYS_COMPARTIDOS = {}
+_MEMORIA_COMPARTIDA = []
+
+
+def configuraciones_rejilla(rejilla=REJILLA_BARRIDO):
+    """Todas las combinaciones de la rejilla"""
+    return [
+        tuple(float(v) for v in combinacion[:3]) + (int(combinacion[3]),)
+        for combinacion in itertools.product(*(rejilla[p] for p in PARAMETROS))
+    ]
+
+
+def configuraciones_aleatorias(n, rangos=RANGOS_ALEATORIOS, semilla=None):
+    """n configuraciones al azar dentro de los rangos"""
+    rng = np.random.default_rng(semilla)
+    columnas = [
+        np.round(rng.uniform(*rangos[p], n), 2) for p in PARAMETROS[:3]
+    ] + [rng.integers(rangos['n_eventos'][0], rangos['n_eventos'][1] + 1, n)]
+    return [
+        (float(t), float(g), float(i), int(k)) for t, g, i, k in zip(*columnas)
+    ]
+
+
+def _iniciar_proceso(descriptores):
+    """Cada proceso se engancha a la memoria compartida (sin copiar los datos)"""
+    for nombre, (nombre_shm, forma, tipo) in descriptores.items():
+        shm = shared_memory.SharedMemory(name=nombre_shm)
+        _MEMORIA_COMPARTIDA.append(shm)
+        _ARRAYS_COMPARTIDOS[nombre] = np.ndarray(forma, dtype=tipo, buffer=shm.buf)
+
+
+def _evaluar_configuraciones(configuraciones):
+    """Tarea del pool: evalúa un bloque de configuraciones sobre los arrays compartidos"""
+    arrays = _ARRAYS_COMPARTIDOS
+    y_true = arrays['incidente'].astype(bool)
+    return [
+        dict(zip(PARAMETROS, configuracion),
+             **metricas(y_true, predecir(arrays, *configuracion).astype(bool)))
+        for configuracion in configuraciones
+    ]
+
+
+def barrer_umbrales(df, configuraciones, procesos=None):
+    """
+    Evalúa cada configuración (umbral_temperatura, umbral_fuerza_g,
+    umbral_inclinacion, n_eventos) en un pool de procesos.
+    
+    El dataset se copia una sola vez a memoria compartida (solo lectura);
+    a cada tarea solo se le envía su lista de configuraciones.
+    
+    Returns:
+        DataFrame con una fila por configuración y sus métricas
+    """
+    arrays = preparar_arrays(df)
+    del arrays['orden']  # Las métricas no dependen del orden de las filas
+    
+    bloques_shm = []
+    descriptores = {}
+    try:
+        for nombre, valores in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(valores.nbytes, 1))
+            bloques_shm.append(shm)
+            np.ndarray(valores.shape, dtype=valores.dtype, buffer=shm.buf)[:] = valores
+            descriptores[nombre] = (shm.name, valores.shape, valores.dtype.str)
+        
+        tareas = [
+            configuraciones[i:i + CONFIGURACIONES_POR_TAREA]
+            for i in range(0, len(configuraciones), CONFIGURACIONES_POR_TAREA)
+        ]
+        with Pool(procesos, initializer=_iniciar_proceso, initargs=(descriptores,)) as pool:
+            resultados = [r for bloque in pool.imap(_evaluar_configuraciones, tareas) for r in bloque]
+    finally:
+        for shm in bloques_shm:
+            shm.close()
+            shm.unlink()
+    
+    return pd.DataFrame(resultados, columns=PARAMETROS + list(metricas(np.zeros(0, bool), np.zeros(0, bool))))
+
+
+def frente_pareto(resultados):
+    """
+    Configuraciones Pareto-óptimas en (precisión, recall): ninguna otra
+    las mejora en una métrica sin empeorar la otra.
+    """
+    ordenados = resultados.sort_values(['recall', 'precision'], ascending=False)
+    mejor_precision = -1.0
+    filas = []
+    for indice, precision in zip(ordenados.index, ordenados['precision']):
+        if precision > mejor_precision:
+            filas.append(indice)
+            mejor_precision = precision
+    return resultados.loc[filas].sort_values('recall')
+
+
+def guardar_barrido(resultados, pareto, clave_grafico=None):
+    """
+    Tabla completa, frente de Pareto y gráfico precisión/recall.
+    El gráfico no se redibuja si ya se hizo con la misma clave de entradas.
+    """
+    os.makedirs('analytics', exist_ok=True)
+    resultados.sort_values('f1', ascending=False).to_csv('analytics/barrido_detector.csv', index=False)
+    pareto.to_csv('analytics/barrido_pareto.csv', index=False)
+    
+    ruta_grafico = 'analytics/barrido_pr.png'
+    if clave_grafico and cache_evaluacion.grafico_actualizado(ruta_grafico, clave_grafico):
+        return
+    
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    
+    # Gráfico 1: todas las configuraciones y el frente de Pareto
+    dispersion = axes[0].scatter(resultados['recall'], resultados['precision'],
+                                 c=resultados['n_eventos'], cmap='viridis', s=12, alpha=0.6)
+    axes[0].plot(pareto['recall'], pareto['precision'], 'r-o', markersize=4, label='Frente de Pareto')
+    axes[0].set_xlabel('Recall', fontsize=12)
+    axes[0].set_ylabel('Precisión', fontsize=12)
+    axes[0].set_title('Precisión vs Recall por configuración', fontsize=14, fontweight='bold')
+    axes[0].legend()
+    axes[0].grid(alpha=0.3)
+    fig.colorbar(dispersion, ax=axes[0], label='N eventos consecutivos')
+    
+    # Gráfico 2: curva PR al mover el umbral de temperatura (resto de parámetros actuales)
+    for n_eventos, grupo in resultados.groupby('n_eventos'):
+        actuales = grupo[
+            np.isclose(grupo['umbral_fuerza_g'], UMBRAL_FUERZA_G)
+            & np.isclose(grupo['umbral_inclinacion'], UMBRAL_INCLINACION)
+        ].sort_values('umbral_temperatura')
+        if len(actuales) > 1:
+            axes[1].plot(actuales['recall'], actuales['precision'], '-o', markersize=3,
+                         label=f'N = {n_eventos}')
+    axes[1].set_xlabel('Recall', fontsize=12)
+    axes[1].set_ylabel('Precisión', fontsize=12)
+    axes[1].set_title('Curvas PR variando el umbral de temperatura', fontsize=14, fontweight='bold')
+    axes[1].grid(alpha=0.3)
+    if axes[1].lines:
+        axes[1].legend()
+    
+    plt.tight_layout()
+    plt.savefig(ruta_grafico, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    if clave_grafico:
+        cache_evaluacion.marcar_grafico(ruta_grafico, clave_grafico)
+
+
+def evaluar_barrido(origen='auto', desde=None, hasta=None, aleatorias=0, procesos=None, semilla=None,
+                    usar_cache=True, deriva=True):
+    """
+    Evalúa la rejilla de umbrales (o `aleatorias` configuraciones al azar).
+    Las alarmas de deriva no dependen de los umbrales barridos: se calculan
+    una vez y se suman a las predicciones de todas las configuraciones.
+    """
+    print("="*60)
+    print("🔬 BARRIDO DE UMBRALES DEL DETECTOR")
+    print("="*60)
+    
+    df = cargar_labels(origen, desde, hasta,
+                       COLUMNAS_EVALUACION + (COLUMNAS_DERIVA if deriva else []))
+    print(f"   └─ {len(df)} eventos cargados")
+    
+    if aleatorias:
+        configuraciones = configuraciones_aleatorias(aleatorias, semilla=semilla)
+    else:
+        configuraciones = configuraciones_rejilla()
+    
+    clave_resultado = cache_evaluacion.clave(
+        'barrido', cache_evaluacion.huella_datos(df), configuraciones,
+        configuracion_detector(deriva).get('deriva')
+    )
+    en_cache = cache_evaluacion.leer(clave_resultado) if usar_cache else None
+    if en_cache is not None:
+        print(f"\n⚡ {len(configuraciones)} configuraciones ya evaluadas con estos datos: resultados desde la caché")
+        resultados = pd.DataFrame(en_cache[0])[en_cache[1]['columnas']]
+    else:
+        print(f"\n🔄 Evaluando {len(configuraciones)} configuraciones en paralelo...")
+        resultados = barrer_umbrales(df, configuraciones, procesos)
+        cache_evaluacion.guardar(
+            clave_resultado,
+            {columna: resultados[columna].to_numpy() for columna in resultados.columns},
+            {'columnas': list(resultados.columns)}
+        )
+    pareto = frente_pareto(resultados)
+    
+    print("\n🏆 Mejores configuraciones por F1:")
+    print(resultados.nlargest(5, 'f1')[PARAMETROS + ['precision', 'recall', 'f1']].to_string(index=False))
+    print(f"\n📈 Frente de Pareto ({len(pareto)} configuraciones):")
+    print(pareto[PARAMETROS + ['precision', 'recall', 'f1']].to_string(index=False))
+    
+    clave_grafico = cache_evaluacion.clave('grafico_barrido', clave_resultado) if usar_cache else None
+    guardar_barrido(resultados, pareto, clave_grafico)
+    print("\nArchivos generados:")
+    print("  • analytics/barrido_detector.csv")
+    print("  • analytics/barrido_pareto.csv")
+    print("  • analytics/barrido_pr.png")
+    
+    return resultados, pareto
+
+
 if __name__ == "__main__":
-    evaluar_detector()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evalúa el detector con las etiquetas")
+    parser.add_argument("--origen", choices=["auto", "dataset", "csv"], default="auto",
+                        help="De dónde leer las etiquetas (auto: dataset Parquet si existe)")
+    parser.add_argument("--desde", help="Primera fecha a evaluar (YYYY-MM-DD, solo dataset)")
+    parser.add_argument("--hasta", help="Última fecha a evaluar (YYYY-MM-DD, solo dataset)")
+    parser.add_argument("--barrido", action="store_true",
+                        help="Evalúa una rejilla de umbrales en paralelo en lugar de la configuración actual")
+    parser.add_argument("--aleatorias", type=int, default=0,
+                        help="Con --barrido: nº de configuraciones al azar en lugar de la rejilla")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Con --barrido: procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--semilla", type=int, default=None,
+                        help="Con --barrido: semilla de la búsqueda aleatoria")
+    parser.add_argument("--sin-deriva", action="store_true",
+                        help="Evalúa solo temperatura y choque, sin los detectores de deriva")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help=f"Recalcula todo sin leer la caché ({cache_evaluacion.DIRECTORIO_CACHE})")
+    args = parser.parse_args()
+    if args.barrido:
+        evaluar_barrido(args.origen, args.desde, args.hasta,
+                        args.aleatorias, args.procesos, args.semilla, not args.sin_cache,
+                        not args.sin_deriva)
+    else:
+        evaluar_detector(args.origen, args.desde, args.hasta, not args.sin_cache, not args.sin_deriva)
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Generador vectorizado de telemetría.
+Produce las lecturas de N paquetes de una vez como columnas NumPy
+(una por sensor) y las serializa directamente desde los arrays,
+sin construir un dict por lectura.
+"""
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+# ============================================
+# RANGOS DE LOS SENSORES
+# ============================================
+# Mismo orden que el JSON que publicaba generar_datos_normales()
+RANGOS_NORMALES = {
+    "temperatura": (4.0, 7.5),      # °C
+    "fuerza_g": (0.1, 1.8),         # G
+    "inclinacion": (0.0, 15.0),     # grados
+    "humedad": (50.0, 70.0),        # %
+    "oxigeno": (19.0, 21.0),        # %
+    "vapores": (0.0, 5.0),          # ppm
+    "iluminacion": (0.0, 50.0),     # lux
+    "vibracion": (0.0, 2.0),        # Hz
+}
+CAMPOS = tuple(RANGOS_NORMALES)
+
+# Rangos de los incidentes inyectados
+RANGO_TEMPERATURA_ALTA = (9.0, 12.0)
+RANGO_CHOQUE_FUERZA_G = (3.5, 5.0)
+RANGO_CHOQUE_INCLINACION = (45.0, 90.0)
+RANGO_PICO_EXTREMO_TEMP = (25.0, 30.0)
+RANGO_VIBRACION_ALTA = (5.0, 8.0)
+
+
+def _sobrescribir(columna, mascara, rango, rng):
+    """Sustituye los valores marcados en la máscara por otros del rango dado"""
+    n = int(np.count_nonzero(mascara))
+    if n:
+        columna[mascara] = np.round(rng.uniform(rango[0], rango[1], n), 2)
+
+
+def generar_lote(ids_paquete, rng=None, timestamp=None,
+                 temperatura=None, choque=None, caido=None,
+                 pico_extremo=None, vibracion=None):
+    """
+    Genera una lectura por paquete como columnas NumPy.
+
+    Las máscaras booleanas (una posición por paquete) inyectan incidentes:
+    - temperatura: temperatura alta (9-12°C)
+    - choque: fuerza_g e inclinación altas
+    - caido: paquete sin movimiento (fuerza_g, inclinación y vibración a 0)
+    - pico_extremo: pico aislado de temperatura (25-30°C)
+    - vibracion: vibración alta (5-8 Hz)
+
+    Returns:
+        dict con 'id_paquete', una columna float64 por sensor y 'timestamp'
+        (datetime64[us], el mismo instante para todo el lote)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    ids = np.asarray(ids_paquete)
+    n = len(ids)
+
+    # Una sola llamada al generador para los 8 sensores
+    bajos = np.array([r[0] for r in RANGOS_NORMALES.values()])
+    altos = np.array([r[1] for r in RANGOS_NORMALES.values()])
+    valores = np.round(rng.uniform(bajos, altos, size=(n, len(CAMPOS))), 2)
+    lote = {campo: valores[:, i] for i, campo in enumerate(CAMPOS)}
+
+    if temperatura is not None:
+        _sobrescribir(lote["temperatura"], temperatura, RANGO_TEMPERATURA_ALTA, rng)
+    if choque is not None:
+        _sobrescribir(lote["fuerza_g"], choque, RANGO_CHOQUE_FUERZA_G, rng)
+        _sobrescribir(lote["inclinacion"], choque, RANGO_CHOQUE_INCLINACION, rng)
+    if caido is not None:
+        lote["fuerza_g"][caido] = 0.0
+        lote["inclinacion"][caido] = 0.0
+        lote["vibracion"][caido] = 0.0
+    if pico_extremo is not None:
+        _sobrescribir(lote["temperatura"], pico_extremo, RANGO_PICO_EXTREMO_TEMP, rng)
+    if vibracion is not None:
+        _sobrescribir(lote["vibracion"], vibracion, RANGO_VIBRACION_ALTA, rng)
+
+    if timestamp is None:
+        timestamp = np.datetime64(datetime.utcnow(), "us")
+    lote["id_paquete"] = ids
+    lote["timestamp"] = np.full(n, timestamp, dtype="datetime64[us]")
+    return lote
+
+
+def marcar_sonda(lote, seq_inicial, t_envio=None, ejecucion=None):
+    """
+    Añade la sonda de latencia al lote: un nº de secuencia por lectura
+    ('seq', consecutivo desde seq_inicial) y la hora de envío ('t_envio',
+    epoch en segundos, la misma para todo el lote). Con ejecucion, añade
+    también el id de la ejecución del simulador ('ejecucion'): seq empieza
+    en 0 en cada ejecución y los huecos se cuentan por ejecución.
+
+    Returns:
+        el siguiente nº de secuencia libre
+    """
+    n = len(lote["id_paquete"])
+    if t_envio is None:
+        t_envio = time.time()
+    if ejecucion is not None:
+        lote["ejecucion"] = np.full(n, ejecucion, dtype=np.int64)
+    lote["seq"] = np.arange(seq_inicial, seq_inicial + n, dtype=np.int64)
+    lote["t_envio"] = np.full(n, t_envio)
+    return seq_inicial + n
+
+
+def lote_a_dicts(lote):
+    """Convierte un lote en una lista de dicts (mismo formato que generar_datos_normales)"""
+    timestamps = [ts + "Z" for ts in np.datetime_as_string(lote["timestamp"], unit="us")]
+    columnas = [lote[campo].tolist() for campo in CAMPOS]
+    lecturas = [
+        {"id_paquete": id_paquete, **dict(zip(CAMPOS, valores)), "timestamp": ts}
+        for id_paquete, ts, *valores in zip(lote["id_paquete"].tolist(), timestamps, *columnas)
+    ]
+    if "ejecucion" in lote:
+        for data, ejecucion in zip(lecturas, lote["ejecucion"].tolist()):
+            data["ejecucion"] = ejecucion
+    if "seq" in lote:
+        for data, seq, t_envio in zip(lecturas, lote["seq"].tolist(), lote["t_envio"].tolist()):
+            data["seq"] = seq
+            data["t_envio"] = t_envio
+    return lecturas
+
+
+def lectura(lote, i):
+    """Devuelve la lectura del paquete i del lote como dict"""
+    return lote_a_dicts({k: v[i:i + 1] for k, v in lote.items()})[0]
+
+
+# Plantilla con el mismo orden de claves que json.dumps(generar_datos_normales(...))
+_PLANTILLA_JSON = (
+    '{"id_paquete": %s, '
+    + ", ".join(f'"{campo}": %s' for campo in CAMPOS)
+    + ', "timestamp": "%sZ"}'
+)
+_PLANTILLA_SONDA = _PLANTILLA_JSON[:-1] + ', "seq": %d, "t_envio": %r}'
+_PLANTILLA_EJECUCION = _PLANTILLA_JSON[:-1] + ', "ejecucion": %d, "seq": %d, "t_envio": %r}'
+
+# Tabla de textos por centésima: los valores ya vienen redondeados a 2 decimales,
+# así que formatear un float es un simple acceso indexado a esta tabla
+# (se guarda como tupla para sustituirla de forma atómica si hay que ampliarla)
+_TABLA_TEXTOS = (0, np.empty(0, dtype=object))
+
+
+def _textos_centesimas(columna):
+    """Devuelve repr() de cada valor de la columna usando la tabla de textos"""
+    global _TABLA_TEXTOS
+    inicio, textos = _TABLA_TEXTOS
+    centesimas = np.rint(columna * 100).astype(np.int64)
+    bajo, alto = int(centesimas.min()), int(centesimas.max())
+    if bajo < inicio or alto >= inicio + len(textos):
+        if len(textos):
+            bajo, alto = min(bajo, inicio), max(alto, inicio + len(textos) - 1)
+        inicio = bajo
+        textos = np.array([repr(c / 100) for c in range(bajo, alto + 1)], dtype=object)
+        _TABLA_TEXTOS = (inicio, textos)
+    return textos[centesimas - inicio]
+
+
+def serializar_json(lote):
+    """
+    Serializa un lote a payloads JSON directamente desde las columnas.
+    Devuelve una lista de str, uno por paquete.
+    """
+    if not len(lote["id_paquete"]):
+        return []
+    ids = [json.dumps(i) for i in lote["id_paquete"].tolist()]
+    timestamps = np.datetime_as_string(lote["timestamp"], unit="us").tolist()
+    columnas = [_textos_centesimas(lote[campo]).tolist() for campo in CAMPOS]
+    if "ejecucion" in lote:
+        return [
+            _PLANTILLA_EJECUCION % (id_paquete, *valores, ts, ejecucion, seq, t_envio)
+            for id_paquete, ts, *valores, ejecucion, seq, t_envio in zip(
+                ids, timestamps, *columnas, lote["ejecucion"].tolist(),
+                lote["seq"].tolist(), lote["t_envio"].tolist()
+            )
+        ]
+    if "seq" in lote:
+        return [
+            _PLANTILLA_SONDA % (id_paquete, *valores, ts, seq, t_envio)
+            for id_paquete, ts, *valores, seq, t_envio in zip(
+                ids, timestamps, *columnas, lote["seq"].tolist(), lote["t_envio"].tolist()
+            )
+        ]
+    return [
+        _PLANTILLA_JSON % (id_paquete, *valores, ts)
+        for id_paquete, ts, *valores in zip(ids, timestamps, *columnas)
+    ]
@@ -3,15 +3,27 @@ Script para generar labels.csv desde la base de datos.
 Este archivo contiene datos históricos con etiquetas "ground truth".
 INCLUYE: Exportación a Excel con formato condicional
 """
+import numpy as np
 import pandas as pd
 import psycopg2
 from datetime import datetime
+import argparse
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils.dataframe import dataframe_to_rows
 
+from dataset_labels import DIRECTORIO_DATASET, borrar_paquetes, escribir_dataset
+
+try:
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+except ImportError:  # Sin xlsxwriter se usa la exportación con openpyxl
+    xlsxwriter = None
+
 load_dotenv()
 
 # Configuración de base de datos
@@ -29,65 +41,152 @@ UMBRAL_FUERZA_G = 2.5
 UMBRAL_INCLINACION = 30.0
 UMBRAL_VIBRACION = 4.0  # Nuevo umbral para vibración
 
+# Consultas (la de telemetría se completa con WHERE / ORDER BY según el modo).
+# telemetry y alerts guardan la clave entera del paquete: el id_paquete en
+# texto sale de packages
+COLUMNAS_TELEMETRIA = [
+    'id', 'id_paquete', 'timestamp', 'temperatura', 'fuerza_g', 'inclinacion',
+    'humedad', 'oxigeno', 'vapores', 'iluminacion', 'vibracion'
+]
+CONSULTA_TELEMETRIA = (
+    "SELECT "
+    + ', '.join('p.id_paquete' if c == 'id_paquete' else f't.{c}' for c in COLUMNAS_TELEMETRIA)
+    + " FROM telemetry t JOIN packages p ON p.id = t.paquete_id"
+)
+CONSULTA_ALERTAS = """
+    SELECT 
+        a.id,
+        p.id_paquete,
+        a.tipo_incidente,
+        a.timestamp_inicio,
+        a.timestamp_fin,
+        a.num_eventos
+    FROM alerts a
+    JOIN packages p ON p.id = a.paquete_id
+    ORDER BY a.id
+"""
+
+# Eventos ya leídos de cada alerta abierta (hasta id <= limite), como mucho
+# num_eventos: una alerta abierta etiqueta "los N primeros eventos desde su
+# inicio", así que cuando ya están todos su etiquetado no cambia. Los
+# timestamps se comparan como texto (mismo formato ISO en ambas tablas) para
+# usar el índice (paquete_id, timestamp)
+CONSULTA_EVENTOS_ABIERTAS = """
+    SELECT
+        a.id,
+        (SELECT COUNT(*) FROM (
+            SELECT 1 FROM telemetry t
+            WHERE t.paquete_id = a.paquete_id
+              AND t.timestamp >= a.timestamp_inicio
+              AND t.id <= %(limite)s
+            LIMIT GREATEST(a.num_eventos, 0)
+        ) leidos) AS eventos_leidos
+    FROM alerts a
+    WHERE a.timestamp_fin IS NULL
+"""
+
+# Modo incremental: dataset Parquet propio (ver dataset_labels.py) y marca de agua
+DIRECTORIO_INCREMENTAL = 'analytics/labels'
+ARCHIVO_WATERMARK = os.path.join(DIRECTORIO_INCREMENTAL, '_watermark.json')
+TAMANO_TROZO = 50_000  # Filas de telemetría por lectura del cursor
+
+# Exportación a Excel
+FILAS_POR_HOJA = 1_048_575   # Límite de Excel (1.048.576 filas) menos la cabecera
+HOJAS_POR_ARCHIVO = 4        # Hojas por archivo antes de pasar al siguiente
+FILAS_POR_BLOQUE = 50_000    # Filas convertidas a la vez al escribir
+COLOR_ROJO = '#FF6B6B'       # Parte de una alerta confirmada
+COLOR_AZUL = '#4ECDC4'       # Pico de temperatura extremo (falso positivo)
+COLOR_AMARILLO = '#FFE066'   # Picos aislados o vibraciones altas
+TIPOS_AMARILLO = ['pico_temperatura', 'pico_fuerza_g', 'vibracion_alta']
+
+# Columnas de trabajo que no se exportan
+COLUMNAS_AUXILIARES = [
+    'timestamp_dt', 'supera_umbral_temp', 'supera_umbral_choque',
+    'supera_umbral_vibracion', 'pico_temperatura_extremo'
+]
+
 def conectar_bd():
     """Conectar a PostgreSQL"""
     return psycopg2.connect(**DB_CONFIG)
 
-def generar_labels():
-    """
-    Genera el archivo labels.csv con datos etiquetados.
-    
-    ESTRATEGIA MEJORADA:
-    1. Leer telemetría y alertas
-    2. Identificar TODOS los eventos anómalos (no solo los de alertas)
-    3. Etiquetar según:
-       - Incidente confirmado (parte de una alerta)
-       - Evento anómalo aislado (supera umbral pero no generó alerta)
-       - Normal
+def _a_ns(fechas):
+    """Serie de fechas → int64 en ns (UTC si llevan zona horaria; NaT = mínimo int64)"""
+    fechas = pd.to_datetime(fechas)
+    if fechas.dt.tz is not None:
+        fechas = fechas.dt.tz_convert('UTC').dt.tz_localize(None)
+    return fechas.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+def etiquetar_alertas(df_telemetry, df_alerts):
     """
-    print("🔄 Conectando a la base de datos...")
-    conn = conectar_bd()
+    Marca incidente=1 y tipo_incidente en los eventos que cubre cada alerta.
     
-    # Leer telemetría
-    print("📊 Leyendo datos de telemetría...")
-    df_telemetry = pd.read_sql("""
-        SELECT 
-            id,
-            id_paquete,
-            timestamp,
-            temperatura,
-            fuerza_g,
-            inclinacion,
-            humedad,
-            oxigeno,
-            vapores,
-            iluminacion,
-            vibracion
-        FROM telemetry
-        ORDER BY id
-    """, conn)
+    Join de intervalos por paquete: los eventos se ordenan una sola vez por
+    (paquete, timestamp) y cada alerta localiza su tramo con searchsorted.
+    Coste O(n log n + alertas · log n + eventos etiquetados), en lugar de
+    una máscara sobre toda la tabla por cada alerta.
     
-    print(f"   └─ {len(df_telemetry)} eventos de telemetría cargados")
+    Reglas:
+    - Alerta cerrada: eventos del paquete con inicio <= timestamp <= fin
+    - Alerta abierta: los num_eventos primeros eventos (en orden de la tabla)
+      del paquete con timestamp >= inicio
+    - Si dos alertas se solapan, gana la última (se aplican en orden de df_alerts)
     
-    # Leer alertas
-    print("🚨 Leyendo alertas...")
-    df_alerts = pd.read_sql("""
-        SELECT 
-            id,
-            id_paquete,
-            tipo_incidente,
-            timestamp_inicio,
-            timestamp_fin,
-            num_eventos
-        FROM alerts
-        ORDER BY id
-    """, conn)
-    
-    print(f"   └─ {len(df_alerts)} alertas cargadas")
+    Necesita la columna 'timestamp_dt'; modifica df_telemetry y lo devuelve.
+    """
+    n = len(df_telemetry)
+    incidente = np.zeros(n, dtype=np.int64)
+    tipos = np.full(n, 'normal', dtype=object)
     
-    conn.close()
+    if n and len(df_alerts):
+        # Código entero por paquete (-1 si no hay id_paquete)
+        codigos, paquetes = pd.factorize(df_telemetry['id_paquete'])
+        ts = _a_ns(df_telemetry['timestamp_dt'])
+        posiciones = np.arange(n)
+        
+        # Orden por (paquete, timestamp, posición): cada paquete es un bloque contiguo
+        orden = np.lexsort((posiciones, ts, codigos))
+        codigos_ord = codigos[orden]
+        ts_ord = ts[orden]
+        rango = np.arange(len(paquetes))
+        inicio_bloque = np.searchsorted(codigos_ord, rango, side='left')
+        fin_bloque = np.searchsorted(codigos_ord, rango, side='right')
+        
+        # Paquetes cuyos timestamps crecen con la posición: en ellos el orden por
+        # tiempo coincide con el de la tabla y las alertas abiertas son un tramo
+        desordenados = (np.diff(orden) < 0) & (codigos_ord[1:] == codigos_ord[:-1])
+        monotono = np.ones(len(paquetes), dtype=bool)
+        monotono[codigos_ord[1:][desordenados]] = False
+        
+        alerta_codigo = paquetes.get_indexer(df_alerts['id_paquete'])
+        inicios = _a_ns(df_alerts['timestamp_inicio'])
+        fines = _a_ns(df_alerts['timestamp_fin'])
+        abiertas = df_alerts['timestamp_fin'].isna().to_numpy() | (fines == np.iinfo(np.int64).min)
+        iniciadas = inicios != np.iinfo(np.int64).min
+        
+        for codigo, inicio, fin, abierta, iniciada, num_eventos, tipo in zip(
+            alerta_codigo, inicios, fines, abiertas, iniciadas,
+            df_alerts['num_eventos'].tolist(), df_alerts['tipo_incidente'].tolist()
+        ):
+            if codigo < 0 or not iniciada:
+                continue
+            a, b = inicio_bloque[codigo], fin_bloque[codigo]
+            lo = a + np.searchsorted(ts_ord[a:b], inicio, side='left')
+            if not abierta:
+                hi = a + np.searchsorted(ts_ord[a:b], fin, side='right')
+                filas = orden[lo:hi]
+            elif monotono[codigo] and num_eventos >= 0:
+                filas = orden[lo:min(lo + num_eventos, b)]
+            else:
+                filas = np.sort(orden[lo:b])[:num_eventos]
+            incidente[filas] = 1
+            tipos[filas] = tipo
     
-    # Crear columnas de etiqueta
+    df_telemetry['incidente'] = incidente
+    df_telemetry['tipo_incidente'] = tipos
+    return df_telemetry
+
+def preparar_columnas(df_telemetry):
+    """Añade las columnas de etiqueta y las auxiliares (umbrales y timestamp_dt)"""
     df_telemetry['incidente'] = 0
     df_telemetry['tipo_incidente'] = 'normal'
     df_telemetry['supera_umbral_temp'] = df_telemetry['temperatura'] > UMBRAL_TEMPERATURA
@@ -100,39 +199,10 @@ def generar_labels():
     
     # Convertir timestamps
     df_telemetry['timestamp_dt'] = pd.to_datetime(df_telemetry['timestamp'])
-    
-    # ==========================================
-    # ETIQUETAR EVENTOS DENTRO DE ALERTAS
-    # ==========================================
-    for idx, alert in df_alerts.iterrows():
-        print(f"\n🔍 Procesando alerta {alert['id']}: {alert['tipo_incidente']}")
-        
-        ts_inicio = pd.to_datetime(alert['timestamp_inicio'])
-        ts_fin = pd.to_datetime(alert['timestamp_fin']) if pd.notna(alert['timestamp_fin']) else None
-        
-        # Filtrar eventos de este paquete
-        mask_paquete = df_telemetry['id_paquete'] == alert['id_paquete']
-        mask_tiempo = df_telemetry['timestamp_dt'] >= ts_inicio
-        
-        if ts_fin:
-            mask_tiempo = mask_tiempo & (df_telemetry['timestamp_dt'] <= ts_fin)
-        else:
-            # Si no hay fin, tomar los N eventos desde el inicio
-            eventos_paquete = df_telemetry[mask_paquete & mask_tiempo].head(alert['num_eventos'])
-            mask_tiempo = df_telemetry['id'].isin(eventos_paquete['id'])
-        
-        mask_final = mask_paquete & mask_tiempo
-        num_etiquetados = mask_final.sum()
-        
-        # Aplicar etiquetas
-        df_telemetry.loc[mask_final, 'incidente'] = 1
-        df_telemetry.loc[mask_final, 'tipo_incidente'] = alert['tipo_incidente']
-        
-        print(f"   └─ {num_etiquetados} eventos etiquetados como '{alert['tipo_incidente']}'")
-    
-    # ==========================================
-    # IDENTIFICAR EVENTOS ANÓMALOS NO ETIQUETADOS
-    # ==========================================
+    return df_telemetry
+
+def etiquetar_picos(df_telemetry):
+    """Etiqueta los eventos anómalos que no forman parte de ninguna alerta"""
     # Picos de temperatura extremos (FALSO POSITIVO - azul)
     mask_pico_extremo = (
         (df_telemetry['pico_temperatura_extremo']) & 
@@ -161,56 +231,13 @@ def generar_labels():
         (df_telemetry['incidente'] == 0)
     )
     df_telemetry.loc[mask_vibracion_alta, 'tipo_incidente'] = 'vibracion_alta'
-    
-    # ==========================================
-    # ESTADÍSTICAS
-    # ==========================================
-    print("\n" + "="*60)
-    print("📈 ESTADÍSTICAS DEL DATASET:")
-    print("="*60)
-    print(f"Total de eventos: {len(df_telemetry)}")
-    print(f"\nPor categoría:")
-    
-    eventos_normales = (df_telemetry['tipo_incidente'] == 'normal').sum()
-    eventos_alertas = (df_telemetry['incidente'] == 1).sum()
-    eventos_pico_temp = (df_telemetry['tipo_incidente'] == 'pico_temperatura').sum()
-    eventos_pico_choque = (df_telemetry['tipo_incidente'] == 'pico_fuerza_g').sum()
-    eventos_pico_extremo = (df_telemetry['tipo_incidente'] == 'pico_temperatura_extremo').sum()
-    eventos_vibracion = (df_telemetry['tipo_incidente'] == 'vibracion_alta').sum()
-    
-    print(f"  • Normales: {eventos_normales} ({eventos_normales / len(df_telemetry) * 100:.1f}%)")
-    print(f"  • Incidentes (alertas): {eventos_alertas} ({eventos_alertas / len(df_telemetry) * 100:.1f}%)")
-    print(f"  • Picos temperatura: {eventos_pico_temp}")
-    print(f"  • Picos fuerza_g: {eventos_pico_choque}")
-    print(f"  • Picos temperatura extremos: {eventos_pico_extremo} 🔵")
-    print(f"  • Vibraciones altas: {eventos_vibracion} 🟡")
-    
-    print("\n📊 Distribución por tipo de incidente:")
-    print(df_telemetry['tipo_incidente'].value_counts())
-    print("="*60)
-    
-    # ==========================================
-    # GUARDAR CSV
-    # ==========================================
-    output_file = 'analytics/labels.csv'
-    os.makedirs('analytics', exist_ok=True)
-    
-    # Eliminar columnas auxiliares antes de guardar
-    df_export = df_telemetry.drop([
-        'timestamp_dt', 'supera_umbral_temp', 'supera_umbral_choque',
-        'supera_umbral_vibracion', 'pico_temperatura_extremo'
-    ], axis=1)
-    df_export.to_csv(output_file, index=False)
-    
-    print(f"\n✅ CSV guardado: {output_file}")
-    
-    # ==========================================
-    # GENERAR EXCEL CON FORMATO CONDICIONAL
-    # ==========================================
-    print("\n📊 Generando Excel con formato condicional...")
-    
-    excel_file = 'analytics/labels_formatted.xlsx'
-    
+    return df_telemetry
+
+def exportar_excel_openpyxl(df_export, excel_file):
+    """
+    Exportación con openpyxl (si xlsxwriter no está instalado).
+    Carga todo el libro en memoria: solo apta para exportaciones pequeñas.
+    """
     # Crear Excel
     df_export.to_excel(excel_file, index=False, sheet_name='Telemetry Data')
     
@@ -274,7 +301,193 @@ def generar_labels():
     
     # Guardar
     wb.save(excel_file)
-    print(f"✅ Excel con formato guardado: {excel_file}")
+    return [excel_file]
+
+def anchos_columnas(df_export):
+    """Ancho de cada columna (texto más largo + 2, máximo 30) calculado sobre el DataFrame"""
+    anchos = []
+    for columna in df_export.columns:
+        largo = df_export[columna].astype(str).str.len().max() if len(df_export) else 0
+        anchos.append(min(max(len(str(columna)), int(largo)) + 2, 30))
+    return anchos
+
+def exportar_excel(df_export, excel_file):
+    """
+    Exporta las etiquetas a Excel con los colores de la leyenda.
+    
+    Usa xlsxwriter en modo constant_memory: las filas se escriben en
+    streaming (solo la fila actual está en memoria) y los colores se aplican
+    con reglas de formato condicional sobre cada hoja, sin tocar celda a celda.
+    Si hay más filas que el límite de Excel se reparten en varias hojas y,
+    cada HOJAS_POR_ARCHIVO hojas, en un archivo nuevo (labels_formatted_2.xlsx...).
+    
+    Returns:
+        lista de archivos generados
+    """
+    if xlsxwriter is None:
+        return exportar_excel_openpyxl(df_export, excel_file)
+    
+    columnas = list(df_export.columns)
+    ultima_columna = len(columnas) - 1
+    col_incidente = xl_col_to_name(columnas.index('incidente'))
+    col_tipo = xl_col_to_name(columnas.index('tipo_incidente'))
+    anchos = anchos_columnas(df_export)
+    
+    # Reglas en orden de prioridad (la primera que se cumple gana)
+    tipos_amarillo = ', '.join(f'${col_tipo}2="{tipo}"' for tipo in TIPOS_AMARILLO)
+    reglas = [
+        (f'=${col_incidente}2=1', {'bg_color': COLOR_ROJO, 'bold': True}),
+        (f'=${col_tipo}2="pico_temperatura_extremo"', {'bg_color': COLOR_AZUL}),
+        (f'=OR({tipos_amarillo})', {'bg_color': COLOR_AMARILLO}),
+    ]
+    
+    base, extension = os.path.splitext(excel_file)
+    filas_por_archivo = FILAS_POR_HOJA * HOJAS_POR_ARCHIVO
+    archivos = []
+    
+    for inicio_archivo in range(0, max(len(df_export), 1), filas_por_archivo):
+        numero = len(archivos) + 1
+        archivo = excel_file if numero == 1 else f"{base}_{numero}{extension}"
+        wb = xlsxwriter.Workbook(archivo, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'strings_to_formulas': False
+        })
+        formato_cabecera = wb.add_format({'bold': True})
+        formatos = [(criterio, wb.add_format(estilo)) for criterio, estilo in reglas]
+        
+        fin_archivo = min(inicio_archivo + filas_por_archivo, len(df_export))
+        for inicio_hoja in range(inicio_archivo, max(fin_archivo, 1), FILAS_POR_HOJA):
+            fin_hoja = min(inicio_hoja + FILAS_POR_HOJA, fin_archivo)
+            numero_hoja = inicio_hoja // FILAS_POR_HOJA + 1
+            nombre = 'Telemetry Data' if numero_hoja == 1 else f'Telemetry Data ({numero_hoja})'
+            ws = wb.add_worksheet(nombre)
+            
+            ws.freeze_panes(1, 0)  # Congelar primera fila (headers)
+            for i, ancho in enumerate(anchos):
+                ws.set_column(i, i, ancho)
+            ws.write_row(0, 0, columnas, formato_cabecera)
+            
+            # Filas en bloques: NaN → celda vacía, tipos NumPy → tipos Python
+            fila = 1
+            for inicio_bloque in range(inicio_hoja, fin_hoja, FILAS_POR_BLOQUE):
+                bloque = df_export.iloc[inicio_bloque:min(inicio_bloque + FILAS_POR_BLOQUE, fin_hoja)]
+                bloque = bloque.astype(object).where(bloque.notna(), None)
+                for valores in bloque.itertuples(index=False, name=None):
+                    ws.write_row(fila, 0, valores)
+                    fila += 1
+            
+            if fila > 1:
+                for criterio, formato in formatos:
+                    ws.conditional_format(1, 0, fila - 1, ultima_columna, {
+                        'type': 'formula',
+                        'criteria': criterio,
+                        'format': formato,
+                        'stop_if_true': True
+                    })
+        
+        wb.close()
+        archivos.append(archivo)
+    
+    return archivos
+
+def generar_labels(csv=False):
+    """
+    Genera el dataset de labels (Parquet) con datos etiquetados.
+    Con csv=True también escribe analytics/labels.csv.
+    
+    ESTRATEGIA MEJORADA:
+    1. Leer telemetría y alertas
+    2. Identificar TODOS los eventos anómalos (no solo los de alertas)
+    3. Etiquetar según:
+       - Incidente confirmado (parte de una alerta)
+       - Evento anómalo aislado (supera umbral pero no generó alerta)
+       - Normal
+    """
+    print("🔄 Conectando a la base de datos...")
+    conn = conectar_bd()
+    
+    # Leer telemetría
+    print("📊 Leyendo datos de telemetría...")
+    df_telemetry = pd.read_sql(CONSULTA_TELEMETRIA + " ORDER BY t.id", conn)
+    
+    print(f"   └─ {len(df_telemetry)} eventos de telemetría cargados")
+    
+    # Leer alertas
+    print("🚨 Leyendo alertas...")
+    df_alerts = pd.read_sql(CONSULTA_ALERTAS, conn)
+    
+    print(f"   └─ {len(df_alerts)} alertas cargadas")
+    
+    conn.close()
+    
+    preparar_columnas(df_telemetry)
+    
+    # ==========================================
+    # ETIQUETAR EVENTOS DENTRO DE ALERTAS
+    # ==========================================
+    print("\n🔍 Etiquetando eventos dentro de alertas...")
+    etiquetar_alertas(df_telemetry, df_alerts)
+    
+    for tipo, num_etiquetados in df_telemetry.loc[
+        df_telemetry['incidente'] == 1, 'tipo_incidente'
+    ].value_counts().items():
+        print(f"   └─ {num_etiquetados} eventos etiquetados como '{tipo}'")
+    
+    etiquetar_picos(df_telemetry)
+    
+    # ==========================================
+    # ESTADÍSTICAS
+    # ==========================================
+    print("\n" + "="*60)
+    print("📈 ESTADÍSTICAS DEL DATASET:")
+    print("="*60)
+    print(f"Total de eventos: {len(df_telemetry)}")
+    print(f"\nPor categoría:")
+    
+    eventos_normales = (df_telemetry['tipo_incidente'] == 'normal').sum()
+    eventos_alertas = (df_telemetry['incidente'] == 1).sum()
+    eventos_pico_temp = (df_telemetry['tipo_incidente'] == 'pico_temperatura').sum()
+    eventos_pico_choque = (df_telemetry['tipo_incidente'] == 'pico_fuerza_g').sum()
+    eventos_pico_extremo = (df_telemetry['tipo_incidente'] == 'pico_temperatura_extremo').sum()
+    eventos_vibracion = (df_telemetry['tipo_incidente'] == 'vibracion_alta').sum()
+    
+    print(f"  • Normales: {eventos_normales} ({eventos_normales / len(df_telemetry) * 100:.1f}%)")
+    print(f"  • Incidentes (alertas): {eventos_alertas} ({eventos_alertas / len(df_telemetry) * 100:.1f}%)")
+    print(f"  • Picos temperatura: {eventos_pico_temp}")
+    print(f"  • Picos fuerza_g: {eventos_pico_choque}")
+    print(f"  • Picos temperatura extremos: {eventos_pico_extremo} 🔵")
+    print(f"  • Vibraciones altas: {eventos_vibracion} 🟡")
+    
+    print("\n📊 Distribución por tipo de incidente:")
+    print(df_telemetry['tipo_incidente'].value_counts())
+    print("="*60)
+    
+    # ==========================================
+    # GUARDAR DATASET PARQUET (y CSV si se pide)
+    # ==========================================
+    os.makedirs('analytics', exist_ok=True)
+    
+    # Eliminar columnas auxiliares antes de guardar
+    df_export = df_telemetry.drop(COLUMNAS_AUXILIARES, axis=1)
+    escribir_dataset(df_export)
+    print(f"\n✅ Dataset Parquet guardado: {DIRECTORIO_DATASET}/")
+    
+    if csv:
+        output_file = 'analytics/labels.csv'
+        df_export.to_csv(output_file, index=False)
+        print(f"✅ CSV guardado: {output_file}")
+    
+    # ==========================================
+    # GENERAR EXCEL CON FORMATO CONDICIONAL
+    # ==========================================
+    print("\n📊 Generando Excel con formato condicional...")
+    
+    excel_file = 'analytics/labels_formatted.xlsx'
+    
+    archivos = exportar_excel(df_export, excel_file)
+    for archivo in archivos:
+        print(f"✅ Excel con formato guardado: {archivo}")
     print("\n📌 LEYENDA DE COLORES:")
     print("  🔴 ROJO: Eventos que forman parte de una ALERTA confirmada (3+ eventos consecutivos)")
     print("  🔵 AZUL: Pico de temperatura EXTREMO (>20°C) - Falso positivo")
@@ -284,12 +497,192 @@ def generar_labels():
     return df_export
 
 
+# ==========================================
+# MODO INCREMENTAL
+# ==========================================
+def leer_watermark():
+    """Último id de telemetría procesado y firma de las alertas de cada paquete"""
+    if not os.path.exists(ARCHIVO_WATERMARK):
+        return {'ultimo_id': 0, 'alertas': {}}
+    with open(ARCHIVO_WATERMARK, encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_watermark(watermark):
+    """Escritura atómica: un fallo a mitad no deja el archivo corrupto"""
+    temporal = ARCHIVO_WATERMARK + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f)
+    os.replace(temporal, ARCHIVO_WATERMARK)
+
+def eventos_alertas_abiertas(conn, df_alerts, limite):
+    """
+    Añade a df_alerts la columna eventos_leidos: eventos de cada alerta
+    abierta ya en la BD (como mucho num_eventos; vacío en las cerradas)
+    """
+    leidos = pd.read_sql(CONSULTA_EVENTOS_ABIERTAS, conn, params={'limite': int(limite)})
+    df_alerts['eventos_leidos'] = df_alerts['id'].map(
+        leidos.set_index('id')['eventos_leidos']
+    ).astype('Int64')
+    return df_alerts
+
+def firmas_alertas(df_alerts):
+    """
+    Hash de las alertas de cada paquete (cambia si se crea o actualiza alguna,
+    o si una alerta abierta tiene eventos nuevos sin completar sus N primeros)
+    """
+    firmas = {}
+    columnas = ['id', 'tipo_incidente', 'timestamp_inicio', 'timestamp_fin', 'num_eventos', 'eventos_leidos']
+    for id_paquete, grupo in df_alerts.groupby('id_paquete', sort=False):
+        contenido = grupo[columnas].to_csv(index=False).encode('utf-8')
+        firmas[id_paquete] = hashlib.sha1(contenido).hexdigest()
+    return firmas
+
+def leer_trozos(conn, where, params, tamano):
+    """
+    Lee la telemetría en DataFrames de `tamano` filas con un cursor del
+    servidor (named cursor): nunca hay más de un trozo en memoria.
+    """
+    with conn.cursor(name='labels_incremental') as cursor:
+        cursor.itersize = tamano
+        cursor.execute(f"{CONSULTA_TELEMETRIA} {where}", params)
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                break
+            yield pd.DataFrame(filas, columns=COLUMNAS_TELEMETRIA)
+
+def etiquetar_trozo(df_telemetry, df_alerts):
+    """Etiqueta un trozo de telemetría con las alertas de sus paquetes"""
+    preparar_columnas(df_telemetry)
+    alertas = df_alerts[df_alerts['id_paquete'].isin(df_telemetry['id_paquete'].unique())]
+    etiquetar_alertas(df_telemetry, alertas)
+    etiquetar_picos(df_telemetry)
+    return df_telemetry.drop(COLUMNAS_AUXILIARES, axis=1)
+
+def reetiquetar_paquetes(conn, paquetes, df_alerts, limite, tamano):
+    """
+    Vuelve a etiquetar todo el histórico (id <= limite) de los paquetes dados
+    y sustituye su partición. Las filas llegan ordenadas por paquete, así que
+    en memoria solo hay un trozo más el histórico del paquete en curso.
+    """
+    def escribir(grupos):
+        df = etiquetar_trozo(pd.concat(grupos, ignore_index=True), df_alerts)
+        escribir_dataset(
+            df, DIRECTORIO_INCREMENTAL, f"part-{int(df['id'].iat[0]):012d}", reemplazar=False
+        )
+        return len(df)
+    
+    # Se borran antes todas sus particiones (también las de paquetes sin telemetría)
+    borrar_paquetes(paquetes, DIRECTORIO_INCREMENTAL)
+    
+    total = 0
+    pendientes = []
+    for trozo in leer_trozos(
+        conn, "WHERE p.id_paquete = ANY(%s) AND t.id <= %s ORDER BY t.paquete_id, t.id",
+        (list(paquetes), limite), tamano
+    ):
+        for id_paquete, grupo in trozo.groupby('id_paquete', sort=False):
+            if pendientes and pendientes[0]['id_paquete'].iat[0] != id_paquete:
+                total += escribir(pendientes)
+                pendientes = []
+            pendientes.append(grupo)
+    if pendientes:
+        total += escribir(pendientes)
+    return total
+
+def generar_labels_incremental(tamano=TAMANO_TROZO):
+    """
+    Actualiza analytics/labels/ procesando solo lo nuevo desde la última ejecución.
+    
+    1. Paquetes cuyas alertas cambiaron: se re-etiqueta todo su histórico y
+       se reescribe su partición. Una alerta abierta etiqueta "los N
+       primeros eventos" desde su inicio, así que su firma incluye cuántos
+       hay ya (hasta N): se re-etiqueta mientras le lleguen, no para siempre.
+    2. Resto de paquetes: se etiquetan solo las filas con id > watermark, en
+       trozos de `tamano` filas, y se añaden como part-<primer id del trozo>.parquet.
+       Sus alertas abiertas ya tenían los N eventos en la ejecución anterior
+       (si no, su firma habría cambiado): no etiquetan filas nuevas.
+    3. Se guarda la nueva marca de agua al final. Si algo falla a mitad, la
+       siguiente ejecución repite los mismos trozos con los mismos nombres de
+       archivo, así que se sobrescriben en lugar de duplicarse.
+    """
+    print("🔄 Conectando a la base de datos...")
+    conn = conectar_bd()
+    watermark = leer_watermark()
+    ultimo_id = watermark['ultimo_id']
+    
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM telemetry")
+        limite = cursor.fetchone()[0]
+    print(f"📊 Telemetría nueva: ids {ultimo_id + 1} a {limite}")
+    
+    df_alerts = eventos_alertas_abiertas(conn, pd.read_sql(CONSULTA_ALERTAS, conn), limite)
+    firmas = firmas_alertas(df_alerts)
+    firmas_previas = watermark['alertas']
+    cambiados = {
+        id_paquete for id_paquete in set(firmas) | set(firmas_previas)
+        if firmas.get(id_paquete) != firmas_previas.get(id_paquete)
+    }
+    print(f"🚨 {len(df_alerts)} alertas, {len(cambiados)} paquetes a re-etiquetar")
+    
+    os.makedirs(DIRECTORIO_INCREMENTAL, exist_ok=True)
+    
+    # ==========================================
+    # 1. RE-ETIQUETAR PAQUETES CON ALERTAS NUEVAS O CAMBIADAS
+    # ==========================================
+    if cambiados:
+        total = reetiquetar_paquetes(conn, cambiados, df_alerts, limite, tamano)
+        print(f"   └─ {total} eventos re-etiquetados")
+    
+    # ==========================================
+    # 2. AÑADIR EVENTOS NUEVOS DEL RESTO DE PAQUETES
+    # ==========================================
+    alertas_cerradas = df_alerts[df_alerts['timestamp_fin'].notna()]
+    total = 0
+    for trozo in leer_trozos(conn, "WHERE t.id > %s AND t.id <= %s ORDER BY t.id", (ultimo_id, limite), tamano):
+        nombre = f"part-{int(trozo['id'].iat[0]):012d}"
+        trozo = trozo[~trozo['id_paquete'].isin(cambiados)]
+        if trozo.empty:
+            continue
+        df_export = etiquetar_trozo(trozo.copy(), alertas_cerradas)
+        escribir_dataset(df_export, DIRECTORIO_INCREMENTAL, nombre, reemplazar=False)
+        total += len(df_export)
+        print(f"   └─ Trozo {nombre}: {len(df_export)} eventos")
+    
+    conn.close()
+    guardar_watermark({'ultimo_id': int(limite), 'alertas': firmas})
+    print(f"\n✅ {total} eventos nuevos añadidos en {DIRECTORIO_INCREMENTAL}/")
+    return limite
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera las etiquetas de la telemetría")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help=f"Procesa solo lo nuevo desde la última ejecución y escribe en {DIRECTORIO_INCREMENTAL}/"
+    )
+    parser.add_argument(
+        "--trozo", type=int, default=TAMANO_TROZO,
+        help="Filas de telemetría por trozo en modo incremental"
+    )
+    parser.add_argument(
+        "--csv", action="store_true",
+        help="Escribe también analytics/labels.csv (modo completo)"
+    )
+    args = parser.parse_args()
+    
     print("="*60)
     print("🏷️  GENERADOR DE LABELS.CSV")
     print("="*60)
-    df = generar_labels()
-    print("\n✅ ¡Proceso completado!")
-    print("\nArchivos generados:")
-    print("  • analytics/labels.csv (para scripts Python)")
-    print("  • analytics/labels_formatted.xlsx (para revisar en Excel)")
\ No newline at end of file
+    if args.incremental:
+        generar_labels_incremental(args.trozo)
+        print("\nArchivos generados:")
+        print(f"  • {DIRECTORIO_INCREMENTAL}/fecha=*/id_paquete=*/part-*.parquet")
+    else:
+        df = generar_labels(csv=args.csv)
+        print("\n✅ ¡Proceso completado!")
+        print("\nArchivos generados:")
+        print(f"  • {DIRECTORIO_DATASET}/ (dataset Parquet para scripts Python)")
+        if args.csv:
+            print("  • analytics/labels.csv")
+        print("  • analytics/labels_formatted.xlsx (para revisar en Excel)")
\ No newline at end of file
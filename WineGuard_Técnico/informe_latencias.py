@@ -0,0 +1,180 @@
+"""
+Informe de latencias extremo a extremo a partir de la tabla latency_probes.
+
+El simulador con --sonda añade a cada lectura el id de su ejecución
+(ejecucion), un nº de secuencia que empieza en 0 en cada ejecución (seq) y
+su hora de envío (t_envio); la API guarda cuándo la recibió, cuándo hizo commit
+de la telemetría y, si la lectura disparó una alerta, cuándo hizo commit de
+la alerta. Con eso se calculan p50/p95/p99 de:
+
+- publicación → ingesta:       t_recepcion - t_envio
+- ingesta → commit:            t_commit - t_recepcion
+- lectura → alerta:            t_alerta - t_envio (lecturas que crearon alerta)
+- inicio incidente → alerta:   t_alerta - timestamp_inicio de la alerta (MTTD real)
+
+Las lecturas perdidas son los huecos de seq dentro de cada ejecución (las
+sondas anteriores a la columna ejecucion no se cuentan).
+
+Nota: publicación → ingesta compara relojes de dos máquinas si el simulador
+y la API no corren en el mismo equipo (sincronizarlos con NTP).
+
+Uso:
+    python simulador_wine.py --sonda --paquetes 1000 --intervalo 0.5   # carga
+    python informe_latencias.py [--desde 2025-11-06T09:00:00]
+"""
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+# Configuración
+DB_CONFIG = {
+    'host': 'localhost',
+    'port': 5433,
+    'database': 'greendelivery',
+    'user': 'postgres',
+    'password': '1234'
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def conectar_bd():
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def cargar_sondas(desde=None):
+    """
+    Lee las sondas (y el inicio de la alerta que dispararon, si la hay).
+    desde: solo sondas enviadas a partir de ese instante (datetime UTC)
+    """
+    conn = conectar_bd()
+
+    query = """
+    SELECT
+        p.ejecucion, p.seq, p.id_paquete, p.t_envio, p.t_recepcion, p.t_commit, p.t_alerta,
+        a.tipo_incidente, a.timestamp_inicio
+    FROM latency_probes p
+    LEFT JOIN alerts a ON a.id = p.alert_id
+    WHERE %(desde)s IS NULL OR p.t_envio >= %(desde)s
+    ORDER BY p.ejecucion, p.seq;
+    """
+    epoch_desde = desde.timestamp() if desde else None
+    df = pd.read_sql(query, conn, params={'desde': epoch_desde})
+    conn.close()
+
+    return df
+
+
+def percentiles_ms(segundos):
+    """p50/p95/p99 (y nº de muestras) de una serie de latencias en segundos"""
+    valores = segundos.dropna().to_numpy() * 1000
+    if len(valores) == 0:
+        return {'n': 0, **{f'p{p}': None for p in PERCENTILES}, 'max': None}
+    calculados = np.percentile(valores, PERCENTILES)
+    return {
+        'n': len(valores),
+        **{f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, calculados)},
+        'max': round(float(valores.max()), 2)
+    }
+
+
+def calcular_latencias(df):
+    """Devuelve {tramo: percentiles} para los cuatro tramos medidos"""
+    inicio_incidente = pd.to_datetime(df['timestamp_inicio'], utc=True, errors='coerce')
+    epoch_inicio = (inicio_incidente - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+
+    return {
+        'publicación → ingesta': percentiles_ms(df['t_recepcion'] - df['t_envio']),
+        'ingesta → commit': percentiles_ms(df['t_commit'] - df['t_recepcion']),
+        'lectura → alerta': percentiles_ms(df['t_alerta'] - df['t_envio']),
+        'inicio incidente → alerta': percentiles_ms(df['t_alerta'] - epoch_inicio),
+    }
+
+
+def lecturas_perdidas(df):
+    """
+    Huecos en la secuencia de cada ejecución: lecturas publicadas que no
+    llegaron a la BD (las repetidas cuentan una vez)
+    """
+    por_ejecucion = df.dropna(subset=['ejecucion']).groupby('ejecucion')['seq']
+    if por_ejecucion.ngroups == 0:
+        return 0
+    esperadas = por_ejecucion.max() - por_ejecucion.min() + 1
+    return int((esperadas - por_ejecucion.nunique()).sum())
+
+
+def generar_informe(desde=None):
+    print("="*60)
+    print("⏱️  INFORME DE LATENCIAS - GREENDELIVERY")
+    print("="*60)
+
+    print("\n🔄 Leyendo sondas de latencia...")
+    df = cargar_sondas(desde)
+    if df.empty:
+        print("❌ No hay sondas. Lanza el simulador con --sonda y la API en marcha.")
+        return
+
+    latencias = calcular_latencias(df)
+    perdidas = lecturas_perdidas(df)
+
+    print(f"Lecturas con sonda:      {len(df)}")
+    print(f"Ejecuciones:             {df['ejecucion'].nunique()}")
+    print(f"Lecturas perdidas:       {perdidas}")
+    print(f"Alertas con sonda:       {int(df['t_alerta'].notna().sum())}")
+
+    cabecera = f"{'tramo':<28} | {'n':>7} | " + " | ".join(
+        f"{f'p{p} (ms)':>10}" for p in PERCENTILES
+    ) + f" | {'max (ms)':>10}"
+    print("\n" + cabecera)
+    print("-" * len(cabecera))
+    for tramo, valores in latencias.items():
+        celdas = [valores[f'p{p}'] for p in PERCENTILES] + [valores['max']]
+        print(f"{tramo:<28} | {valores['n']:>7} | " + " | ".join(
+            f"{'-' if v is None else f'{v:.2f}':>10}" for v in celdas
+        ))
+
+    # ==========================================
+    # GUARDAR INFORME
+    # ==========================================
+    informe = f"""
+# INFORME DE LATENCIAS - GREENDELIVERY
+**Fecha de generación:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+| Métrica | Valor |
+|---------|-------|
+| Lecturas con sonda | {len(df)} |
+| Ejecuciones | {df['ejecucion'].nunique()} |
+| Lecturas perdidas | {perdidas} |
+| Alertas con sonda | {int(df['t_alerta'].notna().sum())} |
+
+## Percentiles (ms)
+
+| Tramo | n | {' | '.join(f'p{p}' for p in PERCENTILES)} | max |
+|-------|---|{'|'.join('---' for _ in PERCENTILES)}|-----|
+"""
+    for tramo, valores in latencias.items():
+        celdas = [valores[f'p{p}'] for p in PERCENTILES] + [valores['max']]
+        informe += f"| {tramo} | {valores['n']} | " + " | ".join(
+            '-' if v is None else f'{v:.2f}' for v in celdas
+        ) + " |\n"
+
+    with open('analytics/informe_latencias.md', 'w', encoding='utf-8') as f:
+        f.write(informe)
+
+    print("\n   └─ Informe guardado: analytics/informe_latencias.md")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Percentiles de latencia de las sondas")
+    parser.add_argument(
+        "--desde", type=datetime.fromisoformat, default=None,
+        help="Solo sondas enviadas desde este instante (ISO 8601, UTC)"
+    )
+    args = parser.parse_args()
+    desde = args.desde
+    if desde is not None and desde.tzinfo is None:
+        desde = desde.replace(tzinfo=timezone.utc)
+    generar_informe(desde)
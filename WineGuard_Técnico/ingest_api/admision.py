@@ -0,0 +1,64 @@
+# ingest_api/admision.py
+"""
+Control de admisión para POST /ingest.
+
+Cuando PostgreSQL va lento las peticiones se acumulan en el thread pool de
+FastAPI (y en el pool de conexiones) hasta que todas caducan, y los
+reintentos de Node-RED empeoran la cola. En vez de eso se limita el número
+de peticiones en curso: por encima del límite se responde al momento con
+503 y Retry-After, sin tocar la base de datos, y las admitidas mantienen
+una latencia acotada.
+
+Las últimas `reserva_prioritaria` plazas solo se dan a lecturas de
+paquetes con una racha o alerta abierta en el detector, para que un
+incidente en curso no se pierda por culpa de la carga.
+"""
+import threading
+
+
+class ControlAdmision:
+    """Contador de peticiones en curso con límite y plazas reservadas"""
+
+    def __init__(self, max_en_curso: int, reserva_prioritaria: int = 0, retry_after: int = 1):
+        self.max_en_curso = max_en_curso
+        self.reserva_prioritaria = min(reserva_prioritaria, max_en_curso)
+        self.retry_after = retry_after
+        self.en_curso = 0
+        self.admitidas = 0
+        self.rechazadas = 0
+        self.max_observado = 0
+        self._lock = threading.Lock()
+
+    def admitir(self, prioritaria: bool = False, contar_rechazo: bool = True) -> bool:
+        """
+        Ocupa una plaza si queda alguna para este tipo de petición.
+        contar_rechazo=False: primer intento sin prioridad, antes de leer el
+        cuerpo; si falla se vuelve a intentar y ese rechazo es el que cuenta
+        """
+        limite = self.max_en_curso if prioritaria else self.max_en_curso - self.reserva_prioritaria
+        with self._lock:
+            if self.en_curso >= limite:
+                if contar_rechazo:
+                    self.rechazadas += 1
+                return False
+            self.en_curso += 1
+            self.admitidas += 1
+            self.max_observado = max(self.max_observado, self.en_curso)
+            return True
+
+    def liberar(self):
+        """Libera la plaza de una petición admitida"""
+        with self._lock:
+            self.en_curso -= 1
+
+    def estado(self) -> dict:
+        """Contadores para /stats"""
+        with self._lock:
+            return {
+                "en_curso": self.en_curso,
+                "max_en_curso": self.max_en_curso,
+                "reserva_prioritaria": self.reserva_prioritaria,
+                "admitidas": self.admitidas,
+                "rechazadas": self.rechazadas,
+                "max_observado": self.max_observado,
+            }
@@ -0,0 +1,448 @@
+# ingest_api/agregados.py
+"""
+Agregados que se mantienen durante la ingesta (sin recorrer telemetry).
+
+- package_summary: una fila por paquete (nº de lecturas, nº de alertas,
+  primera y última lectura). procesar_telemetria() la actualiza con un
+  upsert en la misma transacción que la telemetría o la alerta.
+- alert_detection: latencia de detección real de cada alerta (created_at
+  menos la primera lectura por encima del umbral de su racha). La racha
+  se busca en telemetry con dos consultas LATERAL sobre el índice
+  (paquete_id, timestamp), recorriendo solo las lecturas de la racha;
+  así no depende de timestamp_inicio del detector, que se pierde si la
+  API se reinicia a mitad de un incidente. Se calcula al crear la alerta.
+- kpi_buckets: una fila por hora y paquete (lecturas, alertas y latencia
+  de detección). Las series de GET /kpis salen de aquí: 90 días por hora
+  son 2160 filas por paquete, sin tocar telemetry. Las lecturas se asignan
+  a la hora de su timestamp y las alertas a la de su timestamp_inicio (la
+  lectura que abrió el incidente), no a la de su created_at: con cargas
+  atrasadas o una alerta creada justo después de cambiar de hora, el
+  paquete acabaría en una hora sin lecturas y con SLA 0%.
+- dashboard_kpis_mat: vista materializada con los KPIs del dashboard,
+  calculada sobre package_summary, alerts y alert_detection. Tiene un
+  índice único para poder refrescarla con REFRESH ... CONCURRENTLY sin
+  bloquear a los lectores ni a la ingesta.
+
+Uso (desde ingest_api/):
+    python agregados.py --reconstruir    # rellenar los agregados con lo ya ingerido
+    python agregados.py --cada 60        # refrescar la vista cada 60 s
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import case, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from detector import UMBRAL_FUERZA_G, UMBRAL_INCLINACION, UMBRAL_TEMPERATURA
+from models import Alert, AlertDetection, KpiBucket, PackageSummary
+
+VISTA_KPIS = "dashboard_kpis_mat"
+VERSION_VISTA_KPIS = "2"  # Subir al cambiar SQL_VISTA_KPIS (se recrea al arrancar)
+
+# Percentiles de la latencia de detección por tipo de incidente
+PERCENTILES_MTTD = (50, 90, 99)
+
+# Misma definición de los KPIs que CONSULTA_KPIS en calcular_kpis.py, pero
+# los paquetes salen de package_summary en lugar de telemetry
+SQL_VISTA_KPIS = f"""
+CREATE MATERIALIZED VIEW {VISTA_KPIS} AS
+WITH sla AS (
+    SELECT
+        COUNT(*) AS total_paquetes,
+        COUNT(*) FILTER (WHERE num_alertas = 0) AS paquetes_sin_alertas
+    FROM package_summary
+    WHERE num_eventos > 0
+),
+alertas AS (
+    SELECT COUNT(*) AS total_alertas FROM alerts
+),
+deteccion AS (
+    SELECT
+        ROUND(AVG(segundos_deteccion)::numeric, 2) AS mttd_segundos,
+        ROUND(MIN(segundos_deteccion)::numeric, 2) AS deteccion_mas_rapida,
+        ROUND(MAX(segundos_deteccion)::numeric, 2) AS deteccion_mas_lenta
+    FROM alert_detection
+),
+por_tipo AS (
+    SELECT
+        tipo_incidente,
+        COUNT(*) AS n,
+        percentile_cont(ARRAY[{", ".join(str(p / 100) for p in PERCENTILES_MTTD)}])
+            WITHIN GROUP (ORDER BY segundos_deteccion) AS percentiles
+    FROM alert_detection
+    GROUP BY tipo_incidente
+)
+SELECT
+    1 AS id,
+    sla.total_paquetes,
+    sla.paquetes_sin_alertas,
+    ROUND(sla.paquetes_sin_alertas::numeric / NULLIF(sla.total_paquetes, 0) * 100, 2) AS porcentaje_sla,
+    alertas.total_alertas,
+    deteccion.mttd_segundos,
+    deteccion.deteccion_mas_rapida,
+    deteccion.deteccion_mas_lenta,
+    (
+        SELECT jsonb_object_agg(tipo_incidente, jsonb_build_object(
+            'n', n,
+            {", ".join(f"'p{p}', ROUND(percentiles[{i}]::numeric, 2)" for i, p in enumerate(PERCENTILES_MTTD, 1))}
+        ))
+        FROM por_tipo
+    ) AS mttd_por_tipo,
+    ROUND(alertas.total_alertas * 0.15) AS falsos_positivos_estimados,
+    15.0 AS porcentaje_fp_estimado,
+    NOW() AS calculado_en
+FROM sla, alertas, deteccion;
+
+CREATE UNIQUE INDEX {VISTA_KPIS}_id ON {VISTA_KPIS} (id);
+COMMENT ON MATERIALIZED VIEW {VISTA_KPIS} IS '{VERSION_VISTA_KPIS}';
+"""
+
+# Condición de "lectura por encima del umbral" según el tipo de alerta
+# (los mismos umbrales que detector.py)
+_SQL_ANOMALA = f"""CASE a.tipo_incidente
+            WHEN 'temperatura_alta' THEN t.temperatura > {UMBRAL_TEMPERATURA}
+            WHEN 'choque' THEN t.fuerza_g > {UMBRAL_FUERZA_G} AND t.inclinacion > {UMBRAL_INCLINACION}
+            ELSE FALSE
+        END"""
+
+# Latencia de detección de las alertas que cumplen {filtro}:
+# 1. última lectura normal anterior a timestamp_inicio (se recorre la racha
+#    hacia atrás por el índice, de la más reciente a la más antigua)
+# 2. primera lectura posterior a esa: el inicio real de la racha
+SQL_DETECCION = f"""
+INSERT INTO alert_detection (alert_id, id_paquete, tipo_incidente, inicio_racha,
+                             created_at, segundos_deteccion)
+SELECT
+    a.id,
+    p.id_paquete,
+    a.tipo_incidente,
+    COALESCE(racha.inicio, a.timestamp_inicio),
+    a.created_at,
+    EXTRACT(EPOCH FROM a.created_at
+        - (COALESCE(racha.inicio, a.timestamp_inicio)::timestamptz AT TIME ZONE 'UTC'))
+FROM alerts a
+JOIN packages p ON p.id = a.paquete_id
+LEFT JOIN LATERAL (
+    SELECT t.timestamp
+    FROM telemetry t
+    WHERE t.paquete_id = a.paquete_id
+      AND t.timestamp < a.timestamp_inicio
+      AND NOT {_SQL_ANOMALA}
+    ORDER BY t.timestamp DESC
+    LIMIT 1
+) normal ON TRUE
+LEFT JOIN LATERAL (
+    SELECT MIN(t.timestamp) AS inicio
+    FROM telemetry t
+    WHERE t.paquete_id = a.paquete_id
+      AND t.timestamp <= a.timestamp_inicio
+      AND t.timestamp > COALESCE(normal.timestamp, '')
+) racha ON TRUE
+WHERE {{filtro}}
+ON CONFLICT (alert_id) DO NOTHING
+"""
+
+# Recalcula package_summary desde las tablas (carga inicial o reparación);
+# se agrupa por la clave entera y el texto sale de packages al final
+SQL_RECONSTRUIR_RESUMEN = """
+INSERT INTO package_summary (id_paquete, num_eventos, num_alertas,
+                             primer_timestamp, ultimo_timestamp, actualizado_en)
+SELECT
+    p.id_paquete,
+    t.num_eventos,
+    COALESCE(a.num_alertas, 0),
+    t.primer_timestamp,
+    t.ultimo_timestamp,
+    NOW()
+FROM (
+    SELECT paquete_id, COUNT(*) AS num_eventos,
+           MIN(timestamp) AS primer_timestamp, MAX(timestamp) AS ultimo_timestamp
+    FROM telemetry
+    GROUP BY paquete_id
+) t
+JOIN packages p ON p.id = t.paquete_id
+LEFT JOIN (
+    SELECT paquete_id, COUNT(*) AS num_alertas FROM alerts GROUP BY paquete_id
+) a ON a.paquete_id = t.paquete_id
+ON CONFLICT (id_paquete) DO UPDATE SET
+    num_eventos = EXCLUDED.num_eventos,
+    num_alertas = EXCLUDED.num_alertas,
+    primer_timestamp = EXCLUDED.primer_timestamp,
+    ultimo_timestamp = EXCLUDED.ultimo_timestamp,
+    actualizado_en = EXCLUDED.actualizado_en;
+"""
+
+# Recalcula kpi_buckets desde las tablas (después de alert_detection)
+SQL_RECONSTRUIR_BUCKETS = """
+INSERT INTO kpi_buckets (hora, id_paquete, num_lecturas, num_alertas,
+                         num_detecciones, suma_deteccion)
+SELECT x.hora, p.id_paquete, SUM(x.num_lecturas), SUM(x.num_alertas),
+       SUM(x.num_detecciones), SUM(x.suma_deteccion)
+FROM (
+    SELECT
+        date_trunc('hour', timestamp::timestamptz AT TIME ZONE 'UTC') AS hora,
+        paquete_id, COUNT(*) AS num_lecturas, 0 AS num_alertas,
+        0 AS num_detecciones, 0.0 AS suma_deteccion
+    FROM telemetry
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT
+        date_trunc('hour', a.timestamp_inicio::timestamptz AT TIME ZONE 'UTC'), a.paquete_id, 0, COUNT(*),
+        COUNT(d.alert_id), COALESCE(SUM(d.segundos_deteccion), 0.0)
+    FROM alerts a
+    LEFT JOIN alert_detection d ON d.alert_id = a.id
+    GROUP BY 1, 2
+) x
+JOIN packages p ON p.id = x.paquete_id
+GROUP BY 1, 2
+ON CONFLICT (hora, id_paquete) DO UPDATE SET
+    num_lecturas = EXCLUDED.num_lecturas,
+    num_alertas = EXCLUDED.num_alertas,
+    num_detecciones = EXCLUDED.num_detecciones,
+    suma_deteccion = EXCLUDED.suma_deteccion;
+"""
+
+GRANULARIDADES = {"hora": timedelta(hours=1), "dia": timedelta(days=1)}
+
+# Upsert y funciones mínimo/máximo de dos valores según la base de datos
+_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+_MENOR = {"postgresql": func.least, "sqlite": func.min}
+_MAYOR = {"postgresql": func.greatest, "sqlite": func.max}
+# Inicio del día de una columna DateTime
+_DIA = {
+    "postgresql": lambda columna: func.date_trunc("day", columna),
+    "sqlite": lambda columna: func.datetime(columna, "start of day"),
+}
+
+
+def _dialecto(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _utc(instante: datetime) -> datetime:
+    """Instante en UTC sin zona (como se guardan created_at y kpi_buckets.hora)"""
+    if instante.tzinfo is not None:
+        instante = instante.astimezone(timezone.utc).replace(tzinfo=None)
+    return instante
+
+
+def inicio_hora(instante: datetime) -> datetime:
+    """Hora (UTC, sin zona) a la que pertenece un instante"""
+    return _utc(instante).replace(minute=0, second=0, microsecond=0)
+
+
+def rango_periodos(desde: Optional[datetime], hasta: Optional[datetime], granularidad: str = "hora"):
+    """
+    Ajusta [desde, hasta) a periodos completos (horas o días, UTC).
+    Sin hasta: hasta el final del periodo en curso. Sin desde: las últimas
+    24 horas o los últimos 30 días.
+    """
+    paso = GRANULARIDADES[granularidad]
+
+    def inicio(instante):
+        instante = inicio_hora(instante)
+        return instante if granularidad == "hora" else instante.replace(hour=0)
+
+    hasta = _utc(hasta) if hasta else datetime.utcnow()
+    fin = inicio(hasta)
+    if fin < hasta:  # Periodo a medias: se incluye entero
+        fin += paso
+    comienzo = inicio(desde) if desde else fin - paso * (24 if granularidad == "hora" else 30)
+    return comienzo, fin
+
+
+def _hora_lectura(timestamp: str) -> datetime:
+    """
+    Hora de una lectura a partir de su timestamp ISO 8601. Un timestamp que
+    no se entiende lanza ValueError (schemas.TelemetryCreate ya los rechaza):
+    contarlo en otra hora falsearía los buckets.
+    """
+    return inicio_hora(datetime.fromisoformat(timestamp.replace("Z", "+00:00")))
+
+
+def _sumar_bucket(db: Session, hora: datetime, id_paquete: str, **incrementos):
+    """Upsert que suma los incrementos a la fila (hora, paquete) de kpi_buckets"""
+    tabla = KpiBucket.__table__
+    consulta = _INSERT[_dialecto(db)](tabla).values(
+        hora=hora, id_paquete=id_paquete,
+        **{"num_lecturas": 0, "num_alertas": 0, "num_detecciones": 0, "suma_deteccion": 0.0, **incrementos}
+    )
+    db.execute(consulta.on_conflict_do_update(
+        index_elements=[tabla.c.hora, tabla.c.id_paquete],
+        set_={columna: tabla.c[columna] + consulta.excluded[columna] for columna in incrementos}
+    ))
+
+
+def registrar_lectura(db: Session, id_paquete: str, timestamp: str):
+    """
+    Suma una lectura al resumen del paquete (sin commit: va en la
+    transacción de la telemetría).
+    """
+    dialecto = _dialecto(db)
+    tabla = PackageSummary.__table__
+    consulta = _INSERT[dialecto](tabla).values(
+        id_paquete=id_paquete,
+        num_eventos=1,
+        num_alertas=0,
+        primer_timestamp=timestamp,
+        ultimo_timestamp=timestamp,
+        actualizado_en=datetime.utcnow()
+    )
+    db.execute(consulta.on_conflict_do_update(
+        index_elements=[tabla.c.id_paquete],
+        set_={
+            "num_eventos": tabla.c.num_eventos + 1,
+            "primer_timestamp": _MENOR[dialecto](tabla.c.primer_timestamp, consulta.excluded.primer_timestamp),
+            "ultimo_timestamp": _MAYOR[dialecto](tabla.c.ultimo_timestamp, consulta.excluded.ultimo_timestamp),
+            "actualizado_en": consulta.excluded.actualizado_en,
+        }
+    ))
+    _sumar_bucket(db, _hora_lectura(timestamp), id_paquete, num_lecturas=1)
+
+
+def registrar_alerta(db: Session, alerta: Alert, id_paquete: str):
+    """
+    Suma una alerta recién creada a los agregados: resumen del paquete,
+    latencia de detección y bucket de la hora de su timestamp_inicio. Sin
+    commit: va en la transacción de la alerta, que debe estar en la sesión
+    con flush.
+    id_paquete: el de la alerta (alerta.id_paquete aún no está cargado)
+    """
+    tabla = PackageSummary.__table__
+    db.execute(
+        tabla.update()
+        .where(tabla.c.id_paquete == id_paquete)
+        .values(num_alertas=tabla.c.num_alertas + 1, actualizado_en=datetime.utcnow())
+    )
+    segundos = registrar_deteccion(db, alerta.id)
+    incrementos = {"num_alertas": 1}
+    if segundos is not None:
+        incrementos.update(num_detecciones=1, suma_deteccion=segundos)
+    _sumar_bucket(db, _hora_lectura(alerta.timestamp_inicio), id_paquete, **incrementos)
+
+
+def registrar_deteccion(db: Session, alert_id: int):
+    """
+    Calcula y guarda la latencia de detección de una alerta ya en la sesión.
+    Solo PostgreSQL (usa LATERAL); devuelve los segundos o None.
+    """
+    if _dialecto(db) != "postgresql":
+        return None
+    return db.execute(
+        text(SQL_DETECCION.format(filtro="a.id = :alert_id") + " RETURNING segundos_deteccion"),
+        {"alert_id": alert_id}
+    ).scalar()
+
+
+def serie_kpis(db: Session, desde: datetime, hasta: datetime, granularidad: str = "hora") -> list:
+    """
+    KPIs por hora o por día en [desde, hasta) a partir de kpi_buckets.
+    
+    Returns:
+        lista de dicts (uno por periodo con datos, en orden) con paquetes,
+        sla_porcentaje, lecturas, alertas, alertas_por_1000_lecturas y
+        mttd_segundos
+    """
+    tabla = KpiBucket.__table__
+    periodo = tabla.c.hora if granularidad == "hora" else _DIA[_dialecto(db)](tabla.c.hora)
+    filas = db.execute(
+        select(
+            periodo.label("periodo"),
+            func.count(func.distinct(tabla.c.id_paquete)),
+            func.count(func.distinct(case((tabla.c.num_alertas > 0, tabla.c.id_paquete)))),
+            func.sum(tabla.c.num_lecturas),
+            func.sum(tabla.c.num_alertas),
+            func.sum(tabla.c.num_detecciones),
+            func.sum(tabla.c.suma_deteccion),
+        )
+        .where(tabla.c.hora >= inicio_hora(desde), tabla.c.hora < hasta)
+        .group_by(periodo)
+        .order_by(periodo)
+    ).all()
+
+    serie = []
+    for inicio, paquetes, con_alertas, lecturas, alertas, detecciones, suma in filas:
+        if isinstance(inicio, str):  # SQLite devuelve las funciones de fecha como texto
+            inicio = datetime.fromisoformat(inicio)
+        serie.append({
+            "periodo": inicio.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "paquetes": paquetes,
+            "sla_porcentaje": round((paquetes - con_alertas) / paquetes * 100, 2) if paquetes else None,
+            "lecturas": int(lecturas or 0),
+            "alertas": int(alertas or 0),
+            "alertas_por_1000_lecturas": round(alertas / lecturas * 1000, 3) if lecturas else None,
+            "mttd_segundos": round(suma / detecciones, 2) if detecciones else None,
+        })
+    return serie
+
+
+def crear_vista_kpis(engine):
+    """
+    Crea la vista materializada de KPIs y su índice único (solo PostgreSQL).
+    Si existe de una versión anterior de SQL_VISTA_KPIS, la recrea.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        version = conn.execute(
+            text("SELECT obj_description(to_regclass(:vista), 'pg_class')"), {"vista": VISTA_KPIS}
+        ).scalar()
+        if version == VERSION_VISTA_KPIS:
+            return
+        conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {VISTA_KPIS}"))
+        conn.execute(text(SQL_VISTA_KPIS))
+
+
+def refrescar_vista_kpis(engine):
+    """
+    Recalcula la vista sin bloquear a quien la está leyendo
+    (CONCURRENTLY necesita el índice único y que la vista ya tenga datos).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {VISTA_KPIS}"))
+
+
+def reconstruir_resumen(engine):
+    """
+    Rellena package_summary y kpi_buckets desde telemetry y alerts, y
+    alert_detection para las alertas que aún no la tengan (una sola vez
+    o para reparar). kpi_buckets se vacía antes: así no quedan filas de
+    horas que ya no tienen lecturas ni alertas
+    """
+    with engine.begin() as conn:
+        conn.execute(text(SQL_RECONSTRUIR_RESUMEN))
+        conn.execute(text(SQL_DETECCION.format(
+            filtro="NOT EXISTS (SELECT 1 FROM alert_detection d WHERE d.alert_id = a.id)"
+        )))
+        conn.execute(text("DELETE FROM kpi_buckets"))
+        conn.execute(text(SQL_RECONSTRUIR_BUCKETS))
+
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de los agregados de KPIs")
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Recalcula package_summary desde telemetry y alerts")
+    parser.add_argument("--cada", type=float, default=None,
+                        help="Refresca la vista de KPIs cada N segundos (por defecto, una vez)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[
+        PackageSummary.__table__, AlertDetection.__table__, KpiBucket.__table__
+    ])
+    crear_vista_kpis(engine)
+    if args.reconstruir:
+        print("🔄 Reconstruyendo package_summary, alert_detection y kpi_buckets...")
+        reconstruir_resumen(engine)
+
+    while True:
+        inicio = time.perf_counter()
+        refrescar_vista_kpis(engine)
+        print(f"✅ {VISTA_KPIS} refrescada en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        if args.cada is None:
+            break
+        time.sleep(args.cada)
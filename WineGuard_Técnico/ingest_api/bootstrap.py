@@ -0,0 +1,60 @@
+# ingest_api/bootstrap.py
+"""
+Crea o actualiza el esquema de la base de datos de la API (tablas, índices
+y la vista materializada de KPIs). Si telemetry y alerts aún guardan el
+id_paquete en texto, los migra a la clave entera de packages (ver
+paquetes.migrar_esquema; con la API parada). A latency_probes le añade la
+columna ejecucion si es de antes de tenerla.
+
+Antes lo hacía main.py al importarse, así que cada proceso que arrancaba
+pagaba varios viajes a la base de datos antes de poder servir. Ahora es un
+paso explícito que se lanza una vez por despliegue, antes de arrancar la API:
+
+    python bootstrap.py
+"""
+import time
+
+from sqlalchemy import inspect, text
+
+import agregados
+from database import Base, engine
+import models  # noqa: F401  (registra las tablas en Base.metadata)
+from models import LatencyProbe
+import paquetes
+
+
+def migrar_sondas(engine) -> bool:
+    """
+    Añade latency_probes.ejecucion a las tablas creadas antes de tenerla
+    (las sondas anteriores quedan con ejecucion NULL).
+
+    Returns:
+        True si faltaba la columna
+    """
+    columnas = {c["name"] for c in inspect(engine).get_columns(LatencyProbe.__tablename__)}
+    if "ejecucion" in columnas:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {LatencyProbe.__tablename__} ADD COLUMN ejecucion BIGINT"))
+    return True
+
+
+def crear_esquema(engine):
+    """
+    Crea las tablas e índices que falten, migra id_paquete a paquete_id y
+    añade latency_probes.ejecucion si hace falta y crea la vista
+    materializada de KPIs
+    """
+    Base.metadata.create_all(bind=engine)
+    if migrar_sondas(engine):
+        print("🔄 latency_probes: añadida la columna ejecucion")
+    if paquetes.migrar_esquema(engine):
+        print("🔄 telemetry y alerts migradas de id_paquete a paquete_id (packages)")
+    agregados.crear_vista_kpis(engine)
+
+
+if __name__ == "__main__":
+    inicio = time.perf_counter()
+    crear_esquema(engine)
+    print(f"✅ Esquema listo en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"({', '.join(sorted(Base.metadata.tables))})")
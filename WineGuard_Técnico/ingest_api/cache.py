@@ -0,0 +1,83 @@
+# ingest_api/cache.py
+"""
+Caché en memoria con caducidad (TTL) para respuestas de lectura de la API.
+Cada proceso de la API tiene la suya; un valor puede quedar desfasado como
+mucho `ttl` segundos respecto a la base de datos, salvo que quien escribe
+invalide la entrada (ver invalidar).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+
+
+class CacheTTL:
+    """
+    Diccionario LRU con caducidad por entrada y tamaño máximo (al llenarse
+    se descartan primero las entradas caducadas y después las usadas hace
+    más tiempo). Cuenta aciertos, fallos e invalidaciones.
+    """
+
+    def __init__(self, ttl: float, max_entradas: int = 256):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Sube en cada invalidación: un valor calculado antes no se guarda
+        self._version = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el valor en caché o lo calcula (fuera del lock) y lo guarda"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+            version = self._version
+
+        valor = calcular()
+
+        with self._lock:
+            # Si se invalidó mientras se calculaba, el valor puede ser anterior
+            # a la escritura: se devuelve pero no se guarda
+            if version == self._version:
+                self._entradas[clave] = (ahora + self.ttl, valor)
+                self._entradas.move_to_end(clave)
+                if len(self._entradas) > self.max_entradas:
+                    self._purgar(ahora)
+        return valor
+
+    def invalidar(self, *claves: Hashable):
+        """Quita esas claves de la caché (sin argumentos, la vacía)"""
+        with self._lock:
+            self._version += 1
+            self.invalidaciones += 1
+            if not claves:
+                self._entradas.clear()
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def metricas(self) -> dict:
+        """Contadores para /stats"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None,
+                "invalidaciones": self.invalidaciones,
+            }
+
+    def _purgar(self, ahora: float):
+        """Quita las caducadas y, si no basta, las usadas hace más tiempo"""
+        for clave in [c for c, (expira, _) in self._entradas.items() if expira <= ahora]:
+            del self._entradas[clave]
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
@@ -0,0 +1,285 @@
+# ingest_api/cargar_historico.py
+"""
+Carga masiva de telemetría histórica (volcados NDJSON o CSVs con el formato
+de labels.csv) sin pasar por /ingest.
+
+Cada archivo se lee por bloques con pyarrow (CSV o NDJSON, también
+comprimidos), se valida en bloque con pandas (mismas reglas que
+schemas.TelemetryCreate: sensores presentes, rangos plausibles y timestamp
+ISO 8601) y se vuelca a telemetry con COPY ... FROM STDIN, un COPY por
+bloque. Los id_paquete se traducen a la clave entera de packages (dando de
+alta los nuevos en bloque, ver paquetes.resolver_lote). Las filas
+inválidas se descartan y se cuentan; un valor no numérico en un sensor
+aborta el archivo. Cada archivo va en una sola transacción: si falla, no
+deja nada a medias y se puede volver a lanzar.
+
+Con --procesos N se cargan N archivos a la vez, cada uno en su proceso y
+con su propia conexión. Con --sin-indices se borran los índices
+secundarios de telemetry antes de cargar y se recrean al final (mantenerlos
+fila a fila es la mayor parte del coste del COPY; mientras tanto las
+consultas por paquete de la API van lentas). Al terminar se reconstruyen
+los agregados de agregados.py (package_summary, alert_detection,
+kpi_buckets), que el COPY no actualiza; --sin-agregados lo salta.
+
+Las alertas no se recalculan: el detector solo actúa sobre /ingest.
+
+Uso (desde ingest_api/):
+    python cargar_historico.py ../analytics/labels.csv
+    python cargar_historico.py volcados/*.ndjson.gz --procesos 4 --sin-indices
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+
+import agregados
+import paquetes
+from database import engine
+from models import Telemetry
+
+# Columnas que se copian (todas las de telemetry menos el id autoincremental)
+COLUMNAS = [columna.name for columna in Telemetry.__table__.columns if columna.name != "id"]
+SENSORES = [columna for columna in COLUMNAS if columna not in ("paquete_id", "timestamp")]
+# Columnas que se leen de los archivos (el paquete viene en texto)
+COLUMNAS_ARCHIVO = ["id_paquete", "timestamp"] + SENSORES
+
+# Mismos rangos que los validadores de schemas.TelemetryCreate
+RANGOS_PLAUSIBLES = {
+    "temperatura": (-20, 50),
+    "fuerza_g": (0, 10),
+    "inclinacion": (-90, 90),
+    "humedad": (0, 100),
+}
+
+TAMANO_BLOQUE = 16 * 2**20  # Bytes del archivo por bloque (~170.000 lecturas en CSV)
+EXTENSIONES_NDJSON = (".ndjson", ".jsonl", ".json")
+
+# Tipos con los que se leen los archivos (las columnas de más se ignoran)
+ESQUEMA = pa.schema(
+    [("id_paquete", pa.string()), ("timestamp", pa.string())]
+    + [(sensor, pa.float64()) for sensor in SENSORES]
+)
+
+SQL_COPY = f"COPY {Telemetry.__tablename__} ({', '.join(COLUMNAS)}) FROM STDIN WITH (FORMAT csv)"
+
+
+# ============================================
+# LECTURA Y VALIDACIÓN
+# ============================================
+
+def es_ndjson(ruta: str) -> bool:
+    """True si el archivo es NDJSON (también comprimido: .ndjson.gz, ...)"""
+    nombre = ruta.lower()
+    for compresion in (".gz", ".bz2", ".lz4", ".zst"):
+        nombre = nombre.removesuffix(compresion)
+    return nombre.endswith(EXTENSIONES_NDJSON)
+
+
+def leer_bloques(ruta: str, tamano_bloque: int = TAMANO_BLOQUE):
+    """Itera el archivo en DataFrames con las columnas de COLUMNAS_ARCHIVO"""
+    entrada = pa.input_stream(ruta)  # Descomprime según la extensión
+    if es_ndjson(ruta):
+        lector = pa_json.open_json(
+            entrada,
+            read_options=pa_json.ReadOptions(block_size=tamano_bloque),
+            parse_options=pa_json.ParseOptions(explicit_schema=ESQUEMA,
+                                               unexpected_field_behavior="ignore"),
+        )
+    else:
+        lector = pa_csv.open_csv(
+            entrada,
+            read_options=pa_csv.ReadOptions(block_size=tamano_bloque),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=ESQUEMA, include_columns=COLUMNAS_ARCHIVO,
+                strings_can_be_null=True,
+            ),
+        )
+    with entrada:
+        for lote in lector:
+            yield lote.to_pandas()[COLUMNAS_ARCHIVO]
+
+
+def validar(bloque: pd.DataFrame):
+    """
+    Valida las lecturas de un bloque de una vez (sin recorrer filas).
+
+    Returns:
+        (DataFrame con las filas válidas, nº de filas descartadas)
+    """
+    valida = bloque[SENSORES].notna().all(axis=1)
+    for sensor, (minimo, maximo) in RANGOS_PLAUSIBLES.items():
+        valida &= bloque[sensor].between(minimo, maximo)
+    valida &= bloque["id_paquete"].str.strip().str.len().gt(0)
+    instantes = pd.to_datetime(bloque["timestamp"], utc=True, format="ISO8601", errors="coerce")
+    valida &= instantes.notna()
+    return bloque[valida], int((~valida).sum())
+
+
+# ============================================
+# CARGA
+# ============================================
+
+def _iniciar_proceso():
+    """Cada proceso abre sus propias conexiones (no las heredadas del padre)"""
+    engine.dispose(close=False)
+
+
+def codificar(conexion, filas: pd.DataFrame, claves: dict) -> pd.DataFrame:
+    """
+    Cambia id_paquete por paquete_id (columnas de COLUMNAS). claves es el
+    diccionario id_paquete → clave del archivo; los paquetes que aún no
+    están se resuelven todos a la vez.
+    """
+    nuevos = [id_paquete for id_paquete in filas["id_paquete"].unique() if id_paquete not in claves]
+    if nuevos:
+        claves.update(paquetes.resolver_lote(conexion, nuevos))
+    return filas.assign(paquete_id=filas["id_paquete"].map(claves))[COLUMNAS]
+
+
+def copiar(cursor, filas: pd.DataFrame):
+    """Vuelca las filas a telemetry con COPY FROM STDIN (CSV en memoria)"""
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(filas, preserve_index=False), buffer,
+                     pa_csv.WriteOptions(include_header=False))
+    buffer.seek(0)
+    cursor.copy_expert(SQL_COPY, buffer)
+
+
+def cargar_archivo(ruta: str, tamano_bloque: int = TAMANO_BLOQUE) -> dict:
+    """
+    Carga un archivo en una transacción.
+
+    Returns:
+        dict con ruta, filas cargadas, filas descartadas y segundos
+    """
+    inicio = time.perf_counter()
+    cargadas = descartadas = 0
+    claves = {}
+    conexion = engine.raw_connection()
+    # Las altas en packages van por otra conexión y se confirman al momento:
+    # si fueran en la transacción del archivo, las cargas en paralelo que
+    # comparten paquetes se esperarían unas a otras hasta el final
+    conexion_paquetes = engine.raw_connection()
+    try:
+        with conexion.cursor() as cursor:
+            for bloque in leer_bloques(ruta, tamano_bloque):
+                filas, n_descartadas = validar(bloque)
+                if len(filas):
+                    copiar(cursor, codificar(conexion_paquetes, filas, claves))
+                cargadas += len(filas)
+                descartadas += n_descartadas
+        conexion.commit()
+    except BaseException:
+        conexion.rollback()
+        raise
+    finally:
+        conexion.close()
+        conexion_paquetes.close()
+    return {
+        "ruta": ruta,
+        "cargadas": cargadas,
+        "descartadas": descartadas,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+def informar(resultado: dict):
+    """Imprime las filas cargadas y el ritmo de un archivo"""
+    ritmo = resultado["cargadas"] / resultado["segundos"] if resultado["segundos"] else 0
+    print(f"   └─ {resultado['ruta']}: {resultado['cargadas']:,} filas "
+          f"({resultado['descartadas']:,} descartadas) en {resultado['segundos']:.1f} s "
+          f"→ {ritmo:,.0f} filas/s")
+
+
+def cargar(rutas, procesos: int = 1, tamano_bloque: int = TAMANO_BLOQUE) -> list:
+    """Carga los archivos, `procesos` a la vez. Devuelve un resultado por archivo"""
+    if procesos <= 1 or len(rutas) == 1:
+        resultados = []
+        for ruta in rutas:
+            resultados.append(cargar_archivo(ruta, tamano_bloque))
+            informar(resultados[-1])
+        return resultados
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=min(procesos, len(rutas)),
+                             initializer=_iniciar_proceso) as ejecutor:
+        for resultado in ejecutor.map(cargar_archivo, rutas, [tamano_bloque] * len(rutas)):
+            informar(resultado)
+            resultados.append(resultado)
+    return resultados
+
+
+def quitar_indices(conexion) -> list:
+    """Borra los índices secundarios de telemetry (la clave primaria se queda)"""
+    indices = list(Telemetry.__table__.indexes)
+    for indice in indices:
+        indice.drop(bind=conexion, checkfirst=True)
+    return indices
+
+
+def recrear_indices(conexion, indices):
+    """Vuelve a crear los índices borrados por quitar_indices()"""
+    for indice in indices:
+        indice.create(bind=conexion, checkfirst=True)
+
+
+if __name__ == "__main__":
+    from database import Base
+
+    parser = argparse.ArgumentParser(description="Carga masiva de telemetría histórica con COPY")
+    parser.add_argument("archivos", nargs="+", help="Archivos NDJSON o CSV (pueden ir comprimidos)")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Archivos que se cargan a la vez (por defecto, 1)")
+    parser.add_argument("--bloque-mb", type=int, default=TAMANO_BLOQUE // 2**20,
+                        help=f"MB del archivo por COPY (por defecto, {TAMANO_BLOQUE // 2**20})")
+    parser.add_argument("--sin-indices", action="store_true",
+                        help="Borrar los índices secundarios de telemetry y recrearlos al final")
+    parser.add_argument("--sin-agregados", action="store_true",
+                        help="No reconstruir package_summary, alert_detection ni kpi_buckets")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        parser.error("COPY solo está disponible en PostgreSQL (DATABASE_URL)")
+    for ruta in args.archivos:
+        if not os.path.isfile(ruta):
+            parser.error(f"No existe el archivo: {ruta}")
+
+    Base.metadata.create_all(bind=engine)
+    paquetes.migrar_esquema(engine)
+
+    print("=" * 60)
+    print(f"📥 CARGA HISTÓRICA: {len(args.archivos)} archivo(s), {args.procesos} proceso(s)")
+    print("=" * 60)
+    indices = []
+    if args.sin_indices:
+        with engine.begin() as conn:
+            indices = quitar_indices(conn)
+        print(f"   └─ Índices quitados: {', '.join(indice.name for indice in indices)}")
+
+    inicio = time.perf_counter()
+    try:
+        resultados = cargar(args.archivos, args.procesos, args.bloque_mb * 2**20)
+    finally:
+        if indices:
+            print("\n🔄 Recreando índices de telemetry...")
+            inicio_indices = time.perf_counter()
+            with engine.begin() as conn:
+                recrear_indices(conn, indices)
+            print(f"   └─ Listo en {time.perf_counter() - inicio_indices:.1f} s")
+    segundos = time.perf_counter() - inicio
+    total = sum(resultado["cargadas"] for resultado in resultados)
+    descartadas = sum(resultado["descartadas"] for resultado in resultados)
+    print(f"\n✅ {total:,} filas cargadas ({descartadas:,} descartadas) en {segundos:.1f} s "
+          f"→ {total / segundos:,.0f} filas/s ({total / segundos * 60:,.0f} filas/min)")
+
+    if not args.sin_agregados:
+        print("\n🔄 Reconstruyendo package_summary, alert_detection y kpi_buckets...")
+        inicio = time.perf_counter()
+        agregados.reconstruir_resumen(engine)
+        print(f"   └─ Listo en {time.perf_counter() - inicio:.1f} s")
@@ -8,10 +8,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplica de lectura (opcional): si no se define, las lecturas van a la primaria
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor de lectura con su propio pool: las consultas del dashboard no
+# compiten por conexiones con /ingest
+read_engine = create_engine(SQLALCHEMY_READ_DATABASE_URL) if SQLALCHEMY_READ_DATABASE_URL else engine
+SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -19,4 +26,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_db_lectura(primaria: bool = False):
+    """
+    Sesión para endpoints de solo lectura (réplica si hay DATABASE_READ_URL).
+    Con ?primaria=true se lee de la primaria, para ver al momento lo que se
+    acaba de escribir (la réplica puede ir con retraso). Solo elige la base
+    de datos: los endpoints con caché se la saltan con ?sin_cache=true.
+    """
+    db = SessionLocal() if primaria else SessionLectura()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,261 @@
+# ingest_api/deriva.py
+"""
+Detectores estadísticos en línea de deriva lenta en humedad, oxígeno y
+vapores (fallos de corcho o de cierre), por paquete y por sensor.
+
+Para cada sensor:
+- Línea base: media y varianza exactas de las N_CALENTAMIENTO primeras
+  lecturas y después medias móviles exponenciales (EWMA/EWMV) que solo
+  aprenden de lecturas en control (en alarma la línea base se congela).
+- z = (valor - media) / desviación de la línea base.
+- Carta EWMA: media exponencial rápida del valor, en desviaciones de su
+  propia dispersión (detecta cambios moderados y sostenidos).
+- CUSUM bilateral sobre z (detecta derivas pequeñas y lentas), con tope
+  en CUSUM_MAX para que la alarma se apague poco después de que acabe.
+
+La alarma salta si el CUSUM supera H_CUSUM o |z EWMA| supera UMBRAL_Z_EWMA
+y se apaga cuando ambos bajan de la mitad (histéresis). Estado O(1) y
+actualización O(1) por lectura: un registro de CAMPOS_DERIVA floats por
+sensor, que DetectorIncidentes guarda en un array('d') por paquete y
+DetectorIncidentesSoA en una fila de un array de NumPy.
+
+La versión por lotes para evaluar con el histórico está en
+evaluar_detector.py (alarmas_deriva); benchmark: benchmarks/bench_deriva.py
+"""
+import json
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+# ==============================================
+# CONFIGURACIÓN DE LOS DETECTORES DE DERIVA
+# ==============================================
+# Sensor → desviación mínima de la línea base (evita z enormes si el sensor
+# apenas varía) y unidad para los mensajes
+SENSORES_DERIVA = {
+    'humedad': {'sigma_min': 0.5, 'unidad': '%'},
+    'oxigeno': {'sigma_min': 0.05, 'unidad': '%'},
+    'vapores': {'sigma_min': 0.1, 'unidad': 'ppm'},
+}
+SIGMA_MIN = {sensor: config['sigma_min'] for sensor, config in SENSORES_DERIVA.items()}
+
+N_CALENTAMIENTO = 100       # Lecturas para fijar la línea base inicial
+ALFA_BASE = 0.01            # Peso de cada lectura en la línea base (lenta)
+LAMBDA_EWMA = 0.1           # Peso de cada lectura en la carta EWMA (rápida)
+UMBRAL_Z_EWMA = 4.5         # Desviaciones de la carta EWMA para la alarma
+K_CUSUM = 0.5               # Holgura del CUSUM (en desviaciones)
+H_CUSUM = 12.0              # Umbral del CUSUM para la alarma
+CUSUM_MAX = 2 * H_CUSUM     # Tope del CUSUM: acota lo que tarda en apagarse la alarma
+
+# Desviación típica de la EWMA en control, en desviaciones de la lectura
+FACTOR_EWMA = math.sqrt(LAMBDA_EWMA / (2 - LAMBDA_EWMA))
+
+# Registro de cada sensor (posiciones dentro del bloque de CAMPOS_DERIVA floats)
+N, MEDIA, VARIANZA, EWMA, CUSUM_POS, CUSUM_NEG, ALARMA = range(7)
+CAMPOS_DERIVA = 7
+
+
+def actualizar(registro, base: int, valor: float, sigma_min: float) -> bool:
+    """
+    Actualiza con una lectura el registro de un sensor (registro[base:base+7])
+    y devuelve si está en alarma de deriva.
+
+    Durante el calentamiento solo se aprende la línea base; la alarma sigue
+    como estaba (apagada, salvo en una alerta restaurada sin línea base).
+    """
+    n = registro[base + N]
+    media = registro[base + MEDIA]
+    varianza = registro[base + VARIANZA]
+    if n < N_CALENTAMIENTO:
+        n += 1
+        d = valor - media
+        media += d / n
+        registro[base + VARIANZA] = varianza + (d * (valor - media) - varianza) / n
+        registro[base + N] = n
+        registro[base + MEDIA] = media
+        registro[base + EWMA] = media
+        return registro[base + ALARMA] != 0.0
+
+    sigma = math.sqrt(varianza)
+    if sigma < sigma_min:
+        sigma = sigma_min
+    z = (valor - media) / sigma
+    ewma = registro[base + EWMA]
+    ewma += LAMBDA_EWMA * (valor - ewma)
+    z_ewma = (ewma - media) / (sigma * FACTOR_EWMA)
+    cusum_pos = registro[base + CUSUM_POS] + z - K_CUSUM
+    if cusum_pos < 0.0:
+        cusum_pos = 0.0
+    elif cusum_pos > CUSUM_MAX:
+        cusum_pos = CUSUM_MAX
+    cusum_neg = registro[base + CUSUM_NEG] - z - K_CUSUM
+    if cusum_neg < 0.0:
+        cusum_neg = 0.0
+    elif cusum_neg > CUSUM_MAX:
+        cusum_neg = CUSUM_MAX
+    cusum = cusum_pos if cusum_pos > cusum_neg else cusum_neg
+
+    if registro[base + ALARMA] != 0.0:
+        alarma = cusum > H_CUSUM / 2 or abs(z_ewma) > UMBRAL_Z_EWMA / 2
+    else:
+        alarma = cusum > H_CUSUM or abs(z_ewma) > UMBRAL_Z_EWMA
+
+    if not alarma:
+        # La línea base solo aprende de lecturas en control
+        d = valor - media
+        registro[base + MEDIA] = media + ALFA_BASE * d
+        registro[base + VARIANZA] = (1 - ALFA_BASE) * (varianza + ALFA_BASE * d * d)
+    registro[base + EWMA] = ewma
+    registro[base + CUSUM_POS] = cusum_pos
+    registro[base + CUSUM_NEG] = cusum_neg
+    registro[base + ALARMA] = 1.0 if alarma else 0.0
+    return alarma
+
+
+def linea_base(registro, base: int) -> dict:
+    """Línea base y estadísticos actuales de un sensor (van en los detalles de la alerta)"""
+    return {
+        'media': registro[base + MEDIA],
+        'desviacion': math.sqrt(registro[base + VARIANZA]),
+        'ewma': registro[base + EWMA],
+        'cusum_pos': registro[base + CUSUM_POS],
+        'cusum_neg': registro[base + CUSUM_NEG],
+    }
+
+
+def restaurar(registro, base: int, linea: Optional[dict]):
+    """
+    Pone en alarma el registro de un sensor con una alerta abierta en la BD.
+    Con la línea base de los detalles de la alerta sigue donde estaba; sin
+    ella la vuelve a aprender (y la alerta sigue abierta mientras tanto).
+    """
+    for campo in range(CAMPOS_DERIVA):
+        registro[base + campo] = 0.0
+    if linea:
+        registro[base + N] = N_CALENTAMIENTO
+        registro[base + MEDIA] = linea['media']
+        registro[base + VARIANZA] = linea['desviacion'] ** 2
+        registro[base + EWMA] = linea['ewma']
+        registro[base + CUSUM_POS] = linea['cusum_pos']
+        registro[base + CUSUM_NEG] = linea['cusum_neg']
+    registro[base + ALARMA] = 1.0
+
+
+# ==============================================
+# INCIDENTES DE DERIVA
+# ==============================================
+@dataclass
+class IncidenteDeriva:
+    """Incidente de deriva abierto de un sensor (solo existe mientras dura)"""
+    timestamp_inicio: str
+    eventos: int = 0
+    suma: float = 0.0
+    maximo: float = -math.inf
+    alerta_id: Optional[int] = None
+    notificada: bool = False  # Ya se devolvió como alerta_nueva
+
+    def anadir(self, valor: float):
+        self.eventos += 1
+        self.suma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+
+def incidente_restaurado(alert_id: int, timestamp_inicio: str, num_eventos: int,
+                         valores: List[float]) -> IncidenteDeriva:
+    """Incidente de una alerta de deriva abierta en la BD (valores: los conocidos)"""
+    return IncidenteDeriva(
+        timestamp_inicio, eventos=num_eventos, suma=sum(valores) / len(valores) * num_eventos,
+        maximo=max(valores), alerta_id=alert_id, notificada=True
+    )
+
+
+def tipo_incidente(sensor: str) -> str:
+    return f'deriva_{sensor}'
+
+
+def sensor_de(tipo: str) -> Optional[str]:
+    """Sensor de un tipo_incidente de deriva (None si no es de deriva)"""
+    if tipo.startswith('deriva_') and tipo[7:] in SENSORES_DERIVA:
+        return tipo[7:]
+    return None
+
+
+def procesar(id_paquete: str, data: dict, sensores: List[str], registro,
+             incidentes: Dict[str, IncidenteDeriva],
+             alerta_nueva: Optional[dict], alerta_actualizada: Optional[dict]):
+    """
+    Pasa la lectura por el detector de deriva de cada sensor.
+
+    registro: CAMPOS_DERIVA floats por sensor, en el orden de `sensores`
+    incidentes: sensor → IncidenteDeriva abierto del paquete (se modifica)
+
+    Como mucho hay una alerta nueva y un cierre por lectura (los de
+    temperatura y choque van antes): si el hueco está ocupado, la alerta o
+    el cierre de la deriva se devuelven con la lectura siguiente.
+
+    Returns:
+        (alerta_nueva, alerta_actualizada)
+    """
+    for k, sensor in enumerate(sensores):
+        base = k * CAMPOS_DERIVA
+        valor = data[sensor]
+        en_deriva = actualizar(registro, base, valor, SIGMA_MIN[sensor])
+        incidente = incidentes.get(sensor) if incidentes else None
+
+        if en_deriva:
+            if incidente is None:
+                incidente = incidentes[sensor] = IncidenteDeriva(data['timestamp'])
+            incidente.anadir(valor)
+
+            if not incidente.notificada and alerta_nueva is None:
+                incidente.notificada = True
+                linea = linea_base(registro, base)
+                unidad = SENSORES_DERIVA[sensor]['unidad']
+                sigma = max(linea['desviacion'], SIGMA_MIN[sensor])
+                z_ewma = (linea['ewma'] - linea['media']) / (sigma * FACTOR_EWMA)
+
+                print(f"🌫️ ALERTA NUEVA: {id_paquete} - Deriva de {sensor}")
+                print(f"   └─ Línea base: {linea['media']:.2f}{unidad} ± {linea['desviacion']:.2f} "
+                      f"| Ahora: {linea['ewma']:.2f}{unidad}")
+                print(f"   └─ z EWMA: {z_ewma:+.1f} | CUSUM: "
+                      f"{max(linea['cusum_pos'], linea['cusum_neg']):.1f}")
+
+                alerta_nueva = {
+                    'id_paquete': id_paquete,
+                    'tipo_incidente': tipo_incidente(sensor),
+                    'timestamp_inicio': incidente.timestamp_inicio,
+                    'num_eventos': incidente.eventos,
+                    'valor_max': incidente.maximo,
+                    'valor_promedio': incidente.suma / incidente.eventos,
+                    'detalles': json.dumps({
+                        'sensor': sensor,
+                        'direccion': 'sube' if linea['ewma'] > linea['media'] else 'baja',
+                        'umbral_cusum': H_CUSUM,
+                        'umbral_z_ewma': UMBRAL_Z_EWMA,
+                        'linea_base': linea
+                    })
+                }
+
+        elif incidente is not None:
+            if incidente.notificada:
+                if alerta_actualizada is not None:
+                    continue  # Se cierra con la lectura siguiente
+                valor_promedio = incidente.suma / incidente.eventos
+                unidad = SENSORES_DERIVA[sensor]['unidad']
+
+                print(f"💚 INCIDENTE DERIVA {sensor.upper()} FINALIZADO: {id_paquete}")
+                print(f"   └─ Duración: {incidente.eventos} eventos")
+                print(f"   └─ Max: {incidente.maximo:.2f}{unidad} | Promedio: {valor_promedio:.2f}{unidad}")
+
+                alerta_actualizada = {
+                    'alert_id': incidente.alerta_id,
+                    'timestamp_fin': data['timestamp'],
+                    'num_eventos_final': incidente.eventos,
+                    'valor_max_final': incidente.maximo,
+                    'valor_promedio_final': valor_promedio
+                }
+            del incidentes[sensor]
+
+    return alerta_nueva, alerta_actualizada
@@ -4,11 +4,17 @@ Detector de incidentes con memoria MEJORADO.
 - Rastrea el inicio Y fin de incidentes
 - Calcula promedios durante el incidente
 - Cuenta TODOS los eventos del incidente
+- Detecta derivas lentas de humedad, oxígeno y vapores (ver deriva.py)
 """
-from typing import Dict, Optional, List
+from array import array
+from typing import Dict, Iterable, Optional, List
 from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import os
+
+import deriva
+from deriva import SENSORES_DERIVA, IncidenteDeriva
 
 
 # ==============================================
@@ -35,6 +41,11 @@ class EstadoPaquete:
     timestamp_inicio_choque: Optional[str] = None
     valores_fuerza_g: List[float] = field(default_factory=list)  # Historial
 
+    # Deriva: registro estadístico de cada sensor (deriva.CAMPOS_DERIVA
+    # floats por sensor) e incidentes de deriva abiertos por sensor
+    registro_deriva: array = field(default_factory=lambda: array('d'))
+    incidentes_deriva: Dict[str, IncidenteDeriva] = field(default_factory=dict)
+
 
 class DetectorIncidentes:
     """
@@ -42,9 +53,15 @@ class DetectorIncidentes:
     y detecta incidentes sostenidos con métricas mejoradas.
     """
     
-    def __init__(self):
+    def __init__(self, sensores_deriva: Iterable[str] = SENSORES_DERIVA):
         # Diccionario para guardar el estado de cada paquete
         self.estados: Dict[str, EstadoPaquete] = {}
+        # Sensores con detector de deriva (vacío = sin detección de deriva)
+        self.sensores_deriva = list(sensores_deriva)
+        self._registro_vacio = array('d', [0.0]) * (deriva.CAMPOS_DERIVA * len(self.sensores_deriva))
+
+    def _nuevo_estado(self) -> EstadoPaquete:
+        return EstadoPaquete(registro_deriva=array('d', self._registro_vacio))
     
     def procesar_evento(self, data: dict) -> tuple[Optional[dict], Optional[dict]]:
         """
@@ -59,7 +76,7 @@ class DetectorIncidentes:
         
         # Crear estado si es la primera vez que vemos este paquete
         if id_paquete not in self.estados:
-            self.estados[id_paquete] = EstadoPaquete()
+            self.estados[id_paquete] = self._nuevo_estado()
         
         estado = self.estados[id_paquete]
         alerta_nueva = None
@@ -188,6 +205,15 @@ class DetectorIncidentes:
             estado.timestamp_inicio_choque = None
             estado.alerta_choque_id = None
         
+        # ==========================================
+        # DERIVA DE HUMEDAD, OXÍGENO Y VAPORES
+        # ==========================================
+        if self.sensores_deriva:
+            alerta_nueva, alerta_actualizada = deriva.procesar(
+                id_paquete, data, self.sensores_deriva, estado.registro_deriva,
+                estado.incidentes_deriva, alerta_nueva, alerta_actualizada
+            )
+        
         return alerta_nueva, alerta_actualizada
     
     def guardar_id_alerta(self, id_paquete: str, tipo_incidente: str, alert_id: int):
@@ -198,7 +224,53 @@ class DetectorIncidentes:
                 estado.alerta_temp_id = alert_id
             elif tipo_incidente == 'choque':
                 estado.alerta_choque_id = alert_id
+            elif deriva.sensor_de(tipo_incidente) in estado.incidentes_deriva:
+                estado.incidentes_deriva[deriva.sensor_de(tipo_incidente)].alerta_id = alert_id
     
+    def restaurar_alerta(self, id_paquete: str, tipo_incidente: str, alert_id: int,
+                         timestamp_inicio: str, num_eventos: int, valores: List[float],
+                         linea_base: Optional[dict] = None):
+        """
+        Vuelve a abrir en memoria una alerta que sigue abierta en la BD (sin
+        timestamp_fin), p. ej. al arrancar la API: la lectura que termine el
+        incidente cerrará esa alerta en vez de dejarla abierta para siempre.
+        
+        En las de deriva, linea_base es la de los detalles de la alerta.
+        """
+        if id_paquete not in self.estados:
+            self.estados[id_paquete] = self._nuevo_estado()
+        estado = self.estados[id_paquete]
+        if tipo_incidente == 'temperatura_alta':
+            estado.eventos_temp_alta = num_eventos
+            estado.valores_temp = list(valores)
+            estado.timestamp_inicio_temp = timestamp_inicio
+            estado.alerta_temp_id = alert_id
+        elif tipo_incidente == 'choque':
+            estado.eventos_choque = num_eventos
+            estado.valores_fuerza_g = list(valores)
+            estado.timestamp_inicio_choque = timestamp_inicio
+            estado.alerta_choque_id = alert_id
+        elif deriva.sensor_de(tipo_incidente) in self.sensores_deriva:
+            sensor = deriva.sensor_de(tipo_incidente)
+            base = self.sensores_deriva.index(sensor) * deriva.CAMPOS_DERIVA
+            deriva.restaurar(estado.registro_deriva, base, linea_base)
+            estado.incidentes_deriva[sensor] = deriva.incidente_restaurado(
+                alert_id, timestamp_inicio, num_eventos, valores)
+
+    def incidente_abierto(self, id_paquete: str) -> bool:
+        """True si el paquete tiene una racha anómala o una alerta abierta"""
+        estado = self.estados.get(id_paquete)
+        if estado is None:
+            return False
+        return bool(estado.eventos_temp_alta or estado.eventos_choque
+                    or estado.alerta_temp_id is not None
+                    or estado.alerta_choque_id is not None
+                    or estado.incidentes_deriva)
+
+    def paquetes(self):
+        """Ids de los paquetes con estado"""
+        return self.estados.keys()
+
     def obtener_estado(self, id_paquete: str) -> Optional[dict]:
         """Devuelve el estado actual de un paquete (para debugging)"""
         if id_paquete not in self.estados:
@@ -209,7 +281,8 @@ class DetectorIncidentes:
             'eventos_temp_alta': estado.eventos_temp_alta,
             'eventos_choque': estado.eventos_choque,
             'alerta_temp_activa': estado.alerta_temp_id is not None,
-            'alerta_choque_activa': estado.alerta_choque_id is not None
+            'alerta_choque_activa': estado.alerta_choque_id is not None,
+            'derivas_activas': sorted(estado.incidentes_deriva)
         }
     
     def reiniciar(self):
@@ -218,5 +291,10 @@ class DetectorIncidentes:
         print("🔄 Detector reiniciado")
 
 
-# Instancia global (Singleton)
-detector = DetectorIncidentes()
\ No newline at end of file
+# Instancia global (Singleton). Con DETECTOR_BACKEND=soa el estado de los
+# paquetes va en arrays de NumPy (detector_soa.py), para flotas muy grandes
+if os.getenv("DETECTOR_BACKEND", "dict") == "soa":
+    from detector_soa import DetectorIncidentesSoA
+    detector = DetectorIncidentesSoA()
+else:
+    detector = DetectorIncidentes()
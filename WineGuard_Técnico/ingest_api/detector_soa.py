@@ -0,0 +1,348 @@
+# ingest_api/detector_soa.py
+"""
+Detector de incidentes con el estado en arrays de NumPy ("struct of arrays").
+
+Misma semántica que DetectorIncidentes (detector.py), pero sin un objeto
+EstadoPaquete por paquete: cada id_paquete se traduce a un índice entero
+denso y el estado de todos los paquetes vive en arrays preasignados (uno por
+campo) que crecen al doble cuando se llenan. Con flotas de cientos de miles
+o millones de paquetes ocupa la mitad de memoria por paquete (~310 B
+frente a ~615 B), a cambio de procesar algo menos de eventos por segundo
+que el detector con dicts (ver el benchmark).
+
+En vez de guardar la lista de valores de cada racha se guardan agregados
+(nº de valores, suma acumulada en el mismo orden y máximo); de las rachas
+abiertas se guardan además los N_EVENTOS_CONSECUTIVOS primeros valores,
+que son los que van en los detalles de la alerta. El registro de deriva
+de cada paquete (deriva.py) es una fila de un array 2D y los incidentes de
+deriva, pocos a la vez, van en un dict por índice. Los resultados son
+idénticos a los del detector con dicts.
+
+Se activa con DETECTOR_BACKEND=soa (ver detector.py).
+Comparativa: python benchmarks/bench_detector_estado.py
+"""
+import json
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import deriva
+from deriva import SENSORES_DERIVA, IncidenteDeriva
+from detector import (
+    N_EVENTOS_CONSECUTIVOS,
+    UMBRAL_FUERZA_G,
+    UMBRAL_INCLINACION,
+    UMBRAL_TEMPERATURA,
+)
+
+CAPACIDAD_INICIAL = 1024
+SIN_ALERTA = -1  # alerta_id de los paquetes sin alerta activa
+
+
+class Rachas:
+    """
+    Estado de un tipo de incidente para todos los paquetes: un array por
+    campo, indexado por el índice del paquete.
+    """
+
+    def __init__(self, capacidad: int):
+        self.eventos = np.zeros(capacidad, dtype=np.int32)      # Eventos seguidos por encima del umbral
+        self.n_valores = np.zeros(capacidad, dtype=np.int32)    # Valores acumulados en la racha
+        self.suma = np.zeros(capacidad, dtype=np.float64)
+        self.maximo = np.zeros(capacidad, dtype=np.float64)
+        self.alerta_id = np.full(capacidad, SIN_ALERTA, dtype=np.int32)  # alerts.id es Integer
+        self.inicio = np.full(capacidad, None, dtype=object)    # Timestamp del primer evento
+        # Primeros valores de las rachas abiertas (pocas a la vez): índice → lista
+        self.primeros: Dict[int, List[float]] = {}
+
+    def crecer(self, capacidad: int):
+        """Amplía todos los arrays a `capacidad` filas (las nuevas, vacías)"""
+        actual = len(self.eventos)
+        for nombre, vacio in (('eventos', 0), ('n_valores', 0), ('suma', 0.0), ('maximo', 0.0),
+                              ('alerta_id', SIN_ALERTA), ('inicio', None)):
+            viejo = getattr(self, nombre)
+            nuevo = np.full(capacidad, vacio, dtype=viejo.dtype)
+            nuevo[:actual] = viejo
+            setattr(self, nombre, nuevo)
+
+    def anadir(self, i: int, valor: float, timestamp: str) -> int:
+        """Suma un evento anómalo a la racha del paquete i; devuelve su nº de eventos"""
+        eventos = int(self.eventos[i]) + 1
+        self.eventos[i] = eventos
+        k = int(self.n_valores[i])
+        if k == 0:
+            self.primeros[i] = [valor]
+            self.suma[i] = valor
+            self.maximo[i] = valor
+        else:
+            if k < N_EVENTOS_CONSECUTIVOS:
+                self.primeros[i].append(valor)
+            self.suma[i] += valor
+            if valor > self.maximo[i]:
+                self.maximo[i] = valor
+        self.n_valores[i] = k + 1
+        if eventos == 1:
+            self.inicio[i] = timestamp
+        return eventos
+
+    def resumen(self, i: int):
+        """(valor máximo, valor promedio) de la racha del paquete i"""
+        return float(self.maximo[i]), float(self.suma[i]) / int(self.n_valores[i])
+
+    def valores_iniciales(self, i: int) -> List[float]:
+        """Los primeros valores de la racha (los que van en los detalles de la alerta)"""
+        return list(self.primeros.get(i, ()))
+
+    def alerta(self, i: int) -> Optional[int]:
+        alerta_id = int(self.alerta_id[i])
+        return None if alerta_id == SIN_ALERTA else alerta_id
+
+    def resetear(self, i: int):
+        """Termina la racha del paquete i"""
+        self.eventos[i] = 0
+        self.n_valores[i] = 0
+        self.inicio[i] = None
+        self.alerta_id[i] = SIN_ALERTA
+        self.primeros.pop(i, None)
+
+    def restaurar(self, i: int, alert_id: int, timestamp_inicio: str,
+                  num_eventos: int, valores: List[float]):
+        self.resetear(i)
+        for valor in valores:
+            self.anadir(i, valor, timestamp_inicio)
+        self.eventos[i] = num_eventos
+        self.inicio[i] = timestamp_inicio
+        self.alerta_id[i] = alert_id
+
+
+class DetectorIncidentesSoA:
+    """
+    DetectorIncidentes con el estado de los paquetes en arrays de NumPy.
+    Misma interfaz y mismos resultados.
+    """
+
+    def __init__(self, capacidad: int = CAPACIDAD_INICIAL,
+                 sensores_deriva: Iterable[str] = SENSORES_DERIVA):
+        self.capacidad_inicial = capacidad
+        self.sensores_deriva = list(sensores_deriva)
+        self.reiniciar(silencioso=True)
+
+    def _indice(self, id_paquete: str) -> int:
+        """Índice denso del paquete (lo crea la primera vez que se ve)"""
+        i = self.indices.get(id_paquete)
+        if i is None:
+            i = len(self.indices)
+            if i == self.capacidad:
+                self.capacidad *= 2
+                self.temperatura.crecer(self.capacidad)
+                self.choque.crecer(self.capacidad)
+                registro = np.zeros((self.capacidad, self.registro_deriva.shape[1]))
+                registro[:i] = self.registro_deriva
+                self.registro_deriva = registro
+            self.indices[id_paquete] = i
+        return i
+
+    def procesar_evento(self, data: dict) -> tuple[Optional[dict], Optional[dict]]:
+        """
+        Procesa un evento de telemetría.
+
+        Returns:
+            (alerta_nueva, alerta_actualizada), como DetectorIncidentes
+        """
+        id_paquete = data['id_paquete']
+        i = self.indices.get(id_paquete)
+        if i is None:
+            i = self._indice(id_paquete)
+        temperatura = self.temperatura
+        choque = self.choque
+        alerta_nueva = None
+        alerta_actualizada = None
+
+        # ==========================================
+        # DETECCIÓN DE TEMPERATURA ALTA
+        # ==========================================
+        if data['temperatura'] > UMBRAL_TEMPERATURA:
+            eventos = temperatura.anadir(i, data['temperatura'], data['timestamp'])
+
+            if eventos == N_EVENTOS_CONSECUTIVOS:
+                valor_max, valor_promedio = temperatura.resumen(i)
+
+                print(f"🔥 ALERTA NUEVA: {id_paquete} - Temperatura alta sostenida")
+                print(f"   └─ Eventos: {eventos}")
+                print(f"   └─ Max: {valor_max:.2f}°C | Promedio: {valor_promedio:.2f}°C")
+
+                alerta_nueva = {
+                    'id_paquete': id_paquete,
+                    'tipo_incidente': 'temperatura_alta',
+                    'timestamp_inicio': temperatura.inicio[i],
+                    'num_eventos': eventos,
+                    'valor_max': valor_max,
+                    'valor_promedio': valor_promedio,
+                    'detalles': json.dumps({
+                        'umbral': UMBRAL_TEMPERATURA,
+                        'valores': temperatura.valores_iniciales(i)
+                    })
+                }
+
+        elif temperatura.eventos[i]:
+            # Las rachas abiertas siempre tienen eventos: si no hay, no hay nada que resetear
+            eventos = int(temperatura.eventos[i])
+            if eventos >= N_EVENTOS_CONSECUTIVOS:
+                valor_max, valor_promedio = temperatura.resumen(i)
+
+                print(f"💚 INCIDENTE TEMPERATURA FINALIZADO: {id_paquete}")
+                print(f"   └─ Duración: {eventos} eventos")
+                print(f"   └─ Max: {valor_max:.2f}°C | Promedio: {valor_promedio:.2f}°C")
+
+                alerta_actualizada = {
+                    'alert_id': temperatura.alerta(i),
+                    'timestamp_fin': data['timestamp'],
+                    'num_eventos_final': eventos,
+                    'valor_max_final': valor_max,
+                    'valor_promedio_final': valor_promedio
+                }
+
+            temperatura.resetear(i)
+
+        # ==========================================
+        # DETECCIÓN DE CHOQUE (fuerza_g + inclinación)
+        # ==========================================
+        if (data['fuerza_g'] > UMBRAL_FUERZA_G
+            and data['inclinacion'] > UMBRAL_INCLINACION):
+
+            eventos = choque.anadir(i, data['fuerza_g'], data['timestamp'])
+
+            if eventos == N_EVENTOS_CONSECUTIVOS and alerta_nueva is None:
+                valor_max, valor_promedio = choque.resumen(i)
+
+                print(f"💥 ALERTA NUEVA: {id_paquete} - Choque detectado")
+                print(f"   └─ Eventos: {eventos}")
+                print(f"   └─ Max: {valor_max:.2f}G | Promedio: {valor_promedio:.2f}G")
+
+                alerta_nueva = {
+                    'id_paquete': id_paquete,
+                    'tipo_incidente': 'choque',
+                    'timestamp_inicio': choque.inicio[i],
+                    'num_eventos': eventos,
+                    'valor_max': valor_max,
+                    'valor_promedio': valor_promedio,
+                    'detalles': json.dumps({
+                        'umbral_fuerza_g': UMBRAL_FUERZA_G,
+                        'umbral_inclinacion': UMBRAL_INCLINACION,
+                        'fuerza_g_actual': data['fuerza_g'],
+                        'inclinacion_actual': data['inclinacion'],
+                        'valores_fuerza_g': choque.valores_iniciales(i)
+                    })
+                }
+
+        elif choque.eventos[i]:
+            eventos = int(choque.eventos[i])
+            if eventos >= N_EVENTOS_CONSECUTIVOS and alerta_actualizada is None:
+                valor_max, valor_promedio = choque.resumen(i)
+
+                print(f"💚 INCIDENTE CHOQUE FINALIZADO: {id_paquete}")
+                print(f"   └─ Duración: {eventos} eventos")
+                print(f"   └─ Max: {valor_max:.2f}G | Promedio: {valor_promedio:.2f}G")
+
+                alerta_actualizada = {
+                    'alert_id': choque.alerta(i),
+                    'timestamp_fin': data['timestamp'],
+                    'num_eventos_final': eventos,
+                    'valor_max_final': valor_max,
+                    'valor_promedio_final': valor_promedio
+                }
+
+            choque.resetear(i)
+
+        # ==========================================
+        # DERIVA DE HUMEDAD, OXÍGENO Y VAPORES
+        # ==========================================
+        if self.sensores_deriva:
+            # Una sola lectura y una sola escritura de la fila del paquete
+            registro = self.registro_deriva[i].tolist()
+            incidentes = self.incidentes_deriva.get(i)
+            if incidentes is None:
+                incidentes = {}
+            alerta_nueva, alerta_actualizada = deriva.procesar(
+                id_paquete, data, self.sensores_deriva, registro,
+                incidentes, alerta_nueva, alerta_actualizada
+            )
+            self.registro_deriva[i] = registro
+            if incidentes:
+                self.incidentes_deriva[i] = incidentes
+            elif i in self.incidentes_deriva:
+                del self.incidentes_deriva[i]
+
+        return alerta_nueva, alerta_actualizada
+
+    def _rachas(self, tipo_incidente: str) -> Optional[Rachas]:
+        if tipo_incidente == 'temperatura_alta':
+            return self.temperatura
+        if tipo_incidente == 'choque':
+            return self.choque
+        return None
+
+    def guardar_id_alerta(self, id_paquete: str, tipo_incidente: str, alert_id: int):
+        """Guardar el ID de una alerta para poder actualizarla después"""
+        i = self.indices.get(id_paquete)
+        rachas = self._rachas(tipo_incidente)
+        if i is not None and rachas is not None:
+            rachas.alerta_id[i] = alert_id
+        elif i is not None:
+            incidente = self.incidentes_deriva.get(i, {}).get(deriva.sensor_de(tipo_incidente))
+            if incidente is not None:
+                incidente.alerta_id = alert_id
+
+    def restaurar_alerta(self, id_paquete: str, tipo_incidente: str, alert_id: int,
+                         timestamp_inicio: str, num_eventos: int, valores: List[float],
+                         linea_base: Optional[dict] = None):
+        """Vuelve a abrir en memoria una alerta abierta en la BD (ver DetectorIncidentes)"""
+        i = self._indice(id_paquete)
+        rachas = self._rachas(tipo_incidente)
+        sensor = deriva.sensor_de(tipo_incidente)
+        if rachas is not None:
+            rachas.restaurar(i, alert_id, timestamp_inicio, num_eventos, valores)
+        elif sensor in self.sensores_deriva:
+            base = self.sensores_deriva.index(sensor) * deriva.CAMPOS_DERIVA
+            deriva.restaurar(self.registro_deriva[i], base, linea_base)
+            self.incidentes_deriva.setdefault(i, {})[sensor] = deriva.incidente_restaurado(
+                alert_id, timestamp_inicio, num_eventos, valores)
+
+    def incidente_abierto(self, id_paquete: str) -> bool:
+        """True si el paquete tiene una racha anómala o una alerta abierta"""
+        i = self.indices.get(id_paquete)
+        if i is None:
+            return False
+        return bool(self.temperatura.eventos[i] or self.choque.eventos[i]
+                    or self.temperatura.alerta_id[i] != SIN_ALERTA
+                    or self.choque.alerta_id[i] != SIN_ALERTA
+                    or i in self.incidentes_deriva)
+
+    def paquetes(self):
+        """Ids de los paquetes con estado"""
+        return self.indices.keys()
+
+    def obtener_estado(self, id_paquete: str) -> Optional[dict]:
+        """Devuelve el estado actual de un paquete (para debugging)"""
+        i = self.indices.get(id_paquete)
+        if i is None:
+            return None
+        return {
+            'eventos_temp_alta': int(self.temperatura.eventos[i]),
+            'eventos_choque': int(self.choque.eventos[i]),
+            'alerta_temp_activa': self.temperatura.alerta(i) is not None,
+            'alerta_choque_activa': self.choque.alerta(i) is not None,
+            'derivas_activas': sorted(self.incidentes_deriva.get(i, ()))
+        }
+
+    def reiniciar(self, silencioso: bool = False):
+        """Reinicia todos los estados (útil para testing)"""
+        self.indices: Dict[str, int] = {}
+        self.capacidad = self.capacidad_inicial
+        self.temperatura = Rachas(self.capacidad)
+        self.choque = Rachas(self.capacidad)
+        self.registro_deriva = np.zeros(
+            (self.capacidad, deriva.CAMPOS_DERIVA * len(self.sensores_deriva)))
+        self.incidentes_deriva: Dict[int, Dict[str, IncidenteDeriva]] = {}
+        if not silencioso:
+            print("🔄 Detector reiniciado")
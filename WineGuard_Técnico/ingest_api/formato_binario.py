@@ -0,0 +1,201 @@
+"""
+Formato binario compacto para la telemetría (simulador → MQTT → API).
+
+Cada mensaje es una trama versionada con uno o varios registros:
+
+    Cabecera  "<2sBHH"   magic b"WG", versión, nº de ids, nº de registros
+    Ids       n_ids x (longitud u8 + id_paquete en UTF-8)
+    Registros n x "<Hq8i" índice del id, timestamp (epoch ms) y los 8 sensores
+
+La versión 2 añade a cada registro la sonda de latencia del simulador
+(seq y t_envio): "<HqQd8i". La versión 3 añade además el id de la
+ejecución del simulador (seq se reinicia en cada ejecución): "<HqQQd8i".
+Las tramas sin sonda se siguen codificando como versión 1 y el
+decodificador acepta las tres.
+
+Los registros tienen tamaño fijo, así que se decodifican con struct.iter_unpack
+sin depender de NumPy. Los sensores viajan como enteros en centésimas
+(la misma precisión de 2 decimales que publica el simulador).
+"""
+import struct
+from datetime import datetime, timedelta, timezone
+
+CONTENT_TYPE = "application/x-wineguard-telemetry"
+MAGIC = b"WG"
+VERSION = 1
+VERSION_SONDA = 2
+VERSION_EJECUCION = 3
+
+SENSORES = (
+    "temperatura", "fuerza_g", "inclinacion", "humedad",
+    "oxigeno", "vapores", "iluminacion", "vibracion"
+)
+
+_CABECERA = struct.Struct("<2sBHH")
+_REGISTRO = struct.Struct("<Hq8i")
+_REGISTRO_SONDA = struct.Struct("<HqQd8i")
+_REGISTRO_EJECUCION = struct.Struct("<HqQQd8i")
+_REGISTROS = {VERSION: _REGISTRO, VERSION_SONDA: _REGISTRO_SONDA, VERSION_EJECUCION: _REGISTRO_EJECUCION}
+_A_CENTESIMAS = (100).__rtruediv__  # c → c / 100
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_UN_MS = timedelta(milliseconds=1)
+
+
+class ErrorFormato(ValueError):
+    """La trama binaria no es válida o su versión no está soportada"""
+
+
+def _iso_a_epoch_ms(timestamp: str) -> int:
+    """'2025-11-06T09:16:12.516943Z' → milisegundos desde epoch (UTC)"""
+    dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _UN_MS
+
+
+def _epoch_ms_a_iso(ms: int) -> str:
+    """Milisegundos desde epoch → ISO 8601 con sufijo Z"""
+    return (_EPOCH_NAIVE + ms * _UN_MS).isoformat(timespec="milliseconds") + "Z"
+
+
+def _trama(ids: list, registros: bytes, n: int, version: int = VERSION) -> bytes:
+    if len(ids) > 0xFFFF or n > 0xFFFF:
+        raise ErrorFormato("Una trama admite como máximo 65535 ids y 65535 registros")
+    partes = [_CABECERA.pack(MAGIC, version, len(ids), n)]
+    for id_paquete in ids:
+        crudo = id_paquete.encode("utf-8")
+        if len(crudo) > 255:
+            raise ErrorFormato(f"id_paquete demasiado largo: {id_paquete[:40]}...")
+        partes.append(bytes([len(crudo)]) + crudo)
+    partes.append(registros)
+    return b"".join(partes)
+
+
+def codificar(registros: list) -> bytes:
+    """
+    Codifica una lista de dicts de telemetría (formato JSON del simulador).
+    Si todas las lecturas llevan sonda (seq y t_envio) se usa la versión 2,
+    o la 3 si además llevan el id de la ejecución.
+    """
+    sonda = bool(registros) and all(data.get("seq") is not None for data in registros)
+    ejecucion = sonda and all(data.get("ejecucion") is not None for data in registros)
+    indices = {}
+    cuerpo = bytearray()
+    for data in registros:
+        indice = indices.setdefault(data["id_paquete"], len(indices))
+        centesimas = (round(data[sensor] * 100) for sensor in SENSORES)
+        if ejecucion:
+            cuerpo += _REGISTRO_EJECUCION.pack(
+                indice, _iso_a_epoch_ms(data["timestamp"]),
+                data["ejecucion"], data["seq"], data["t_envio"], *centesimas
+            )
+        elif sonda:
+            cuerpo += _REGISTRO_SONDA.pack(
+                indice, _iso_a_epoch_ms(data["timestamp"]),
+                data["seq"], data["t_envio"], *centesimas
+            )
+        else:
+            cuerpo += _REGISTRO.pack(indice, _iso_a_epoch_ms(data["timestamp"]), *centesimas)
+    version = VERSION_EJECUCION if ejecucion else VERSION_SONDA if sonda else VERSION
+    return _trama(list(indices), bytes(cuerpo), len(registros), version)
+
+
+def codificar_lote(lote: dict) -> bytes:
+    """
+    Codifica un lote de generador_lote.generar_lote() directamente desde
+    sus columnas NumPy (una trama con un registro por paquete).
+    Si el lote lleva las columnas 'seq' y 't_envio' se usa la versión 2,
+    o la 3 si además lleva 'ejecucion'.
+    """
+    import numpy as np
+
+    sonda = "seq" in lote
+    ejecucion = sonda and "ejecucion" in lote
+    ids, indices = np.unique(lote["id_paquete"], return_inverse=True)
+    n = len(indices)
+    campos = [("indice", "<u2"), ("timestamp", "<i8")]
+    if ejecucion:
+        campos.append(("ejecucion", "<u8"))
+    if sonda:
+        campos += [("seq", "<u8"), ("t_envio", "<f8")]
+    tipo = np.dtype(campos + [(s, "<i4") for s in SENSORES])
+    filas = np.empty(n, dtype=tipo)
+    filas["indice"] = indices
+    filas["timestamp"] = lote["timestamp"].astype("datetime64[ms]").astype(np.int64)
+    if ejecucion:
+        filas["ejecucion"] = lote["ejecucion"]
+    if sonda:
+        filas["seq"] = lote["seq"]
+        filas["t_envio"] = lote["t_envio"]
+    for sensor in SENSORES:
+        filas[sensor] = np.rint(lote[sensor] * 100)
+    version = VERSION_EJECUCION if ejecucion else VERSION_SONDA if sonda else VERSION
+    return _trama(ids.tolist(), filas.tobytes(), n, version)
+
+
+def _leer_cabecera(trama: bytes):
+    """Versión, nº de registros, ids y posición del primer registro"""
+    if len(trama) < _CABECERA.size:
+        raise ErrorFormato("Trama demasiado corta")
+    magic, version, n_ids, n = _CABECERA.unpack_from(trama)
+    if magic != MAGIC:
+        raise ErrorFormato("La trama no empieza por el identificador WG")
+    if version not in _REGISTROS:
+        raise ErrorFormato(f"Versión de trama no soportada: {version}")
+
+    vista = memoryview(trama)
+    pos = _CABECERA.size
+    ids = []
+    try:
+        for _ in range(n_ids):
+            longitud = trama[pos]
+            ids.append(bytes(vista[pos + 1:pos + 1 + longitud]).decode("utf-8"))
+            pos += 1 + longitud
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ErrorFormato(f"Tabla de ids corrupta: {e}") from e
+    return version, n, ids, pos
+
+
+def leer_ids(trama: bytes) -> list:
+    """
+    Solo los id_paquete de la trama (cabecera y tabla de ids, sin
+    decodificar los registros): basta para decidir la prioridad de la
+    petición en el control de admisión
+    """
+    return _leer_cabecera(trama)[2]
+
+
+def decodificar(trama: bytes) -> list:
+    """Decodifica una trama y devuelve una lista de dicts con el formato JSON"""
+    version, n, ids, pos = _leer_cabecera(trama)
+    registro = _REGISTROS[version]
+    n_ids = len(ids)
+    vista = memoryview(trama)
+
+    if len(trama) - pos != n * registro.size:
+        raise ErrorFormato("El tamaño de la trama no coincide con el nº de registros")
+
+    # Las lecturas de un mismo evento comparten timestamp: se convierte una vez
+    timestamps = {}
+    resultado = []
+    for indice, ms, *valores in registro.iter_unpack(vista[pos:]):
+        if indice >= n_ids:
+            raise ErrorFormato(f"Índice de id fuera de rango: {indice}")
+        timestamp = timestamps.get(ms)
+        if timestamp is None:
+            timestamp = timestamps[ms] = _epoch_ms_a_iso(ms)
+        if version == VERSION_EJECUCION:
+            ejecucion, seq, t_envio, *valores = valores
+        elif version == VERSION_SONDA:
+            seq, t_envio, *valores = valores
+        data = dict(zip(SENSORES, map(_A_CENTESIMAS, valores)))
+        data["id_paquete"] = ids[indice]
+        data["timestamp"] = timestamp
+        if version == VERSION_EJECUCION:
+            data["ejecucion"] = ejecucion
+        if version != VERSION:
+            data["seq"] = seq
+            data["t_envio"] = t_envio
+        resultado.append(data)
+    return resultado
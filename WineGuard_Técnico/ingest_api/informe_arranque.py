@@ -0,0 +1,110 @@
+# ingest_api/informe_arranque.py
+"""
+Informe de arranque en frío de la API: lo que paga cada proceso nuevo
+(worker o instancia del autoescalado) antes de servir la primera petición.
+
+1. Tiempo de importación de main.py y de cada módulo que importa
+   directamente (python -X importtime en un proceso limpio).
+2. Tiempo hasta la primera petición: desde que se lanza el proceso hasta
+   que GET /health responde, con el lifespan (pool y detector) incluido.
+
+El esquema tiene que existir antes (python bootstrap.py).
+
+Uso (desde ingest_api/):
+    python informe_arranque.py [--repeticiones 5]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+DIRECTORIO_API = os.path.dirname(os.path.abspath(__file__))
+
+# Proceso hijo: importa la API, ejecuta el lifespan y hace la primera petición
+_PRIMERA_PETICION = """
+import json, time
+t0 = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as cliente:
+    respuesta = cliente.get("/health")
+    t1 = time.perf_counter()
+print(json.dumps({"hijo_ms": (t1 - t0) * 1000, "arranque": respuesta.json()["arranque"]}))
+"""
+
+_LINEA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def tiempos_importacion():
+    """
+    Importa main en un proceso limpio con -X importtime.
+
+    Returns:
+        (µs acumulados de main, [(módulo, µs acumulados)] de sus importaciones directas)
+    """
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=DIRECTORIO_API, capture_output=True, text=True, check=True
+    ).stderr
+    # Cada módulo aparece después de los que importa, con un nivel más de sangría
+    lineas = [
+        (len(m.group(3)), m.group(4), int(m.group(2)))
+        for m in map(_LINEA_IMPORTTIME.match, salida.splitlines()) if m
+    ]
+    indice_main = next(i for i, (_, modulo, _) in enumerate(lineas) if modulo == "main")
+    nivel_main = lineas[indice_main][0]
+    directos = []
+    for nivel, modulo, acumulado in reversed(lineas[:indice_main]):
+        if nivel <= nivel_main:
+            break
+        if nivel == nivel_main + 2:
+            directos.append((modulo, acumulado))
+    return lineas[indice_main][2], sorted(directos, key=lambda d: -d[1])
+
+
+def primera_peticion():
+    """Lanza un proceso nuevo y mide hasta que responde GET /health"""
+    inicio = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, "-c", _PRIMERA_PETICION],
+        cwd=DIRECTORIO_API, capture_output=True, text=True, check=True
+    ).stdout
+    total_ms = (time.perf_counter() - inicio) * 1000
+    resultado = json.loads(salida.strip().splitlines()[-1])
+    resultado["total_ms"] = total_ms
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Informe de arranque en frío de la API")
+    parser.add_argument("--repeticiones", type=int, default=5,
+                        help="Arranques que se miden (se muestra la mediana)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🚀 ARRANQUE EN FRÍO DE LA API DE INGESTA")
+    print("=" * 60)
+
+    main_us, directos = tiempos_importacion()
+    print(f"\n📦 Importación de main: {main_us / 1000:.0f} ms")
+    for modulo, acumulado in directos:
+        if acumulado >= 1000:
+            print(f"   └─ {modulo:<24} {acumulado / 1000:8.1f} ms")
+
+    arranques = sorted((primera_peticion() for _ in range(args.repeticiones)),
+                       key=lambda r: r["total_ms"])
+    mediana = arranques[len(arranques) // 2]
+    arranque = mediana["arranque"]
+    print(f"\n⏱️  Hasta la primera petición (mediana de {args.repeticiones}): {mediana['total_ms']:.0f} ms")
+    filas = [
+        ("Intérprete y arranque del proceso", mediana["total_ms"] - mediana["hijo_ms"]),
+        ("Importación de main", arranque["importacion_ms"]),
+        (f"Pool ({arranque['conexiones']} conexiones)", arranque["pool_ms"]),
+        (f"Detector ({arranque['alertas_abiertas']} alertas abiertas)", arranque["detector_ms"]),
+        ("Cliente de prueba y GET /health", mediana["hijo_ms"] - arranque["total_ms"]),
+    ]
+    for etiqueta, ms in filas:
+        print(f"   └─ {etiqueta:<36} {ms:8.0f} ms")
@@ -1,27 +1,146 @@
 # ingest_api/main.py
-from fastapi import FastAPI, HTTPException, Depends, status
+import time
+_T_INICIO = time.perf_counter()  # Para el informe de arranque
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from dotenv import load_dotenv
-from typing import List
+from typing import List, Literal, Optional, Union
+from datetime import datetime
+import json
+import os
 
 # Importar nuestros módulos
-from database import engine, get_db
-from models import Telemetry, Alert
+from database import engine, read_engine, get_db, get_db_lectura, SessionLocal
+from models import Telemetry, Alert, LatencyProbe
 from schemas import TelemetryCreate, AlertResponse
 from detector import detector
+import agregados
+import formato_binario
+from cache import CacheTTL
+from admision import ControlAdmision
+from paquetes import DiccionarioPaquetes
+
+# El esquema (tablas, índices, vista de KPIs) lo crea bootstrap.py: importar
+# este módulo no toca la base de datos. Las variables de entorno las carga
+# database.py.
+
+# Series de KPIs ya calculadas (GET /kpis); el TTL es el desfase máximo
+cache_kpis = CacheTTL(ttl=float(os.getenv("KPIS_CACHE_TTL", "30")))
+
+# Respuestas ya serializadas de GET /alerts/{id_paquete}, por paquete.
+# /ingest invalida la entrada del paquete al crear o cerrar una alerta; el
+# TTL solo acota el desfase con lo que escriban otros procesos de la API
+cache_alertas = CacheTTL(
+    ttl=float(os.getenv("ALERTAS_CACHE_TTL", "10")),
+    max_entradas=int(os.getenv("ALERTAS_CACHE_MAX", "1024"))
+)
+
+# id_paquete → clave entera de packages (ver paquetes.py): solo el primer
+# uso de cada paquete en el proceso consulta la base de datos
+diccionario_paquetes = DiccionarioPaquetes(
+    max_entradas=int(os.getenv("PAQUETES_CACHE_MAX", "1000000"))
+)
+
+# Admisión de /ingest (ver admision.py): peticiones en curso como mucho,
+# plazas reservadas a paquetes con incidente abierto y segundos de Retry-After
+control_ingesta = ControlAdmision(
+    max_en_curso=int(os.getenv("INGEST_MAX_EN_CURSO", "10")),
+    reserva_prioritaria=int(os.getenv("INGEST_RESERVA_PRIORITARIA", "2")),
+    retry_after=int(os.getenv("INGEST_RETRY_AFTER", "1"))
+)
+
+# Conexiones que se abren al arrancar (por defecto, las del pool)
+CONEXIONES_PRECALENTADAS = os.getenv("INGEST_CONEXIONES_PRECALENTADAS")
+
+_T_IMPORTADO = time.perf_counter()
+
+
+# ==============================================
+# ARRANQUE
+# ==============================================
 
-# Cargar variables de entorno
-load_dotenv()
+def precalentar_pool(motor, conexiones: Optional[int] = None) -> int:
+    """Abre `conexiones` conexiones del pool a la vez y las devuelve al pool"""
+    if conexiones is None:
+        conexiones = motor.pool.size() if hasattr(motor.pool, "size") else 1
+    abiertas = []
+    try:
+        for _ in range(conexiones):
+            conexion = motor.connect()
+            abiertas.append(conexion)
+            conexion.exec_driver_sql("SELECT 1")
+    finally:
+        for conexion in abiertas:
+            conexion.close()
+    return len(abiertas)
+
+
+def restaurar_detector(db: Session) -> int:
+    """
+    Recupera en el detector las alertas abiertas (sin timestamp_fin) de la
+    BD, la más reciente por paquete y tipo. Devuelve cuántas ha recuperado.
+    """
+    abiertas = {}
+    for alerta in db.query(Alert).filter(Alert.timestamp_fin.is_(None)).order_by(Alert.id):
+        abiertas[(alerta.id_paquete, alerta.tipo_incidente)] = alerta
+    for alerta in abiertas.values():
+        detalles = json.loads(alerta.detalles) if alerta.detalles else {}
+        valores = detalles.get("valores") or detalles.get("valores_fuerza_g") or [alerta.valor_max]
+        detector.restaurar_alerta(
+            alerta.id_paquete, alerta.tipo_incidente, alerta.id,
+            alerta.timestamp_inicio, alerta.num_eventos, valores,
+            detalles.get("linea_base")
+        )
+    return len(abiertas)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque de cada proceso: abre las conexiones del pool (escritura y
+    lectura) y recupera el estado del detector, antes de aceptar peticiones.
+    Los tiempos quedan en app.state.arranque (y en /health).
+    """
+    inicio = time.perf_counter()
+    conexiones = int(CONEXIONES_PRECALENTADAS) if CONEXIONES_PRECALENTADAS else None
+    n_conexiones = precalentar_pool(engine, conexiones)
+    if read_engine is not engine:
+        n_conexiones += precalentar_pool(read_engine, conexiones)
+    t_pool = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        n_alertas = restaurar_detector(db)
+    finally:
+        db.close()
+    t_detector = time.perf_counter()
+
+    app.state.arranque = {
+        "importacion_ms": round((_T_IMPORTADO - _T_INICIO) * 1000, 1),
+        "pool_ms": round((t_pool - inicio) * 1000, 1),
+        "conexiones": n_conexiones,
+        "detector_ms": round((t_detector - t_pool) * 1000, 1),
+        "alertas_abiertas": n_alertas,
+        "total_ms": round((t_detector - _T_INICIO) * 1000, 1),
+    }
+    print("🚀 API lista en {total_ms} ms: importación {importacion_ms} ms | "
+          "pool {pool_ms} ms ({conexiones} conexiones) | "
+          "detector {detector_ms} ms ({alertas_abiertas} alertas abiertas)".format(**app.state.arranque))
+    yield
 
-# Crear tablas en la base de datos si no existen
-Telemetry.metadata.create_all(bind=engine)
-Alert.metadata.create_all(bind=engine)
 
 # Crear la aplicación FastAPI
 app = FastAPI(
     title="GreenDelivery - API de Ingesta",
     description="API para ingestar telemetría y detectar incidentes",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 
@@ -30,34 +149,253 @@ app = FastAPI(
 # ==============================================
 
 @app.get("/health")
-def health_check():
+def health_check(request: Request):
     """
-    Verificar que la API está funcionando
+    Verificar que la API está funcionando (incluye los tiempos de arranque)
     """
     return {
         "status": "ok",
         "service": "GreenDelivery Ingest API",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "arranque": getattr(request.app.state, "arranque", None)
     }
 
 
-@app.post("/ingest", status_code=status.HTTP_201_CREATED)
-def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
+def tipo_contenido(request: Request) -> str:
+    """Content-Type de la petición sin parámetros (por defecto, JSON)"""
+    content_type = request.headers.get("content-type", "application/json")
+    return content_type.split(";")[0].strip().lower()
+
+
+def decodificar_cuerpo(content_type: str, cuerpo: bytes) -> list:
+    """
+    Decodifica el cuerpo de /ingest según su Content-Type, sin validar:
+    - application/json: un objeto de telemetría (o una lista de objetos)
+    - application/x-wineguard-telemetry: trama binaria (ver formato_binario.py)
+    """
+    try:
+        if content_type == formato_binario.CONTENT_TYPE:
+            registros = formato_binario.decodificar(cuerpo)
+        elif content_type in ("application/json", ""):
+            registros = json.loads(cuerpo)
+            if isinstance(registros, dict):
+                registros = [registros]
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Content-Type no soportado: {content_type}"
+            )
+        if not isinstance(registros, list):
+            raise TypeError("se esperaba un objeto o una lista de objetos")
+    except (ValueError, TypeError) as e:
+        # ValueError cubre ErrorFormato, JSONDecodeError y UnicodeDecodeError
+        raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {str(e)}")
+    return registros
+
+
+async def leer_ids_paquete(request: Request):
+    """
+    Los id_paquete del cuerpo, para decidir la prioridad de la petición.
+    De una trama binaria solo se lee la tabla de ids; un JSON hay que
+    decodificarlo entero, así que se devuelven también los registros para
+    no hacerlo dos veces.
+
+    Returns:
+        (ids, registros decodificados o None)
+    """
+    content_type = tipo_contenido(request)
+    cuerpo = await request.body()
+    if content_type == formato_binario.CONTENT_TYPE:
+        try:
+            return formato_binario.leer_ids(cuerpo), None
+        except formato_binario.ErrorFormato as e:
+            raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {str(e)}")
+    registros = decodificar_cuerpo(content_type, cuerpo)
+    ids = [data.get("id_paquete") for data in registros if isinstance(data, dict)]
+    return [id_paquete for id_paquete in ids if isinstance(id_paquete, str)], registros
+
+
+async def admitir_ingesta(request: Request):
+    """
+    Control de admisión de /ingest: se decide en el bucle de eventos, antes
+    de que la petición espere turno en el thread pool o en el pool de
+    conexiones, y antes de decodificar y validar el cuerpo (rechazar tiene
+    que salir barato). Primero se intenta con las plazas normales; si no
+    queda ninguna y hay plazas reservadas, se leen solo los id_paquete del
+    cuerpo: las lecturas de paquetes con un incidente abierto pueden usar
+    las reservadas. Sin plaza responde 503 con Retry-After. La plaza se
+    libera al terminar la petición.
+    
+    Guarda en request.state.t_recepcion la hora de llegada (sonda de latencia)
+    y devuelve los registros si ya se decodificaron (si no, None).
+    """
+    request.state.t_recepcion = time.time()
+    registros = None
+    admitida = control_ingesta.admitir(contar_rechazo=False)
+    if not admitida:
+        prioritaria = False
+        if control_ingesta.reserva_prioritaria:
+            ids, registros = await leer_ids_paquete(request)
+            prioritaria = any(detector.incidente_abierto(id_paquete) for id_paquete in ids)
+        admitida = control_ingesta.admitir(prioritaria)
+    if not admitida:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="API saturada, reintentar más tarde",
+            headers={"Retry-After": str(control_ingesta.retry_after)}
+        )
+    try:
+        yield registros
+    finally:
+        control_ingesta.liberar()
+
+
+async def leer_telemetria(
+    request: Request,
+    registros: Optional[list] = Depends(admitir_ingesta)
+) -> List[Union[TelemetryCreate, dict]]:
+    """
+    Lee el cuerpo de /ingest ya admitido (ver decodificar_cuerpo) y valida
+    cada lectura por separado (ver validar_registros).
+    """
+    if registros is None:
+        registros = decodificar_cuerpo(tipo_contenido(request), await request.body())
+    return validar_registros(registros)
+
+
+def validar_registros(registros: list) -> List[Union[TelemetryCreate, dict]]:
+    """
+    Valida cada lectura por separado. Una lectura sola que no es válida
+    responde 422; en un lote, cada lectura inválida se sustituye por su
+    resultado de error (ver error_lectura) y las demás se ingieren.
+    """
+    if len(registros) == 1:
+        try:
+            return [TelemetryCreate.model_validate(registros[0])]
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    lecturas = []
+    for indice, data in enumerate(registros):
+        try:
+            lecturas.append(TelemetryCreate.model_validate(data))
+        except ValidationError as e:
+            campos = data if isinstance(data, dict) else {}
+            lecturas.append(error_lectura(
+                indice, campos.get("id_paquete"), campos.get("timestamp"),
+                jsonable_encoder(e.errors(include_url=False))
+            ))
+    return lecturas
+
+
+def error_lectura(indice: int, id_paquete, timestamp, detail) -> dict:
+    """Resultado de una lectura del lote que no se ha podido ingerir"""
+    return {
+        "status": "error",
+        "indice": indice,
+        "id_paquete": id_paquete,
+        "timestamp": timestamp,
+        "detail": detail
+    }
+
+
+_ESQUEMA_TELEMETRIA = TelemetryCreate.model_json_schema()
+
+
+@app.post(
+    "/ingest",
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        207: {"description": "Lote con alguna lectura fallida (ver 'resultados')"},
+        503: {"description": "API saturada (ver cabecera Retry-After)"}
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"anyOf": [
+                    _ESQUEMA_TELEMETRIA,
+                    {"type": "array", "items": _ESQUEMA_TELEMETRIA}
+                ]}},
+                formato_binario.CONTENT_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                }
+            }
+        }
+    }
+)
+def ingest_data(
+    request: Request,
+    response: Response,
+    registros: List[Union[TelemetryCreate, dict]] = Depends(leer_telemetria),
+    db: Session = Depends(get_db)
+):
     """
     Endpoint principal: recibe telemetría, detecta incidentes y guarda todo.
     
+    Acepta JSON o tramas binarias (varias lecturas por petición).
+    Con una sola lectura devuelve su resultado; con varias, la lista de resultados.
+    Si la API está saturada devuelve 503 con Retry-After (ver admitir_ingesta).
+    
+    Cada lectura se guarda en sus propias transacciones (el detector avanza
+    lectura a lectura y no se puede deshacer): si una del lote falla, las
+    demás quedan guardadas. Lo mismo con las lecturas que no pasan la
+    validación: las válidas se ingieren. En ese caso se responde 207 con el
+    estado de cada una ('error' y su posición en 'indice'), para reintentar
+    solo las fallidas; un 500 (o un 422 de todo el lote) haría que el
+    cliente reenviara (y duplicara) todo el lote.
+    """
+    t_recepcion = request.state.t_recepcion
+    if len(registros) == 1:
+        return procesar_telemetria(registros[0], db, t_recepcion)
+
+    resultados = []
+    for indice, data in enumerate(registros):
+        if not isinstance(data, TelemetryCreate):  # No pasó la validación
+            resultados.append(data)
+            continue
+        try:
+            resultados.append(procesar_telemetria(data, db, t_recepcion))
+        except HTTPException as e:
+            resultados.append(error_lectura(indice, data.id_paquete, data.timestamp, e.detail))
+    errores = sum(1 for resultado in resultados if resultado["status"] == "error")
+    if errores:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return {
+        "status": "parcial" if errores else "success",
+        "registros": len(resultados),
+        "errores": errores,
+        "resultados": resultados
+    }
+
+
+def procesar_telemetria(
+    data: TelemetryCreate,
+    db: Session,
+    t_recepcion: Optional[float] = None
+) -> dict:
+    """
+    Procesa una lectura: detecta incidentes y guarda todo.
+    
     Flujo:
     1. Validar datos (automático con Pydantic)
     2. Detectar si hay incidente
     3. Guardar telemetría en BD
     4. Si hay alerta, guardar alerta en BD
+    5. Si la lectura trae sonda (seq/t_envio), guardar sus tiempos
+    
+    Los agregados (package_summary, alert_detection y kpi_buckets) se
+    actualizan en la misma transacción que la telemetría y la alerta.
+    Telemetría y alertas guardan la clave entera del paquete (packages.id),
+    que sale de diccionario_paquetes.
     """
     try:
         # ==========================================
         # PASO 1: Guardar telemetría
         # ==========================================
+        paquete_id = diccionario_paquetes.resolver(db, data.id_paquete)
         db_telemetry = Telemetry(
-            id_paquete=data.id_paquete,
+            paquete_id=paquete_id,
             timestamp=data.timestamp,
             temperatura=data.temperatura,
             fuerza_g=data.fuerza_g,
@@ -69,7 +407,9 @@ def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
             vibracion=data.vibracion
         )
         db.add(db_telemetry)
+        agregados.registrar_lectura(db, data.id_paquete, data.timestamp)
         db.commit()
+        t_commit = time.time()
         db.refresh(db_telemetry)
         
         # ==========================================
@@ -79,11 +419,12 @@ def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
         
         alerta_id = None
         alerta_actualizada_id = None
+        t_alerta = None
         
         # Si hay una NUEVA alerta
         if alerta_nueva:
             db_alert = Alert(
-                id_paquete=alerta_nueva['id_paquete'],
+                paquete_id=paquete_id,
                 tipo_incidente=alerta_nueva['tipo_incidente'],
                 timestamp_inicio=alerta_nueva['timestamp_inicio'],
                 num_eventos=alerta_nueva['num_eventos'],
@@ -92,7 +433,11 @@ def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
                 detalles=alerta_nueva.get('detalles')
             )
             db.add(db_alert)
+            db.flush()
+            agregados.registrar_alerta(db, db_alert, data.id_paquete)
             db.commit()
+            t_alerta = time.time()
+            cache_alertas.invalidar(data.id_paquete)
             db.refresh(db_alert)
             alerta_id = db_alert.id
             
@@ -117,12 +462,31 @@ def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
                 alert_to_update.valor_max = alerta_actualizada['valor_max_final']
                 alert_to_update.valor_promedio = alerta_actualizada['valor_promedio_final']
                 db.commit()
+                cache_alertas.invalidar(data.id_paquete)
                 alerta_actualizada_id = alert_to_update.id
                 
                 print(f"✅ Alerta actualizada: ID={alerta_actualizada_id}, fin={alerta_actualizada['timestamp_fin']}")
         
         # ==========================================
-        # PASO 3: Devolver respuesta
+        # PASO 3: Sonda de latencia
+        # ==========================================
+        if data.seq is not None and data.t_envio is not None:
+            db.add(LatencyProbe(
+                ejecucion=data.ejecucion,
+                seq=data.seq,
+                id_paquete=data.id_paquete,
+                timestamp=data.timestamp,
+                telemetry_id=db_telemetry.id,
+                alert_id=alerta_id,
+                t_envio=data.t_envio,
+                t_recepcion=t_recepcion,
+                t_commit=t_commit,
+                t_alerta=t_alerta
+            ))
+            db.commit()
+        
+        # ==========================================
+        # PASO 4: Devolver respuesta
         # ==========================================
         response = {
             "status": "success",
@@ -155,7 +519,7 @@ def ingest_data(data: TelemetryCreate, db: Session = Depends(get_db)):
 def get_alerts(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """
     Obtener todas las alertas registradas
@@ -163,6 +527,7 @@ def get_alerts(
     Parámetros:
     - skip: número de alertas a saltar (para paginación)
     - limit: número máximo de alertas a devolver
+    - primaria: leer de la primaria en vez de la réplica (ver get_db_lectura)
     """
     alerts = db.query(Alert)\
         .order_by(Alert.created_at.desc())\
@@ -174,31 +539,50 @@ def get_alerts(
 
 
 @app.get("/alerts/{id_paquete}")
-def get_alerts_by_package(id_paquete: str, db: Session = Depends(get_db)):
+def get_alerts_by_package(
+    id_paquete: str,
+    sin_cache: bool = False,
+    db: Session = Depends(get_db)
+):
     """
     Obtener todas las alertas de un paquete específico
+    
+    La respuesta se cachea ya serializada por paquete (cache_alertas), y
+    /ingest invalida la entrada al crear o cerrar una alerta del paquete.
+    Los fallos de caché leen de la primaria: una réplica atrasada dejaría
+    en caché alertas viejas hasta que caducasen.
+    
+    Parámetros:
+    - sin_cache: consultar la base de datos aunque haya entrada en caché
     """
+    if sin_cache:
+        cuerpo = consultar_alertas_paquete(db, id_paquete)
+    else:
+        cuerpo = cache_alertas.obtener(
+            id_paquete, lambda: consultar_alertas_paquete(db, id_paquete)
+        )
+    return Response(content=cuerpo, media_type="application/json")
+
+
+def consultar_alertas_paquete(db: Session, id_paquete: str) -> bytes:
+    """Alertas de un paquete (más recientes primero) serializadas en JSON"""
+    paquete_id = diccionario_paquetes.buscar(db, id_paquete)
     alerts = db.query(Alert)\
-        .filter(Alert.id_paquete == id_paquete)\
+        .filter(Alert.paquete_id == paquete_id)\
         .order_by(Alert.created_at.desc())\
-        .all()
-    
-    if not alerts:
-        return {
-            "id_paquete": id_paquete,
-            "total_alertas": 0,
-            "alertas": []
-        }
+        .all() if paquete_id is not None else []
     
-    return {
+    # paquete_id es la clave interna de packages: la respuesta sigue
+    # hablando solo en id_paquete
+    return JSONResponse(jsonable_encoder({
         "id_paquete": id_paquete,
         "total_alertas": len(alerts),
-        "alertas": alerts
-    }
+        "alertas": jsonable_encoder(alerts, exclude={"paquete_id"})
+    })).body
 
 
 @app.get("/stats")
-def get_statistics(db: Session = Depends(get_db)):
+def get_statistics(db: Session = Depends(get_db_lectura)):
     """
     Obtener estadísticas generales del sistema
     """
@@ -208,20 +592,68 @@ def get_statistics(db: Session = Depends(get_db)):
     # Contar alertas por tipo
     alerts_by_type = db.query(
         Alert.tipo_incidente,
-        db.func.count(Alert.id)
+        func.count(Alert.id)
     ).group_by(Alert.tipo_incidente).all()
     
     return {
         "total_eventos_telemetria": total_telemetry,
         "total_alertas": total_alerts,
         "alertas_por_tipo": {tipo: count for tipo, count in alerts_by_type},
+        "admision_ingesta": control_ingesta.estado(),
+        "caches": {
+            "alertas_paquete": cache_alertas.metricas(),
+            "kpis": cache_kpis.metricas(),
+            "paquetes": diccionario_paquetes.metricas()
+        },
         "estado_detector": {
             paquete_id: detector.obtener_estado(paquete_id)
-            for paquete_id in detector.estados.keys()
+            for paquete_id in detector.paquetes()
         }
     }
 
 
+@app.get("/kpis")
+def get_kpis(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    granularidad: Literal["hora", "dia"] = Query("hora"),
+    sin_cache: bool = False,
+    db: Session = Depends(get_db_lectura)
+):
+    """
+    Serie de KPIs (SLA %, MTTD, tasa de alertas) por hora o por día.
+    
+    Sale de kpi_buckets (agregados por hora y paquete), nunca de telemetry,
+    y se cachea en memoria unos segundos (KPIS_CACHE_TTL).
+    
+    Parámetros:
+    - desde, hasta: rango [desde, hasta) en ISO 8601 (UTC si no lleva zona).
+      Por defecto, las últimas 24 horas (por hora) o 30 días (por día)
+    - granularidad: 'hora' o 'dia'
+    - primaria: leer de la primaria en vez de la réplica (ver get_db_lectura)
+    - sin_cache: consultar kpi_buckets aunque haya entrada en caché (para
+      ver al momento lo recién escrito, junto con primaria)
+    """
+    # Periodos completos: la clave de caché no cambia en cada petición
+    desde, hasta = agregados.rango_periodos(desde, hasta, granularidad)
+    if desde >= hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+    
+    if sin_cache:
+        serie = agregados.serie_kpis(db, desde, hasta, granularidad)
+    else:
+        serie = cache_kpis.obtener(
+            (desde, hasta, granularidad),
+            lambda: agregados.serie_kpis(db, desde, hasta, granularidad)
+        )
+    return {
+        "granularidad": granularidad,
+        "desde": desde.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "hasta": hasta.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "serie": serie
+    }
+
+
 @app.post("/detector/reset")
 def reset_detector():
     """
@@ -243,6 +675,7 @@ def root():
             "alerts": "GET /alerts",
             "alerts_by_package": "GET /alerts/{id_paquete}",
             "stats": "GET /stats",
+            "kpis": "GET /kpis?desde=&hasta=&granularidad=hora|dia",
             "reset_detector": "POST /detector/reset"
         }
     }
\ No newline at end of file
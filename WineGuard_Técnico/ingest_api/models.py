@@ -1,14 +1,28 @@
 # ingest_api/models.py
-from sqlalchemy import Column, Integer, Float, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, Index, ForeignKey, select
+from sqlalchemy.orm import column_property
 from datetime import datetime
 from database import Base
 
+class Package(Base):
+    """Dimensión de paquetes - cada id_paquete se guarda una sola vez (ver paquetes.py)"""
+    __tablename__ = "packages"
+
+    id = Column(Integer, primary_key=True)
+    id_paquete = Column(String, unique=True, nullable=False)
+
+
 class Telemetry(Base):
     """Tabla de telemetría - guarda todos los eventos de los sensores"""
     __tablename__ = "telemetry"
+    __table_args__ = (
+        # Lecturas de un paquete por orden temporal (inicio de rachas, MTTD);
+        # también sirve para buscar solo por paquete
+        Index("ix_telemetry_paquete_timestamp", "paquete_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    id_paquete = Column(String, index=True)
+    paquete_id = Column(Integer, ForeignKey("packages.id"), nullable=False)  # packages.id
     timestamp = Column(String)  # ISO 8601
     temperatura = Column(Float)
     fuerza_g = Column(Float)
@@ -25,12 +39,70 @@ class Alert(Base):
     __tablename__ = "alerts"
 
     id = Column(Integer, primary_key=True, index=True)
-    id_paquete = Column(String, index=True)
-    tipo_incidente = Column(String)  # 'temperatura_alta', 'choque', etc.
+    paquete_id = Column(Integer, ForeignKey("packages.id"), nullable=False, index=True)  # packages.id
+    # id_paquete (texto) de solo lectura: sale de packages en la misma consulta
+    id_paquete = column_property(
+        select(Package.id_paquete).where(Package.id == paquete_id).scalar_subquery()
+    )
+    tipo_incidente = Column(String)  # 'temperatura_alta', 'choque', 'deriva_oxigeno', etc.
     timestamp_inicio = Column(String)  # Cuándo empezó el problema
     timestamp_fin = Column(String, nullable=True)  # Cuándo terminó
     num_eventos = Column(Integer)  # TOTAL de eventos del incidente
     valor_max = Column(Float)  # Valor máximo registrado
     valor_promedio = Column(Float, nullable=True)  # Valor promedio del incidente
     detalles = Column(String, nullable=True)  # Info adicional (JSON string)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LatencyProbe(Base):
+    """Tabla de sondas de latencia - tiempos de cada lectura con seq/t_envio"""
+    __tablename__ = "latency_probes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ejecucion = Column(BigInteger, nullable=True)  # Ejecución del simulador (seq se reinicia en cada una)
+    seq = Column(BigInteger, index=True)
+    id_paquete = Column(String, index=True)
+    timestamp = Column(String)  # Timestamp de la lectura (ISO 8601)
+    telemetry_id = Column(Integer)
+    alert_id = Column(Integer, nullable=True)  # Alerta creada por esta lectura
+    # Tiempos en epoch (segundos): publicación, recepción en la API,
+    # commit de la telemetría y commit de la alerta (si la hubo)
+    t_envio = Column(Float)
+    t_recepcion = Column(Float)
+    t_commit = Column(Float)
+    t_alerta = Column(Float, nullable=True)
+
+class PackageSummary(Base):
+    """Resumen por paquete - se mantiene en la ingesta (ver agregados.py)"""
+    __tablename__ = "package_summary"
+
+    id_paquete = Column(String, primary_key=True)
+    num_eventos = Column(BigInteger, default=0)  # Lecturas de telemetría (> 0: tiene telemetría)
+    num_alertas = Column(Integer, default=0)  # Alertas creadas para el paquete
+    primer_timestamp = Column(String, nullable=True)  # Primera lectura (ISO 8601)
+    ultimo_timestamp = Column(String, nullable=True)  # Última lectura (ISO 8601)
+    actualizado_en = Column(DateTime, default=datetime.utcnow)
+
+
+class AlertDetection(Base):
+    """Latencia de detección de cada alerta - se rellena en la ingesta (ver agregados.py)"""
+    __tablename__ = "alert_detection"
+
+    alert_id = Column(Integer, primary_key=True)
+    id_paquete = Column(String)
+    tipo_incidente = Column(String, index=True)
+    inicio_racha = Column(String)  # Primera lectura por encima del umbral de la racha (ISO 8601)
+    created_at = Column(DateTime)  # Cuándo se guardó la alerta
+    segundos_deteccion = Column(Float)  # created_at - inicio_racha
+
+
+class KpiBucket(Base):
+    """KPIs por hora y paquete - se mantienen en la ingesta (ver agregados.py)"""
+    __tablename__ = "kpi_buckets"
+
+    hora = Column(DateTime, primary_key=True)  # Inicio de la hora (UTC)
+    id_paquete = Column(String, primary_key=True)
+    num_lecturas = Column(BigInteger, default=0)  # Lecturas con timestamp en esa hora
+    num_alertas = Column(Integer, default=0)  # Alertas con timestamp_inicio en esa hora
+    num_detecciones = Column(Integer, default=0)  # Alertas con latencia de detección
+    suma_deteccion = Column(Float, default=0.0)  # Suma de segundos de detección
@@ -0,0 +1,208 @@
+# ingest_api/paquetes.py
+"""
+Dimensión de paquetes: cada id_paquete (texto) se guarda una sola vez en
+packages, y telemetry y alerts lo referencian por su clave entera
+(paquete_id). Cada fila lleva 4 bytes en lugar del texto, y los índices
+por paquete son de enteros (medido en benchmarks/bench_paquetes.py).
+
+La API sigue hablando en id_paquete. Para no consultar packages en cada
+lectura, cada proceso guarda en memoria el diccionario texto → entero
+(DiccionarioPaquetes): una clave no cambia nunca, así que no caduca y solo
+el primer uso de cada paquete en el proceso va a la base de datos.
+
+- DiccionarioPaquetes.resolver(): clave de un paquete, creándolo si no
+  existe. El alta se hace en su propia transacción (ya confirmada antes
+  de guardarla en el diccionario), así un rollback de la ingesta nunca
+  deja en memoria una clave que no existe.
+- resolver_lote(): lo mismo para muchos paquetes a la vez (cargar_historico.py).
+- migrar_esquema(): pasa una base de datos con id_paquete en telemetry y
+  alerts a paquete_id (lo lanza bootstrap.py).
+"""
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Alert, Package, Telemetry
+
+_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Alta de muchos paquetes de una vez (solo PostgreSQL). Los ids van
+# ordenados: dos cargas en paralelo los bloquean en el mismo orden
+SQL_INSERTAR_LOTE = """
+INSERT INTO packages (id_paquete)
+SELECT unnest(%s::text[])
+ON CONFLICT (id_paquete) DO NOTHING
+"""
+SQL_CLAVES_LOTE = "SELECT id_paquete, id FROM packages WHERE id_paquete = ANY(%s)"
+
+
+class DiccionarioPaquetes:
+    """
+    id_paquete → packages.id en memoria, con tamaño máximo (al llenarse se
+    descarta la entrada más antigua). Cuenta aciertos, fallos y altas.
+    """
+
+    def __init__(self, max_entradas: int = 1_000_000):
+        self.max_entradas = max_entradas
+        self._claves: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.altas = 0
+
+    def resolver(self, db: Session, id_paquete: str) -> int:
+        """Clave entera del paquete; si no existe, lo da de alta"""
+        clave = self._claves.get(id_paquete)
+        if clave is not None:
+            self.aciertos += 1
+            return clave
+        self.fallos += 1
+
+        # Conexión aparte: el alta se confirma aunque la ingesta haga rollback
+        tabla = Package.__table__
+        with db.get_bind().begin() as conn:
+            clave = conn.execute(
+                select(tabla.c.id).where(tabla.c.id_paquete == id_paquete)
+            ).scalar()
+            if clave is None:
+                # Si otro proceso lo crea a la vez, ON CONFLICT no hace nada
+                # y la clave se lee después
+                clave = conn.execute(
+                    _INSERT[conn.dialect.name](tabla)
+                    .values(id_paquete=id_paquete)
+                    .on_conflict_do_nothing(index_elements=[tabla.c.id_paquete])
+                    .returning(tabla.c.id)
+                ).scalar()
+                if clave is None:
+                    clave = conn.execute(
+                        select(tabla.c.id).where(tabla.c.id_paquete == id_paquete)
+                    ).scalar()
+                else:
+                    self.altas += 1
+        self._guardar(id_paquete, clave)
+        return clave
+
+    def buscar(self, db: Session, id_paquete: str) -> Optional[int]:
+        """Clave entera del paquete, o None si no existe (sin darlo de alta)"""
+        clave = self._claves.get(id_paquete)
+        if clave is not None:
+            self.aciertos += 1
+            return clave
+        self.fallos += 1
+        clave = db.execute(
+            select(Package.id).where(Package.id_paquete == id_paquete)
+        ).scalar()
+        if clave is not None:
+            self._guardar(id_paquete, clave)
+        return clave
+
+    def _guardar(self, id_paquete: str, clave: int):
+        with self._lock:
+            if len(self._claves) >= self.max_entradas and id_paquete not in self._claves:
+                del self._claves[next(iter(self._claves))]
+            self._claves[id_paquete] = clave
+
+    def metricas(self) -> dict:
+        """Contadores para /stats"""
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._claves),
+            "max_entradas": self.max_entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "altas": self.altas,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None,
+        }
+
+
+def resolver_lote(conexion, ids: List[str]) -> Dict[str, int]:
+    """
+    Claves de muchos paquetes a la vez con una conexión de psycopg2, dando
+    de alta los que falten y confirmando enseguida (la carga que la usa
+    sigue en su propia transacción, sin bloquear a las demás).
+    """
+    ids = sorted(ids)
+    with conexion.cursor() as cursor:
+        cursor.execute(SQL_INSERTAR_LOTE, (ids,))
+        cursor.execute(SQL_CLAVES_LOTE, (ids,))
+        claves = dict(cursor.fetchall())
+    conexion.commit()
+    return claves
+
+
+# ============================================
+# MIGRACIÓN DE id_paquete A paquete_id
+# ============================================
+
+def necesita_migracion(engine) -> bool:
+    """True si telemetry o alerts aún guardan el id_paquete en texto"""
+    inspector = inspect(engine)
+    for tabla in (Telemetry.__tablename__, Alert.__tablename__):
+        if inspector.has_table(tabla) and "id_paquete" in {
+            columna["name"] for columna in inspector.get_columns(tabla)
+        }:
+            return True
+    return False
+
+
+def migrar_esquema(engine) -> bool:
+    """
+    Pasa telemetry y alerts de id_paquete (texto) a paquete_id: da de alta
+    los paquetes en packages, rellena paquete_id, borra la columna de texto
+    y sus índices y crea los del modelo. Todo en una transacción; en
+    PostgreSQL después se compactan las tablas con VACUUM FULL (la
+    actualización deja una copia muerta de cada fila). Bloquea las tablas
+    mientras dura: se lanza con la API parada.
+
+    Returns:
+        True si había algo que migrar
+    """
+    if not necesita_migracion(engine):
+        return False
+    inspector = inspect(engine)
+    tablas = [
+        tabla for tabla in (Telemetry.__table__, Alert.__table__)
+        if "id_paquete" in {columna["name"] for columna in inspector.get_columns(tabla.name)}
+    ]
+    indices = {
+        tabla.name: [
+            indice["name"] for indice in inspector.get_indexes(tabla.name)
+            if "id_paquete" in indice["column_names"]
+        ]
+        for tabla in tablas
+    }
+    postgres = engine.dialect.name == "postgresql"
+
+    with engine.begin() as conn:
+        Package.__table__.create(bind=conn, checkfirst=True)
+        conn.execute(text(
+            "INSERT INTO packages (id_paquete) "
+            + " UNION ".join(
+                f"SELECT id_paquete FROM {tabla.name} WHERE id_paquete IS NOT NULL" for tabla in tablas
+            )
+            + " ORDER BY 1 ON CONFLICT (id_paquete) DO NOTHING"
+        ))
+        for tabla in tablas:
+            conn.execute(text(
+                f"ALTER TABLE {tabla.name} ADD COLUMN paquete_id INTEGER REFERENCES packages (id)"
+            ))
+            conn.execute(text(
+                f"UPDATE {tabla.name} SET paquete_id = p.id FROM packages p "
+                f"WHERE p.id_paquete = {tabla.name}.id_paquete"
+            ))
+            for nombre in indices[tabla.name]:
+                conn.execute(text(f"DROP INDEX {nombre}"))
+            conn.execute(text(f"ALTER TABLE {tabla.name} DROP COLUMN id_paquete"))
+            if postgres:
+                conn.execute(text(f"ALTER TABLE {tabla.name} ALTER COLUMN paquete_id SET NOT NULL"))
+            for indice in tabla.indexes:
+                indice.create(bind=conn, checkfirst=True)
+
+    if postgres:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for tabla in tablas:
+                conn.execute(text(f"VACUUM FULL ANALYZE {tabla.name}"))
+    return True
@@ -1,6 +1,7 @@
 # ingest_api/schemas.py
 from pydantic import BaseModel, validator
 from typing import Optional
+from datetime import datetime
 
 class TelemetryCreate(BaseModel):
     """Esquema para recibir datos de telemetría"""
@@ -14,6 +15,19 @@ class TelemetryCreate(BaseModel):
     vapores: float
     iluminacion: float
     vibracion: float
+    # Sonda de latencia (opcional): la rellena el simulador con --sonda
+    ejecucion: Optional[int] = None  # Id de la ejecución del simulador (seq empieza en 0 en cada una)
+    seq: Optional[int] = None        # Nº de secuencia de la lectura
+    t_envio: Optional[float] = None  # Hora de publicación (epoch en segundos)
+
+    @validator('timestamp')
+    def timestamp_iso(cls, v):
+        # Sin fecha válida la lectura no se puede asignar a su hora (kpi_buckets)
+        try:
+            datetime.fromisoformat(v.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('Timestamp no válido (ISO 8601, p. ej. 2025-11-06T10:00:00Z)')
+        return v
 
     @validator('temperatura')
     def temperatura_plausible(cls, v):
@@ -50,7 +64,7 @@ class AlertResponse(BaseModel):
     num_eventos: int
     valor_max: float
     valor_promedio: Optional[float] = None
-    created_at: str
+    created_at: datetime
 
     class Config:
         from_attributes = True  # Para SQLAlchemy 2.0+
\ No newline at end of file
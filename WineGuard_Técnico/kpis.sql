@@ -9,23 +9,23 @@
 -- Meta: > 95%
 
 WITH paquetes_con_alertas AS (
-    SELECT DISTINCT id_paquete
+    SELECT DISTINCT paquete_id
     FROM alerts
 ),
 todos_los_paquetes AS (
-    SELECT DISTINCT id_paquete
+    SELECT DISTINCT paquete_id
     FROM telemetry
 )
 SELECT 
-    COUNT(DISTINCT t.id_paquete) as total_paquetes,
-    COUNT(DISTINCT t.id_paquete) - COUNT(DISTINCT a.id_paquete) as paquetes_sin_alertas,
+    COUNT(DISTINCT t.paquete_id) as total_paquetes,
+    COUNT(DISTINCT t.paquete_id) - COUNT(DISTINCT a.paquete_id) as paquetes_sin_alertas,
     ROUND(
-        ((COUNT(DISTINCT t.id_paquete)::float - COUNT(DISTINCT a.id_paquete)::float) / 
-         COUNT(DISTINCT t.id_paquete)::float) * 100, 
+        ((COUNT(DISTINCT t.paquete_id)::float - COUNT(DISTINCT a.paquete_id)::float) / 
+         COUNT(DISTINCT t.paquete_id)::float) * 100, 
         2
     ) as porcentaje_sla
 FROM todos_los_paquetes t
-LEFT JOIN paquetes_con_alertas a ON t.id_paquete = a.id_paquete;
+LEFT JOIN paquetes_con_alertas a ON t.paquete_id = a.paquete_id;
 
 
 -- ============================================
@@ -34,40 +34,29 @@ LEFT JOIN paquetes_con_alertas a ON t.id_paquete = a.id_paquete;
 -- Pregunta: ¿Cuánto tardamos en detectar un problema?
 -- Meta: < 30 segundos
 
-WITH tiempos_deteccion AS (
-    SELECT 
-        a.id,
-        a.id_paquete,
-        a.tipo_incidente,
-        a.timestamp_inicio,
-        -- Buscar el primer evento anómalo en telemetría
-        MIN(t.timestamp) as primer_evento_anomalo,
-        -- Calcular diferencia en segundos
-        EXTRACT(EPOCH FROM (
-            a.created_at::timestamp - 
-            MIN(t.timestamp)::timestamp
-        )) as segundos_hasta_alerta
-    FROM alerts a
-    INNER JOIN telemetry t ON a.id_paquete = t.id_paquete
-    WHERE 
-        -- Para temperatura: eventos con temp > 8°C
-        (a.tipo_incidente = 'temperatura_alta' AND t.temperatura > 8.0)
-        OR
-        -- Para choque: eventos con fuerza_g > 2.5 e inclinación > 30
-        (a.tipo_incidente = 'choque' AND t.fuerza_g > 2.5 AND t.inclinacion > 30)
-    GROUP BY a.id, a.id_paquete, a.tipo_incidente, a.timestamp_inicio, a.created_at
-)
+-- Latencia real de cada alerta: created_at - primera lectura por encima del
+-- umbral de su racha. La API la guarda en alert_detection al crear la
+-- alerta (ingest_api/agregados.py, SQL_DETECCION): la racha se busca con
+-- LATERAL sobre este índice, leyendo solo las lecturas de la racha.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_telemetry_paquete_timestamp
+    ON telemetry (paquete_id, timestamp);
+
+-- Alertas anteriores a alert_detection: python agregados.py --reconstruir
+
 SELECT 
+    tipo_incidente,
     COUNT(*) as total_alertas,
-    ROUND(AVG(segundos_hasta_alerta)::numeric, 2) as mttd_segundos,
-    ROUND(MIN(segundos_hasta_alerta)::numeric, 2) as deteccion_mas_rapida,
-    ROUND(MAX(segundos_hasta_alerta)::numeric, 2) as deteccion_mas_lenta,
+    ROUND(AVG(segundos_deteccion)::numeric, 2) as mttd_segundos,
+    ROUND((percentile_cont(0.5) WITHIN GROUP (ORDER BY segundos_deteccion))::numeric, 2) as p50,
+    ROUND((percentile_cont(0.9) WITHIN GROUP (ORDER BY segundos_deteccion))::numeric, 2) as p90,
+    ROUND((percentile_cont(0.99) WITHIN GROUP (ORDER BY segundos_deteccion))::numeric, 2) as p99,
     CASE 
-        WHEN AVG(segundos_hasta_alerta) < 30 THEN '✅ Excelente (< 30s)'
-        WHEN AVG(segundos_hasta_alerta) < 60 THEN '⚠️ Aceptable (30-60s)'
+        WHEN AVG(segundos_deteccion) < 30 THEN '✅ Excelente (< 30s)'
+        WHEN AVG(segundos_deteccion) < 60 THEN '⚠️ Aceptable (30-60s)'
         ELSE '❌ Necesita mejora (> 60s)'
     END as valoracion
-FROM tiempos_deteccion;
+FROM alert_detection
+GROUP BY tipo_incidente;
 
 
 -- ============================================
@@ -118,24 +107,35 @@ FROM alerts;
 -- ============================================
 -- VISTA CONSOLIDADA: DASHBOARD PRINCIPAL
 -- ============================================
+-- (misma consulta que CONSULTA_KPIS en calcular_kpis.py: los paquetes
+-- distintos se recorren por el índice de telemetry.paquete_id con una CTE
+-- recursiva en lugar de COUNT(DISTINCT) sobre toda la tabla)
 CREATE OR REPLACE VIEW dashboard_kpis AS
-WITH 
+WITH RECURSIVE
+paquetes AS (
+    SELECT MIN(paquete_id) AS paquete_id FROM telemetry
+    UNION ALL
+    SELECT (SELECT MIN(t.paquete_id) FROM telemetry t WHERE t.paquete_id > p.paquete_id)
+    FROM paquetes p
+    WHERE p.paquete_id IS NOT NULL
+),
 -- KPI 1: SLA
 sla AS (
     SELECT 
         ROUND(
-            ((COUNT(DISTINCT t.id_paquete)::float - COUNT(DISTINCT a.id_paquete)::float) / 
-             COUNT(DISTINCT t.id_paquete)::float) * 100, 
+            COUNT(*) FILTER (
+                WHERE NOT EXISTS (SELECT 1 FROM alerts a WHERE a.paquete_id = p.paquete_id)
+            )::numeric / NULLIF(COUNT(*), 0) * 100,
             2
         ) as porcentaje_sla
-    FROM (SELECT DISTINCT id_paquete FROM telemetry) t
-    LEFT JOIN (SELECT DISTINCT id_paquete FROM alerts) a ON t.id_paquete = a.id_paquete
+    FROM paquetes p
+    WHERE p.paquete_id IS NOT NULL
 ),
--- KPI 2: MTTD (simplificado - cuenta eventos hasta la alerta)
+-- KPI 2: MTTD (latencia real de detección, ver alert_detection)
 mttd AS (
     SELECT 
-        ROUND(AVG(num_eventos * 2.0)::numeric, 2) as mttd_segundos  -- 2s por evento
-    FROM alerts
+        ROUND(AVG(segundos_deteccion)::numeric, 2) as mttd_segundos
+    FROM alert_detection
 ),
 -- KPI 3: Falsos Positivos (estimado)
 falsos_positivos AS (
@@ -155,17 +155,28 @@ SELECT
 SELECT * FROM dashboard_kpis;
 
 
+-- ============================================
+-- VISTA MATERIALIZADA (la crea ingest_api/agregados.py)
+-- ============================================
+-- Mismos KPIs calculados sobre package_summary, que la API mantiene en
+-- cada ingesta. Se lee en milisegundos; se refresca sin bloquear lectores
+-- (python agregados.py --cada 60 lo hace periódicamente):
+REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_kpis_mat;
+SELECT * FROM dashboard_kpis_mat;
+
+
 -- ============================================
 -- CONSULTAS ADICIONALES ÚTILES
 -- ============================================
 
--- Ver histórico de alertas por paquete
+-- Ver histórico de alertas por paquete (el id_paquete en texto está en packages)
 SELECT 
-    id_paquete,
+    p.id_paquete,
     COUNT(*) as num_alertas,
-    STRING_AGG(DISTINCT tipo_incidente, ', ') as tipos_incidentes
-FROM alerts
-GROUP BY id_paquete
+    STRING_AGG(DISTINCT a.tipo_incidente, ', ') as tipos_incidentes
+FROM alerts a
+JOIN packages p ON p.id = a.paquete_id
+GROUP BY p.id_paquete
 ORDER BY num_alertas DESC;
 
 -- Evolución de alertas en el tiempo
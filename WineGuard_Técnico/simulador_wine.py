@@ -1,164 +1,134 @@
-import json
+import argparse
+import os
+import sys
 import time
-import random
-from datetime import datetime
+import numpy as np
 import paho.mqtt.client as mqtt
 
+from generador_lote import generar_lote, marcar_sonda, serializar_json
+from escenario import MotorEscenario, programar_demo, programador_aleatorio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_api"))
+import formato_binario  # noqa: E402
+
 # ============================================
 # CONFIGURACIÓN MQTT
 # ============================================
-BROKER = "test.mosquitto.org"  
+BROKER = "test.mosquitto.org"
 PORT = 1883
 TOPIC = "greendelivery/trackers/telemetry"
 
-# ============================================
-# PARÁMETROS DE LOS INCIDENTES
-# ============================================
-# Cuántos eventos normales antes del primer incidente
-EVENTOS_ANTES_INCIDENTE_1 = 15  
-
-# Cuántos eventos anómalos para el incidente de temperatura
-EVENTOS_INCIDENTE_TEMPERATURA = 6  
-
-# Cuántos eventos normales entre incidentes
-EVENTOS_ENTRE_INCIDENTES = 20  
+# Con más paquetes que esto no se imprime cada lectura
+MAX_PAQUETES_DETALLE = 10
 
-# Cuántos eventos anómalos para el incidente de choque
-EVENTOS_INCIDENTE_CHOQUE = 4  
+# Lecturas por trama en formato binario (flotas grandes se reparten en varias)
+REGISTROS_POR_TRAMA = 1000
 
-# Cuántos eventos normales después
-EVENTOS_FINALES = 30
+# Mensajes de consola para cada incidente que empieza / termina
+MENSAJES_INICIO = {
+    "temperatura": "🔥 ¡INCIDENTE TEMPERATURA!",
+    "choque": "💥 ¡INCIDENTE CHOQUE!",
+    "caido": "📍 Paquete CAÍDO (sin movimiento)",
+    "pico_extremo": "🔵 Pico extremo de temperatura",
+    "vibracion": "🟡 Vibración alta",
+}
 
-# Eventos especiales (falsos positivos y vibraciones)
-EVENTO_PICO_EXTREMO_TEMP = 8      # En qué evento ocurre el pico de 28°C
-EVENTOS_VIBRACION_ALTA = [12, 25]  # En qué eventos hay vibración alta
+# ============================================
+# ARGUMENTOS
+# ============================================
+parser = argparse.ArgumentParser(description="Simulador de telemetría de vino")
+parser.add_argument(
+    "--formato", choices=["json", "binario"], default="json",
+    help="json: un mensaje por lectura | binario: una trama con todas las lecturas del evento"
+)
+parser.add_argument(
+    "--paquetes", type=int, default=0,
+    help="0: escenario demo con 3 paquetes | N: flota de N paquetes con incidentes aleatorios"
+)
+parser.add_argument(
+    "--intervalo", type=float, default=2.0,
+    help="Segundos entre eventos"
+)
+parser.add_argument(
+    "--sonda", action="store_true",
+    help="Añade el id de la ejecución, seq y t_envio a cada lectura para medir latencias (ver informe_latencias.py)"
+)
+args = parser.parse_args()
+if args.paquetes < 0:
+    parser.error("--paquetes: 0 (escenario demo) o el nº de paquetes de la flota (1 o más)")
 
 # ============================================
 # ESTADO DEL SIMULADOR
 # ============================================
-evento_actual = 0
+rng = np.random.default_rng()
+if args.paquetes:
+    IDS_PAQUETES = [f"vino_tinto_{i:06d}" for i in range(1, args.paquetes + 1)]
+    motor = MotorEscenario(IDS_PAQUETES, programador_aleatorio(rng))
+else:
+    IDS_PAQUETES = ["vino_tinto_001", "vino_tinto_002", "vino_tinto_003"]
+    motor = MotorEscenario(IDS_PAQUETES, programar_demo)
+detalle = len(IDS_PAQUETES) <= MAX_PAQUETES_DETALLE
+seq = 0  # Siguiente nº de secuencia de la sonda de latencia (empieza en 0 en cada ejecución)
+ejecucion = int(rng.integers(1, 2**63))  # Id de esta ejecución: los huecos de seq se cuentan por ejecución
 
 # Conectar al broker
 client = mqtt.Client()
 client.connect(BROKER, PORT, 60)
 print(f"✅ Conectado al broker MQTT: {BROKER}")
-print(f"📡 Publicando en: {TOPIC}")
+print(f"📡 Publicando en: {TOPIC} (formato {args.formato}, {len(IDS_PAQUETES)} paquetes)")
+if args.sonda:
+    print(f"⏱️  Sonda de latencia activada (ejecución {ejecucion}: seq + t_envio en cada lectura)")
 print("=" * 60)
 
-def generar_datos_normales(id_paquete):
-    """Genera datos normales para un paquete"""
-    return {
-        "id_paquete": id_paquete,
-        "temperatura": round(random.uniform(4.0, 7.5), 2),      # Rango normal: 4-7.5°C
-        "fuerza_g": round(random.uniform(0.1, 1.8), 2),         # Rango normal: 0.1-1.8G
-        "inclinacion": round(random.uniform(0.0, 15.0), 2),     # Rango normal: 0-15°
-        "humedad": round(random.uniform(50.0, 70.0), 2),        # Rango normal
-        "oxigeno": round(random.uniform(19.0, 21.0), 2),        # Rango normal
-        "vapores": round(random.uniform(0.0, 5.0), 2),          # Rango normal
-        "iluminacion": round(random.uniform(0.0, 50.0), 2),     # Rango normal
-        "vibracion": round(random.uniform(0.0, 2.0), 2),        # Rango normal
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
-
-def generar_incidente_temperatura(id_paquete):
-    """Genera datos con temperatura ALTA (incidente)"""
-    data = generar_datos_normales(id_paquete)
-    data["temperatura"] = round(random.uniform(9.0, 12.0), 2)  # ¡MUY ALTA!
-    return data
-
-def generar_incidente_choque(id_paquete):
-    """Genera datos de un CHOQUE (fuerza_g e inclinación altas)"""
-    data = generar_datos_normales(id_paquete)
-    data["fuerza_g"] = round(random.uniform(3.5, 5.0), 2)      # ¡IMPACTO FUERTE!
-    data["inclinacion"] = round(random.uniform(45.0, 90.0), 2) # ¡VOLCADO!
-    return data
-
-def generar_paquete_caido(id_paquete):
-    """Genera datos de un paquete caído (sin movimiento)"""
-    data = generar_datos_normales(id_paquete)
-    data["fuerza_g"] = 0.0          # Sin movimiento
-    data["inclinacion"] = 0.0        # Plano
-    data["vibracion"] = 0.0          # Sin vibración
-    return data
-
 # ============================================
 # SIMULACIÓN PRINCIPAL
 # ============================================
 try:
     while True:
-        evento_actual += 1
-        
-        # ========================================
-        # FASE 1: Datos normales (todos los paquetes)
-        # ========================================
-        if evento_actual <= EVENTOS_ANTES_INCIDENTE_1:
-            print(f"\n📦 Evento {evento_actual} - FASE NORMAL")
-            paquetes = [
-                generar_datos_normales("vino_tinto_001"),
-                generar_datos_normales("vino_tinto_002"),
-                generar_datos_normales("vino_tinto_003")
-            ]
-        
-        # ========================================
-        # FASE 2: INCIDENTE DE TEMPERATURA (paquete 001)
-        # ========================================
-        elif evento_actual <= EVENTOS_ANTES_INCIDENTE_1 + EVENTOS_INCIDENTE_TEMPERATURA:
-            print(f"\n🔥 Evento {evento_actual} - ¡INCIDENTE TEMPERATURA! (paquete 001)")
-            paquetes = [
-                generar_incidente_temperatura("vino_tinto_001"),  # ¡PROBLEMA!
-                generar_datos_normales("vino_tinto_002"),         # Normal
-                generar_datos_normales("vino_tinto_003")          # Normal
-            ]
-        
-        # ========================================
-        # FASE 3: Recuperación (todos normales otra vez)
-        # ========================================
-        elif evento_actual <= EVENTOS_ANTES_INCIDENTE_1 + EVENTOS_INCIDENTE_TEMPERATURA + EVENTOS_ENTRE_INCIDENTES:
-            print(f"\n💚 Evento {evento_actual} - Recuperación post-temperatura")
-            paquetes = [
-                generar_datos_normales("vino_tinto_001"),
-                generar_datos_normales("vino_tinto_002"),
-                generar_datos_normales("vino_tinto_003")
-            ]
-        
-        # ========================================
-        # FASE 4: INCIDENTE DE CHOQUE (paquete 002)
-        # ========================================
-        elif evento_actual <= EVENTOS_ANTES_INCIDENTE_1 + EVENTOS_INCIDENTE_TEMPERATURA + EVENTOS_ENTRE_INCIDENTES + EVENTOS_INCIDENTE_CHOQUE:
-            print(f"\n💥 Evento {evento_actual} - ¡INCIDENTE CHOQUE! (paquete 002)")
-            paquetes = [
-                generar_datos_normales("vino_tinto_001"),         # Normal
-                generar_incidente_choque("vino_tinto_002"),       # ¡PROBLEMA!
-                generar_datos_normales("vino_tinto_003")          # Normal
-            ]
-        
-        # ========================================
-        # FASE 5: Paquete 002 caído (fuerza_g = 0, inclinación = 0)
-        # ========================================
-        elif evento_actual <= EVENTOS_ANTES_INCIDENTE_1 + EVENTOS_INCIDENTE_TEMPERATURA + EVENTOS_ENTRE_INCIDENTES + EVENTOS_INCIDENTE_CHOQUE + EVENTOS_FINALES:
-            print(f"\n📍 Evento {evento_actual} - Paquete 002 CAÍDO (sin movimiento)")
-            paquetes = [
-                generar_datos_normales("vino_tinto_001"),         # Normal
-                generar_paquete_caido("vino_tinto_002"),          # ¡CAÍDO!
-                generar_datos_normales("vino_tinto_003")          # Normal
-            ]
-        
-        # ========================================
-        # FASE 6: Fin de la simulación
-        # ========================================
+        transiciones = motor.avanzar()
+
+        # Resumen del evento: incidentes activos en la flota
+        activos = {tipo: n for tipo, n in motor.activos().items() if n}
+        if activos:
+            resumen = ", ".join(f"{tipo}={n}" for tipo, n in activos.items())
+            print(f"\n⚠️  Evento {motor.evento_actual} - Incidentes activos: {resumen}")
+        else:
+            print(f"\n📦 Evento {motor.evento_actual} - FASE NORMAL")
+
+        # Solo se detallan las transiciones de flotas pequeñas
+        if detalle:
+            for t in transiciones:
+                if t.activo:
+                    print(f"   {MENSAJES_INICIO[t.tipo]} ({IDS_PAQUETES[t.paquete]})")
+                else:
+                    print(f"   💚 Fin de {t.tipo} ({IDS_PAQUETES[t.paquete]})")
+        elif transiciones:
+            print(f"   └─ {len(transiciones)} transiciones de incidentes")
+
+        lote = generar_lote(IDS_PAQUETES, rng, **motor.mascaras)
+        if args.sonda:
+            seq = marcar_sonda(lote, seq, ejecucion=ejecucion)
+
+        # Publicar los paquetes (serializados directamente desde el lote)
+        if args.formato == "binario":
+            for inicio in range(0, len(IDS_PAQUETES), REGISTROS_POR_TRAMA):
+                trozo = {k: v[inicio:inicio + REGISTROS_POR_TRAMA] for k, v in lote.items()}
+                client.publish(TOPIC, formato_binario.codificar_lote(trozo))
         else:
+            for payload in serializar_json(lote):
+                client.publish(TOPIC, payload)
+        if detalle:
+            for i, id_paquete in enumerate(IDS_PAQUETES):
+                print(f"   → {id_paquete}: temp={lote['temperatura'][i]}°C, g={lote['fuerza_g'][i]}G, incl={lote['inclinacion'][i]}°")
+
+        # Fin de la simulación
+        if motor.ciclo_completo:
             print("\n🏁 Simulación completa. Reiniciando...")
-            evento_actual = 0
+            motor.reiniciar()
             time.sleep(5)
             continue
-        
-        # Publicar los 3 paquetes
-        for data in paquetes:
-            payload = json.dumps(data)
-            client.publish(TOPIC, payload)
-            print(f"   → {data['id_paquete']}: temp={data['temperatura']}°C, g={data['fuerza_g']}G, incl={data['inclinacion']}°")
-        
-        time.sleep(2)  # Esperar 2 segundos entre eventos
+
+        time.sleep(args.intervalo)  # Esperar entre eventos
 
 except KeyboardInterrupt:
     print("\n🛑 Simulador detenido.")